@@ -0,0 +1,712 @@
+# cli.py
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import argparse
+import functools
+import glob
+import os
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from core.utils import base_dir, znajdz_plik_operations, znajdz_plik_loyalty, wybierz_sciezke_wyjsciowa
+
+
+FORMATS = ("xlsx", "csv", "json")
+FORMATY_GEN = ("xlsx", "xls", "csv")  # jak core.generator.FORMATY
+PAROWANIA = ("kwota", "data", "optymalne")  # jak core.matching.PAROWANIA (bez importu pandas przy parsowaniu argumentów)
+SILNIKI = ("porownaj", "rownolegle", "poza_pamiecia")  # jak core.equivalence.SILNIKI
+
+
+def rozwin_sciezki(wzorce: Optional[List[str]]) -> List[Path]:
+    """Rozwija ścieżki/globy (np. 'archiwum/*operations*.xlsx'), zachowując kolejność i bez duplikatów."""
+    out, seen = [], set()
+    for w in wzorce or []:
+        trafienia = sorted(glob.glob(w, recursive=True)) if glob.has_magic(w) else [w]
+        if not trafienia:
+            raise FileNotFoundError(f"Wzorzec nie pasuje do żadnego pliku: {w}")
+        for t in trafienia:
+            p = Path(t)
+            if not p.exists():
+                raise FileNotFoundError(f"Brak pliku: {p}")
+            key = str(p.resolve())
+            if key not in seen:
+                seen.add(key)
+                out.append(p)
+    return out
+
+
+def _tolerancja(s: str) -> float:
+    try:
+        v = float(str(s).replace(",", "."))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Błędna tolerancja: {s!r} (użyj np. 0.10)")
+    if v < 0:
+        raise argparse.ArgumentTypeError("Tolerancja nie może być ujemna.")
+    return v
+
+
+def _dodatnia(s: str) -> int:
+    try:
+        v = int(str(s).replace("_", ""))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Oczekiwano liczby całkowitej: {s!r}")
+    if v < 1:
+        raise argparse.ArgumentTypeError(f"Wartość musi być dodatnia (≥ 1), a jest: {v}")
+    return v
+
+
+def _prog(s: str) -> float:
+    try:
+        v = float(str(s).replace(",", "."))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Błędny próg: {s!r} (użyj np. 0.85)")
+    if not 0 < v <= 1:
+        raise argparse.ArgumentTypeError("Próg musi być z przedziału (0, 1].")
+    return v
+
+
+def _udzial(s: str) -> float:
+    try:
+        v = float(str(s).replace(",", "."))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Błędny udział: {s!r} (użyj np. 0.05)")
+    if v < 0:
+        raise argparse.ArgumentTypeError("Udział nie może być ujemny.")
+    return v
+
+
+def _rozmiary(s: str) -> List[int]:
+    try:
+        v = [int(x.replace("_", "")) for x in str(s).split(",") if x.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Błędne rozmiary: {s!r} (użyj np. 1000,10000,100000)")
+    if not v or min(v) < 1:
+        raise argparse.ArgumentTypeError("Rozmiary muszą być dodatnie.")
+    return v
+
+
+def _miesiac(s: str) -> str:
+    from datetime import date
+    try:
+        date.fromisoformat(f"{s}-01")
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Błędny miesiąc: {s!r} (format RRRR-MM)")
+    return s
+
+
+def _data(s: str):
+    from datetime import date
+    try:
+        return date.fromisoformat(s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Błędna data: {s!r} (format RRRR-MM-DD)")
+
+
+def _dodaj_opcje_wejscia(p: argparse.ArgumentParser):
+    p.add_argument("--ops", action="extend", nargs="+", metavar="ŚCIEŻKA",
+                   help="plik(i) Operations lub globy; można podać wielokrotnie")
+    p.add_argument("--loyalty", action="extend", nargs="+", metavar="ŚCIEŻKA",
+                   help="plik(i) Loyalty lub globy; można podać wielokrotnie")
+    p.add_argument("--tolerance", type=_tolerancja, default=0.10, metavar="Δ",
+                   help="tolerancja różnicy kwot (domyślnie 0.10)")
+    p.add_argument("--jobs", type=_dodatnia, default=1, metavar="N",
+                   help="liczba procesów do równoległego wczytywania plików (domyślnie 1)")
+    p.add_argument("--cache-dir", metavar="FOLDER",
+                   help="folder cache znormalizowanych plików (ponowne uruchomienia pomijają parsowanie)")
+    p.add_argument("--dedup", nargs="?", choices=("usun", "oznacz"), const="usun", default=None,
+                   help="scalanie nakładających się plików: usuń (domyślnie) albo oznacz w kolumnie Duplikat_z "
+                        "wiersze powtórzone z wcześniejszego pliku")
+    p.add_argument("--compact", action="store_true",
+                   help="zwężone ramki w pamięci (bez surowych kolumn, klucze/nazwiska jako categorical) + raport pamięci")
+    p.add_argument("--profile", nargs="?", const="-", metavar="PLIK.json",
+                   help="pomiar etapów (czas, CPU, wiersze, pamięć): podsumowanie na stderr, "
+                        "z argumentem także plik Chrome trace")
+    p.add_argument("--memory", nargs="?", const="-", metavar="PLIK.log",
+                   help="śledzenie pamięci etapów (tracemalloc + RSS): szczyt i miejsca największych alokacji; "
+                        "z argumentem także dziennik zapisywany na bieżąco")
+    p.add_argument("--cprofile", nargs="?", const="-", metavar="PLIK.prof",
+                   help="profil cProfile całego przebiegu; bez argumentu wypisuje podsumowanie na stderr")
+
+
+def _dodaj_opcje_parowania(p: argparse.ArgumentParser):
+    p.add_argument("--matching", choices=PAROWANIA, default="kwota",
+                   help="parowanie transakcji w PMID: kwota (rosnąco po kwocie, domyślnie), "
+                        "data (najbliższa data wyjazdu, potem kwota) lub optymalne (min. suma |Δ| + kara za dni)")
+    p.add_argument("--date-penalty", type=_tolerancja, default=1.0, metavar="ZŁ",
+                   help="dla --matching optymalne: koszt jednego dnia różnicy dat wyjazdu (domyślnie 1.0)")
+    p.add_argument("--fuzzy-names", nargs="?", type=_prog, const=0.85, default=None, metavar="PRÓG",
+                   help="przybliżona zgodność nazwisk (diakrytyki, dwuczłonowe, literówki); próg 0–1, domyślnie 0.85")
+    p.add_argument("--match-unequal", action="store_true",
+                   help="PMID o różnej liczbie pozycji: paruj kwoty w tolerancji, w 04 zostaw tylko pozycje bez pary")
+
+
+def _dodaj_opcje_okna(p: argparse.ArgumentParser, stan: Optional[str] = "okno_niesparowanych.pkl",
+                      opis_stanu: str = "okno_niesparowanych.pkl"):
+    p.add_argument("--window", type=int, default=0, metavar="K",
+                   help="paruj transakcje bez pary z niesparowanymi z ostatnich K dni (sekcja 08_MIEDZY_DNIAMI)")
+    p.add_argument("--window-state", default=stan, metavar="PLIK",
+                   help=f"plik stanu okna (domyślnie {opis_stanu})")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="loyaltymercure",
+        description="Raport PMID — porównanie Operations ↔ Loyalty (tryb wiersza poleceń).",
+    )
+    sub = parser.add_subparsers(dest="cmd", metavar="POLECENIE")
+
+    p_run = sub.add_parser("run", help="jednorazowe porównanie (domyślne polecenie)")
+    _dodaj_opcje_wejscia(p_run)
+    p_run.add_argument("--output", "-o", metavar="ŚCIEŻKA",
+                       help="plik wyjściowy (dla csv: folder); domyślnie cyklicznie 01..31 w folderze programu")
+    p_run.add_argument("--format", choices=FORMATS, default="xlsx", help="format raportu (domyślnie xlsx)")
+    _dodaj_opcje_parowania(p_run)
+    _dodaj_opcje_okna(p_run)
+    p_run.add_argument("--day", type=_data, metavar="RRRR-MM-DD",
+                       help="dzień przebiegu dla --window (domyślnie data z nazwy pliku Loyalty, inaczej dziś)")
+    p_run.add_argument("--compare-jobs", type=_dodatnia, default=1, metavar="N",
+                       help="porównanie w N procesach (podział po PMID; wynik identyczny jak przy 1, domyślnie 1)")
+    p_run.add_argument("--duplicates", action="store_true",
+                       help="sekcja 09_DUPLIKATY: powtórzone transakcje (PMID, kwota, data, nazwisko) w plikach wejścia")
+    p_run.add_argument("--provenance", action="store_true",
+                       help="arkusz ZRODLA: dla każdego PMID plik i numery wierszy arkuszy źródłowych")
+    p_run.add_argument("--out-of-core", action="store_true",
+                       help="porównanie poza pamięcią: wiersze w roboczej bazie SQLite, liczone partiami PMID")
+    p_run.add_argument("--spill-dir", metavar="FOLDER",
+                       help="dla --out-of-core: folder roboczej bazy (domyślnie katalog tymczasowy systemu)")
+    p_run.add_argument("--summary", action="store_true",
+                       help="tylko podsumowanie: liczności sekcji i statusów z sumami Δ, bez arkuszy szczegółów "
+                            "(wypisane; do pliku tylko z --output)")
+    p_run.set_defaults(func=cmd_run)
+
+    p_trace = sub.add_parser("trace", help="skąd pochodzi PMID: pliki i wiersze arkuszy źródłowych")
+    p_trace.add_argument("pmid", nargs="+", metavar="PMID", help="szukane PMID (można kilka)")
+    _dodaj_opcje_wejscia(p_trace)
+    p_trace.set_defaults(func=cmd_trace)
+
+    p_watch = sub.add_parser("watch", help="czuwanie: automatyczne porównanie nowych eksportów w folderach")
+    p_watch.add_argument("folders", nargs="+", metavar="FOLDER", help="obserwowane foldery")
+    p_watch.add_argument("--output-dir", default=None, metavar="FOLDER",
+                         help="folder raportów (domyślnie pierwszy obserwowany folder)")
+    p_watch.add_argument("--format", choices=FORMATS, default="xlsx")
+    p_watch.add_argument("--tolerance", type=_tolerancja, default=0.10, metavar="Δ")
+    p_watch.add_argument("--debounce", type=float, default=5.0, metavar="SEK",
+                         help="plik uznajemy za gotowy, gdy nie zmienia się przez tyle sekund (domyślnie 5)")
+    p_watch.add_argument("--interval", type=float, default=2.0, metavar="SEK", help="okres pollingu (domyślnie 2)")
+    p_watch.add_argument("--polling", action="store_true", help="wymuś polling zamiast inotify")
+    p_watch.add_argument("--existing", action="store_true", help="na starcie uzgodnij też pliki już obecne")
+    p_watch.add_argument("--cache-dir", metavar="FOLDER")
+    _dodaj_opcje_parowania(p_watch)
+    _dodaj_opcje_okna(p_watch)
+    p_watch.set_defaults(func=cmd_watch)
+
+    p_batch = sub.add_parser("batch", help="wiele hoteli naraz: raport per hotel + skoroszyt zbiorczy")
+    p_batch.add_argument("root", metavar="FOLDER",
+                         help="folder z eksportami (kod hotelu w nazwie pliku, np. H3417_…, lub podfoldery per hotel)")
+    p_batch.add_argument("--output-dir", default=None, metavar="FOLDER",
+                         help="folder raportów (domyślnie <FOLDER>/raporty)")
+    p_batch.add_argument("--format", choices=FORMATS, default="xlsx")
+    p_batch.add_argument("--tolerance", type=_tolerancja, default=0.10, metavar="Δ")
+    p_batch.add_argument("--jobs", type=_dodatnia, default=os.cpu_count() or 1, metavar="N",
+                         help="liczba hoteli uzgadnianych równolegle (domyślnie liczba rdzeni)")
+    p_batch.add_argument("--latest", action="store_true",
+                         help="per hotel tylko najnowszy plik każdego rodzaju (domyślnie wszystkie)")
+    p_batch.set_defaults(func=cmd_batch)
+
+    p_bf = sub.add_parser("backfill", help="uzgodnij wszystkie dni z archiwum (np. cały miesiąc) jednym poleceniem")
+    p_bf.add_argument("archive", metavar="FOLDER", help="archiwum eksportów Operations/Loyalty (rekurencyjnie)")
+    p_bf.add_argument("--output-dir", default=None, metavar="FOLDER",
+                      help="folder wyników RRRR-MM-DD.xlsx (domyślnie <FOLDER>/backfill)")
+    p_bf.add_argument("--from", dest="od", type=_data, metavar="RRRR-MM-DD", help="pierwszy dzień (włącznie)")
+    p_bf.add_argument("--to", dest="do", type=_data, metavar="RRRR-MM-DD", help="ostatni dzień (włącznie)")
+    p_bf.add_argument("--format", choices=FORMATS, default="xlsx")
+    p_bf.add_argument("--tolerance", type=_tolerancja, default=0.10, metavar="Δ")
+    p_bf.add_argument("--jobs", type=_dodatnia, default=os.cpu_count() or 1, metavar="N",
+                      help="dni uzgadniane równolegle (domyślnie liczba rdzeni)")
+    p_bf.add_argument("--force", action="store_true", help="licz ponownie dni, które mają już wynik")
+    p_bf.add_argument("--cache-dir", metavar="FOLDER", help="cache parsowania (domyślnie <output-dir>/.cache)")
+    _dodaj_opcje_parowania(p_bf)
+    _dodaj_opcje_okna(p_bf, stan=None, opis_stanu="okno_niesparowanych.pkl w folderze wyników")
+    p_bf.set_defaults(func=cmd_backfill)
+
+    p_srv = sub.add_parser("serve", help="lokalna usługa HTTP przyjmująca zlecenia porównania")
+    p_srv.add_argument("--host", default="127.0.0.1", help="adres nasłuchu (domyślnie 127.0.0.1)")
+    p_srv.add_argument("--port", type=int, default=8765)
+    p_srv.add_argument("--workers", type=_dodatnia, default=2, metavar="N", help="wątki robocze (domyślnie 2)")
+    p_srv.add_argument("--max-queue", type=_dodatnia, default=32, metavar="N",
+                       help="maks. zadań w kolejce; ponad limit usługa odpowiada 503 (domyślnie 32)")
+    p_srv.add_argument("--work-dir", default="service_data", metavar="FOLDER",
+                       help="folder na przesłane pliki i wyniki (domyślnie ./service_data)")
+    p_srv.add_argument("--allow-dir", action="append", default=[], metavar="FOLDER",
+                       help="folder, z którego wolno wskazywać pliki ścieżką (można powtarzać)")
+    p_srv.add_argument("--processes", type=int, default=0, metavar="N",
+                       help="wykonuj zadania w N rozgrzanych procesach roboczych (domyślnie 0 = w wątkach usługi)")
+    p_srv.add_argument("--cache-dir", metavar="FOLDER")
+    p_srv.set_defaults(func=cmd_serve)
+
+    p_gen = sub.add_parser("gen", help="syntetyczne pliki Operations/Loyalty (do testów wydajności, bez danych gości)")
+    p_gen.add_argument("--rows", type=_dodatnia, default=10_000, metavar="N",
+                       help="liczba pobytów (≈ wierszy Loyalty i wierszy Hotel Stay w Operations; domyślnie 10000)")
+    p_gen.add_argument("--out-dir", default="dane_syntetyczne", metavar="FOLDER",
+                       help="folder na pliki (domyślnie ./dane_syntetyczne)")
+    p_gen.add_argument("--format", choices=FORMATY_GEN, default="xlsx",
+                       help="xlsx (domyślnie), xls (dane zgodne z .xls; prawdziwy .xls z pakietem xlwt) lub csv")
+    p_gen.add_argument("--seed", type=int, metavar="N", help="ziarno losowania — ten sam seed, te same pliki")
+    p_gen.add_argument("--month", type=_miesiac, default="2025-03", metavar="RRRR-MM",
+                       help="miesiąc dat wyjazdu (domyślnie 2025-03)")
+    p_gen.add_argument("--hotel", default="H3417", help="kod hotelu w nazwie pliku Loyalty (domyślnie H3417)")
+    g = p_gen.add_argument_group("udziały przypadków PMID (względne, normalizowane do sumy 1)")
+    for flaga, klucz, opis in (
+        ("--match", "zgodne", "zgodne"),
+        ("--mismatch", "niezgodne", "różnica kwot ponad tolerancję"),
+        ("--name-diff", "inne_nazwiska", "kwoty zgodne, inne nazwisko w Operations"),
+        ("--count-diff", "rozna_liczba", "dodatkowa pozycja w Operations"),
+        ("--missing-ops", "brak_w_operations", "PMID tylko w Loyalty"),
+        ("--missing-loyalty", "brak_w_loyalty", "PMID tylko w Operations"),
+    ):
+        g.add_argument(flaga, dest=f"udzial_{klucz}", type=_udzial, metavar="U", help=opis)
+    p_gen.add_argument("--other-credit", type=_udzial, default=0.10, metavar="U",
+                       help="dodatkowe wiersze Operations z innym Credit type niż Hotel Stay (ułamek, domyślnie 0.10)")
+    p_gen.set_defaults(func=cmd_gen)
+
+    p_bench = sub.add_parser("bench", help="benchmark potoku (odczyt, normalizacja, porównanie, zapis) na danych syntetycznych")
+    p_bench.add_argument("--sizes", type=_rozmiary, default=[1_000, 10_000, 100_000], metavar="N,N,…",
+                         help="rozmiary zbiorów w pobytach (domyślnie 1000,10000,100000)")
+    p_bench.add_argument("--repeat", type=_dodatnia, default=3, metavar="N",
+                         help="przebiegi na rozmiar; liczy się najlepszy czas (domyślnie 3)")
+    p_bench.add_argument("--input-format", choices=FORMATY_GEN, default="xlsx",
+                         help="format wygenerowanych plików wejścia (domyślnie xlsx)")
+    p_bench.add_argument("--data-dir", default=".bench", metavar="FOLDER",
+                         help="folder na wygenerowane dane, używane ponownie (domyślnie ./.bench)")
+    p_bench.add_argument("--output", "-o", default="bench_wyniki.json", metavar="PLIK",
+                         help="plik wyników JSON (domyślnie bench_wyniki.json)")
+    p_bench.add_argument("--baseline", default="bench_baseline.json", metavar="PLIK",
+                         help="baza do porównania (domyślnie bench_baseline.json, jeśli istnieje)")
+    p_bench.add_argument("--threshold", type=_udzial, default=0.25, metavar="U",
+                         help="dopuszczalny wzrost czasu / pamięci etapu względem bazy (domyślnie 0.25 = 25%%)")
+    p_bench.add_argument("--update-baseline", action="store_true", help="zapisz wyniki także jako nową bazę")
+    p_bench.add_argument("--no-memory", action="store_true", help="bez przebiegu mierzącego pamięć (szybciej)")
+    p_bench.set_defaults(func=cmd_bench)
+
+    p_eq = sub.add_parser("equiv", help="testy różnicowe: wynik silnika-kandydata identyczny z referencyjnym porównaniem")
+    p_eq.add_argument("--engine", action="append", choices=SILNIKI, metavar="SILNIK",
+                      help=f"sprawdzany silnik: {', '.join(SILNIKI)} (można kilka; domyślnie wszystkie)")
+    p_eq.add_argument("--candidate", action="append", default=[], metavar="MODUŁ:FUNKCJA",
+                      help="własny kandydat o sygnaturze porownaj(lojal_df, ops_df, **opcje)")
+    p_eq.add_argument("--random", type=int, default=50, metavar="N",
+                      help="liczba losowych zbiorów (domyślnie 50)")
+    p_eq.add_argument("--seed", type=int, default=0, metavar="N",
+                      help="ziarno pierwszego losowego zbioru; kolejne to seed+1, seed+2… (domyślnie 0)")
+    p_eq.add_argument("--rows", type=_rozmiary, default=[2_000], metavar="N,N,…",
+                      help="rozmiary zbiorów z generatora, czytanych z plików (domyślnie 2000)")
+    p_eq.add_argument("--no-generated", action="store_true", help="bez zbiorów z generatora")
+    p_eq.add_argument("--ops", action="extend", nargs="+", metavar="ŚCIEŻKA",
+                      help="dodatkowo prawdziwe pliki Operations (razem z --loyalty)")
+    p_eq.add_argument("--loyalty", action="extend", nargs="+", metavar="ŚCIEŻKA",
+                      help="dodatkowo prawdziwe pliki Loyalty (razem z --ops)")
+    p_eq.add_argument("--max-diffs", type=int, default=10, metavar="N",
+                      help="najwyżej N różnych komórek na arkusz w raporcie (domyślnie 10)")
+    p_eq.add_argument("--report", metavar="PLIK", help="zapisz raport różnic do pliku tekstowego")
+    p_eq.set_defaults(func=cmd_equiv)
+
+    return parser
+
+
+# ============ Polecenia ============
+
+def _znajdz_wejscia(args) -> tuple[List[Path], List[Path]]:
+    ops = rozwin_sciezki(args.ops)
+    loy = rozwin_sciezki(args.loyalty)
+    root = base_dir()
+    # brak jawnych ścieżek → jak dotąd: najnowszy plik danego rodzaju w folderze programu
+    if not ops:
+        ops = [znajdz_plik_operations(root)]
+    if not loy:
+        loy = [znajdz_plik_loyalty(root)]
+    return ops, loy
+
+
+def _log_wejscia(ops: List[Path], loy: List[Path]):
+    if len(ops) == 1:
+        print(f"🔎 Operations: {ops[0].name}")
+    else:
+        print(f"🔎 Operations (x{len(ops)}): " + ", ".join(p.name for p in ops))
+    if len(loy) == 1:
+        print(f"🔎 Loyalty:    {loy[0].name}")
+    else:
+        print(f"🔎 Loyalty (x{len(loy)}): " + ", ".join(p.name for p in loy))
+
+
+def _wczytaj(ops: List[Path], loy: List[Path], **kwargs):
+    """wczytaj_wejscia; zły plik (brak kolumn, pusty CSV) → jedna linia ❌ na stderr i None."""
+    import pandas as pd
+    from core.ingest import wczytaj_wejscia
+
+    try:
+        return wczytaj_wejscia(ops, loy, **kwargs)
+    except (ValueError, pd.errors.EmptyDataError) as e:
+        print("❌ Nie udało się wczytać plików wejścia:", e, file=sys.stderr)
+        return None
+
+
+def cmd_run(args) -> int:
+    import pandas as pd
+    from core.compare import porownaj
+
+    try:
+        ops, loy = _znajdz_wejscia(args)
+    except FileNotFoundError as e:
+        print("❌ Błąd wyszukiwania plików:", e, file=sys.stderr)
+        print("Podaj pliki przez --ops/--loyalty albo umieść w folderze programu:", file=sys.stderr)
+        print(" • Operations: .xls/.xlsx ze słowem 'operation/operations' (nagłówki w 3. wierszu)", file=sys.stderr)
+        print(" • Loyalty:    .xls/.xlsx ze słowem 'loyalty/loyaltyexport' (nagłówki od 13. wiersza)", file=sys.stderr)
+        return 2
+    _log_wejscia(ops, loy)
+
+    opcje = dict(tolerancja=args.tolerance, parowanie=args.matching, paruj_rozne_liczby=args.match_unequal,
+                 kara_za_dzien=args.date_penalty, prog_nazwisk=args.fuzzy_names)
+    if args.summary:
+        return _podsumowanie(args, ops, loy, opcje)
+    if args.out_of_core:
+        if args.window > 0 or args.duplicates or args.dedup or args.provenance:
+            print("❌ --out-of-core nie współpracuje z --window, --duplicates, --dedup ani --provenance "
+                  "(potrzebują pełnych ramek).",
+                  file=sys.stderr)
+            return 2
+        from core.outofcore import zapisz_poza_pamiecia
+        # raport zapisywany partiami prosto z bazy roboczej — bez składania całego wyniku w pamięci
+        output = _sciezka_wyjscia(args)
+        try:
+            zapisz_poza_pamiecia(ops, loy, output, args.format, folder=args.spill_dir, cache_dir=args.cache_dir, **opcje)
+        except (ValueError, pd.errors.EmptyDataError) as e:
+            print("❌ Nie udało się wczytać plików wejścia:", e, file=sys.stderr)
+            return 2
+        print("\n✅ Gotowe. Otwórz:", output.name)
+        return 0
+
+    raport_pamieci = [] if args.compact else None
+    raport_dedup = [] if args.dedup else None
+    wejscia = _wczytaj(ops, loy, jobs=args.jobs, cache_dir=args.cache_dir,
+                       kompakt=args.compact, raport_pamieci=raport_pamieci,
+                       deduplikacja=args.dedup, raport_dedup=raport_dedup)
+    if wejscia is None:
+        return 2
+    lojal_df, ops_df = wejscia
+    if raport_dedup:
+        from core.duplicates import fmt_raport_dedup
+        print(f"🧹 Powtórzenia z wcześniejszych plików (--dedup {args.dedup}):\n" + fmt_raport_dedup(raport_dedup))
+    if raport_pamieci:
+        from core.schema import fmt_raport_pamieci
+        print("🧮 Pamięć ramek (memory_usage deep):\n" + fmt_raport_pamieci(raport_pamieci))
+    if args.compare_jobs > 1:
+        from core.parallel import porownaj_rownolegle
+        wyniki = porownaj_rownolegle(lojal_df, ops_df, jobs=args.compare_jobs, **opcje)
+    else:
+        wyniki = porownaj(lojal_df, ops_df, **opcje)
+
+    if args.window > 0:
+        from datetime import date
+        from core.utils import data_z_nazwy
+        from core.window import OknoNiesparowanych, dolacz_do_wynikow
+
+        dzien = args.day or data_z_nazwy(loy[0].name) or data_z_nazwy(ops[0].name) or date.today()
+        okno = OknoNiesparowanych(args.window_state, okno_dni=args.window, tolerancja=args.tolerance,
+                                  paruj_rozne_liczby=args.match_unequal)
+        miedzy = okno.przetworz_dzien(lojal_df, ops_df, dzien)
+        okno.zapisz()
+        wyniki = dolacz_do_wynikow(wyniki, miedzy)
+        print(f"🔁 Okno {args.window} dni ({dzien.isoformat()}): sparowano {len(miedzy)} transakcji z innych dni, "
+              f"w magazynie {okno.otwarte}")
+
+    if args.duplicates:
+        from core.duplicates import wykryj_duplikaty, dolacz_do_wynikow as dolacz_duplikaty
+        dup = wykryj_duplikaty(lojal_df, ops_df)
+        wyniki = dolacz_duplikaty(wyniki, dup)
+        print(f"🧬 Duplikaty: {len(dup)} powtórzonych transakcji")
+
+    if args.provenance:
+        from core.provenance import IndeksZrodel, dolacz_do_wynikow as dolacz_zrodla
+        wyniki = dolacz_zrodla(wyniki, IndeksZrodel.z_ramek(lojal_df, ops_df))
+
+    return _zapisz_wyniki(args, wyniki)
+
+
+def _podsumowanie(args, ops: List[Path], loy: List[Path], opcje: dict) -> int:
+    from core.summary import podsumuj, fmt_podsumowanie, PAROWANIA_PODSUMOWANIA
+
+    if (args.matching not in PAROWANIA_PODSUMOWANIA or args.match_unequal or args.fuzzy_names is not None
+            or args.window > 0 or args.duplicates or args.provenance or args.out_of_core or args.compare_jobs > 1):
+        print(f"❌ --summary działa z parowaniem {'/'.join(PAROWANIA_PODSUMOWANIA)}, bez --match-unequal, "
+              "--fuzzy-names, --window, --duplicates, --provenance, --out-of-core i --compare-jobs.",
+              file=sys.stderr)
+        return 2
+    wejscia = _wczytaj(ops, loy, jobs=args.jobs, cache_dir=args.cache_dir, kompakt=args.compact, deduplikacja=args.dedup)
+    if wejscia is None:
+        return 2
+    lojal_df, ops_df = wejscia
+    wyniki = podsumuj(lojal_df, ops_df, tolerancja=opcje["tolerancja"], parowanie=opcje["parowanie"])
+    print("\n" + fmt_podsumowanie(wyniki))
+    if not args.output:
+        return 0
+    return _zapisz_wyniki(args, wyniki)
+
+
+def _sciezka_wyjscia(args) -> Path:
+    ext = "" if args.format == "csv" else f".{args.format}"
+    return Path(args.output) if args.output else wybierz_sciezke_wyjsciowa(base_dir(), ext=ext)
+
+
+def _zapisz_wyniki(args, wyniki) -> int:
+    from core.report import WRITERS
+
+    output = _sciezka_wyjscia(args)
+    WRITERS[args.format](wyniki, output)
+    print("\n✅ Gotowe. Otwórz:", output.name)
+    return 0
+
+
+def cmd_trace(args) -> int:
+    import pandas as pd
+    from core.provenance import IndeksZrodel
+    from core.utils import normalizuj_pmid
+
+    try:
+        ops, loy = _znajdz_wejscia(args)
+    except FileNotFoundError as e:
+        print("❌ Błąd wyszukiwania plików:", e, file=sys.stderr)
+        return 2
+    _log_wejscia(ops, loy)
+    wejscia = _wczytaj(ops, loy, jobs=args.jobs, cache_dir=args.cache_dir, kompakt=args.compact, deduplikacja=args.dedup)
+    if wejscia is None:
+        return 2
+    lojal_df, ops_df = wejscia
+    indeks = IndeksZrodel.z_ramek(lojal_df, ops_df)
+
+    brak = 0
+    for pmid in map(normalizuj_pmid, args.pmid):
+        if pmid not in indeks:
+            print(f"\n❔ {pmid}: brak w plikach wejścia")
+            brak += 1
+            continue
+        poz = indeks.pozycje(pmid)
+        szczegoly = pd.concat([
+            pd.DataFrame({"Nazwisko": lojal_df["gosc_nazwisko"].iloc[poz["Loyalty"]].astype(object).to_numpy(),
+                          "Kwota": lojal_df["loyal_kwota"].iloc[poz["Loyalty"]].to_numpy(),
+                          "Data": lojal_df["loyal_data_str"].iloc[poz["Loyalty"]].astype(object).to_numpy()}),
+            pd.DataFrame({"Nazwisko": ops_df["nazwisko"].iloc[poz["Operations"]].astype(object).to_numpy(),
+                          "Kwota": ops_df["ops_kwota"].iloc[poz["Operations"]].to_numpy(),
+                          "Data": ops_df["ops_data_str"].iloc[poz["Operations"]].astype(object).to_numpy()}),
+        ], ignore_index=True)
+        print(f"\n📍 {pmid}")
+        print(pd.concat([indeks.wiersze(pmid), szczegoly], axis=1).to_string(index=False))
+    return 1 if brak else 0
+
+
+def cmd_watch(args) -> int:
+    from core.watch import FolderWatcher
+
+    for f in args.folders:
+        if not Path(f).is_dir():
+            print(f"❌ To nie jest folder: {f}", file=sys.stderr)
+            return 2
+    w = FolderWatcher(
+        args.folders, args.output_dir or args.folders[0],
+        tolerancja=args.tolerance, fmt=args.format,
+        debounce=args.debounce, interval=args.interval, polling=args.polling,
+        cache_dir=args.cache_dir, parowanie=args.matching, paruj_rozne_liczby=args.match_unequal,
+        kara_za_dzien=args.date_penalty, prog_nazwisk=args.fuzzy_names,
+        okno_dni=args.window, okno_plik=args.window_state,
+    )
+    w.run(existing=args.existing)
+    return 0
+
+
+def cmd_batch(args) -> int:
+    from core.batch import znajdz_obiekty, uruchom_wsadowo
+    from core.report import zapisz_zbiorcze
+
+    root = Path(args.root)
+    if not root.is_dir():
+        print(f"❌ To nie jest folder: {root}", file=sys.stderr)
+        return 2
+    obiekty = znajdz_obiekty(root, tylko_najnowsze=args.latest)
+    if not obiekty:
+        print("❌ Nie znaleziono plików żadnego hotelu.", file=sys.stderr)
+        return 2
+    print(f"🏨 Hotele ({len(obiekty)}): " + ", ".join(obiekty))
+    out_dir = Path(args.output_dir) if args.output_dir else root / "raporty"
+    zbiorcze = uruchom_wsadowo(obiekty, out_dir, tolerancja=args.tolerance, fmt=args.format, jobs=args.jobs)
+    zapisz_zbiorcze(zbiorcze, out_dir / "00_ZBIORCZO.xlsx")
+    return 0 if (zbiorcze["Status"] != "BŁĄD").all() else 1
+
+
+def cmd_backfill(args) -> int:
+    from core.backfill import uruchom_backfill
+
+    root = Path(args.archive)
+    if not root.is_dir():
+        print(f"❌ To nie jest folder: {root}", file=sys.stderr)
+        return 2
+    out_dir = Path(args.output_dir) if args.output_dir else root / "backfill"
+    opcje = dict(parowanie=args.matching, paruj_rozne_liczby=args.match_unequal,
+                 kara_za_dzien=args.date_penalty, prog_nazwisk=args.fuzzy_names)
+    dziennik = uruchom_backfill(root, out_dir, tolerancja=args.tolerance, fmt=args.format, jobs=args.jobs,
+                                od=args.od, do=args.do, force=args.force, cache_dir=args.cache_dir,
+                                opcje=opcje, okno_dni=args.window, stan_okna=args.window_state)
+    if dziennik.empty:
+        print("ℹ️ Brak dni do uzgodnienia.")
+        return 0
+    dziennik.to_csv(out_dir / "_dziennik.csv", index=False, encoding="utf-8-sig")
+    licz = dziennik["Status"].value_counts().to_dict()
+    print("📋 " + ", ".join(f"{k}: {v}" for k, v in licz.items()) + f"  (dziennik: {out_dir / '_dziennik.csv'})")
+    return 1 if licz.get("BŁĄD") else 0
+
+
+def cmd_serve(args) -> int:
+    from core.service import JobService, make_server
+
+    pool = None
+    if args.processes > 0:
+        from core.workers import WarmPool
+        print(f"🔥 Rozgrzewam {args.processes} proces(y) roboczy(e)…")
+        pool = WarmPool(args.processes, cache_dir=args.cache_dir).start()
+    workers = args.processes or args.workers
+    svc = JobService(args.work_dir, workers=workers, max_queue=args.max_queue,
+                     allowed_roots=args.allow_dir, cache_dir=args.cache_dir, pool=pool)
+    srv = make_server(svc, args.host, args.port)
+    rodzaj = "procesy" if pool is not None else "wątki"
+    print(f"🌐 Usługa na http://{args.host}:{args.port}  ({rodzaj}: {workers}, kolejka: {args.max_queue})")
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️ Zatrzymano.")
+    finally:
+        srv.server_close()
+        if pool is not None:
+            pool.shutdown(wait=False)
+    return 0
+
+
+def cmd_gen(args) -> int:
+    import time
+    from core.generator import partie, zapisz_partie
+
+    proporcje = {k[len("udzial_"):]: v for k, v in vars(args).items() if k.startswith("udzial_") and v is not None}
+    t0 = time.perf_counter()
+    print(f"🧪 Generuję {args.rows:_} pobytów ({args.format}) → {args.out_dir}".replace("_", " "))
+    # partiami: generowanie i zapis w stałej pamięci także dla milionów wierszy
+    czesci = partie(args.rows, proporcje, inne_kredyty=args.other_credit, miesiac=args.month, seed=args.seed)
+    pliki = zapisz_partie(czesci, args.out_dir, fmt=args.format, data=f"{args.month}-01", hotel=args.hotel)
+    for p in pliki:
+        print(f"💾 {p}  ({p.stat().st_size / 2**20:.1f} MB)")
+    if args.format == "xls" and any(p.suffix == ".xlsx" for p in pliki):
+        print("ℹ️ Brak pakietu xlwt — dane w układzie .xls zapisane jako .xlsx (pip install xlwt, żeby dostać .xls).")
+    print(f"⏱️ Razem {time.perf_counter() - t0:.1f}s")
+    return 0
+
+
+def cmd_bench(args) -> int:
+    from core import benchmark as bench
+
+    wynik = bench.uruchom(args.sizes, args.data_dir, args.input_format, args.repeat, pamiec=not args.no_memory)
+    bench.zapisz_wyniki(wynik, args.output)
+    baza = bench.wczytaj_wyniki(args.baseline) if Path(args.baseline).exists() else None
+    print("\n" + bench.fmt_wyniki(wynik, baza))
+    print(f"\n💾 Wyniki: {args.output}")
+
+    kod = 0
+    if baza is None:
+        print(f"ℹ️ Brak bazy {args.baseline} — zapisz ją przez --update-baseline.")
+    else:
+        if baza.get("meta", {}).get("maszyna") != wynik["meta"]["maszyna"]:
+            print(f"⚠️ Baza z innej maszyny ({baza.get('meta', {}).get('maszyna', '?')}) — porównanie orientacyjne.")
+        regresje = bench.porownaj_z_baza(wynik, baza, args.threshold)
+        if regresje:
+            print(f"❌ Regresje ponad {args.threshold:.0%} względem {args.baseline}:\n" + bench.fmt_regresje(regresje),
+                  file=sys.stderr)
+            kod = 1
+        else:
+            print(f"✅ Bez regresji ponad {args.threshold:.0%} względem {args.baseline}.")
+    if args.update_baseline:
+        bench.zapisz_wyniki(wynik, args.baseline)
+        print(f"📌 Nowa baza: {args.baseline}")
+    return kod
+
+
+def cmd_equiv(args) -> int:
+    import itertools
+    from core import equivalence as eq
+
+    silniki = {n: eq.SILNIKI[n] for n in (args.engine or eq.SILNIKI)}
+    for k in args.candidate:
+        silniki[k] = eq.kandydat_z_importu(k)
+    if bool(args.ops) != bool(args.loyalty):
+        print("❌ Prawdziwe pliki podaj razem: --ops i --loyalty.", file=sys.stderr)
+        return 2
+
+    zbiory = eq.zbiory_domyslne(args.random, args.seed, [] if args.no_generated else args.rows)
+    if args.ops:
+        zbiory = itertools.chain(zbiory, [eq.zbior_z_plikow(rozwin_sciezki(args.ops), rozwin_sciezki(args.loyalty))])
+    print(f"🔬 Kandydaci: {', '.join(silniki)}; zestawy opcji: {len(eq.OPCJE)}")
+    przypadki = eq.sprawdz(zbiory, silniki, limit=args.max_diffs,
+                           log=lambda m: print(m, file=sys.stderr if m.startswith("❌") else sys.stdout))
+
+    raport = eq.fmt_raport(przypadki)
+    niezgodne = any(p.roznice for p in przypadki)
+    print("\n" + raport, file=sys.stderr if niezgodne else sys.stdout)
+    if args.report:
+        Path(args.report).write_text(raport + "\n", encoding="utf-8")
+        print(f"💾 Raport: {args.report}")
+    return 1 if niezgodne else 0
+
+
+def _z_profilem(func, args) -> int:
+    import cProfile
+    import pstats
+
+    prof = cProfile.Profile()
+    try:
+        return prof.runcall(func, args)
+    finally:
+        if args.cprofile == "-":
+            pstats.Stats(prof, stream=sys.stderr).sort_stats("cumulative").print_stats(25)
+        else:
+            prof.dump_stats(args.cprofile)
+            print(f"⏱️ Profil zapisany: {args.cprofile}", file=sys.stderr)
+
+
+def _z_etapami(func, args) -> int:
+    from core.profiling import Profiler, ProfilerPamieci
+
+    if args.memory:
+        prof = ProfilerPamieci(dziennik=None if args.memory == "-" else args.memory)
+    else:
+        prof = Profiler()
+    with prof:
+        try:
+            return func(args)
+        finally:
+            print("\n⏱️ Etapy przebiegu:\n" + prof.podsumowanie(), file=sys.stderr)
+            if args.profile and args.profile != "-":
+                prof.zapisz_trace(args.profile)
+                print(f"⏱️ Ślad etapów (Chrome trace) zapisany: {args.profile}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # bez polecenia (same opcje albo nic) → "run"
+    if not argv or argv[0].startswith("-") and argv[0] not in ("-h", "--help"):
+        argv.insert(0, "run")
+    args = build_parser().parse_args(argv)
+    func = args.func
+    if getattr(args, "cprofile", None):
+        func = functools.partial(_z_profilem, func)
+    if getattr(args, "profile", None) or getattr(args, "memory", None):
+        func = functools.partial(_z_etapami, func)
+    return func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import contextlib
+import io
+import os
+import shutil
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from datetime import date
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .utils import rodzaj_pliku, data_z_nazwy, hotel_z_nazwy
+
+Klucz = Tuple[str, Optional[str]]  # (data ISO, kod hotelu)
+
+
+# ============ Ustalanie daty pliku ============
+
+def _data_z_kolumn(path: str, rodzaj: str, cache_dir: Optional[str]) -> Optional[str]:
+    """Najczęstsza data wyjazdu w pliku (Check-out date / Departure) — gdy nazwa nie zawiera daty."""
+    from .ingest import _wczytaj_jeden
+
+    df = _wczytaj_jeden(rodzaj, path, cache_dir)
+    col = "loyal_data" if rodzaj == "loyalty" else "ops_data"
+    if col not in df.columns:
+        return None
+    daty = pd.to_datetime(df[col], errors="coerce").dropna()
+    if daty.empty:
+        return None
+    return Counter(daty.dt.date).most_common(1)[0][0].isoformat()
+
+
+def skanuj_archiwum(
+    root: str | Path,
+    cache_dir: Optional[str | Path] = None,
+    jobs: int = 1,
+) -> Dict[Klucz, Dict[str, List[Path]]]:
+    """
+    Zwraca {(data, hotel): {"operations": [...], "loyalty": [...]}} dla wszystkich plików w archiwum.
+    Data pochodzi z nazwy pliku, a gdy jej brak — z kolumn z datą wyjazdu (parsowanie w puli procesów).
+    """
+    root = Path(root)
+    pliki: List[Tuple[str, Path]] = []
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            p = Path(dirpath) / name
+            r = rodzaj_pliku(p)
+            if r:
+                pliki.append((r, p))
+
+    daty: Dict[Path, Optional[str]] = {}
+    bez_daty = []
+    for r, p in pliki:
+        d = data_z_nazwy(p.name)
+        if d:
+            daty[p] = d.isoformat()
+        else:
+            bez_daty.append((r, p))
+
+    cdir = str(cache_dir) if cache_dir else None
+    if bez_daty:
+        print(f"📅 Ustalam datę z kolumn dla {len(bez_daty)} plik(ów)…")
+        if jobs > 1 and len(bez_daty) > 1:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(bez_daty))) as ex:
+                futs = {ex.submit(_data_z_kolumn, str(p), r, cdir): p for r, p in bez_daty}
+                for f in as_completed(futs):
+                    daty[futs[f]] = f.result()
+        else:
+            for r, p in bez_daty:
+                daty[p] = _data_z_kolumn(str(p), r, cdir)
+
+    out: Dict[Klucz, Dict[str, List[Path]]] = {}
+    for r, p in pliki:
+        d = daty.get(p)
+        if d is None:
+            print(f"ℹ️ Pomijam (brak daty w nazwie i w danych): {p.name}")
+            continue
+        grupa = out.setdefault((d, hotel_z_nazwy(p.name)), {"operations": [], "loyalty": []})
+        grupa[r].append(p)
+
+    # Operations zwykle nie mają kodu hotelu — dołącz je do każdego hotelu z tą samą datą
+    for (d, h), grupa in list(out.items()):
+        if h is None:
+            hotele = [k for k in out if k[0] == d and k[1] is not None]
+            if hotele:
+                for k in hotele:
+                    out[k]["operations"] += grupa["operations"]
+                    out[k]["loyalty"] += grupa["loyalty"]
+                del out[(d, h)]
+    for grupa in out.values():
+        grupa["operations"].sort()
+        grupa["loyalty"].sort()
+    return dict(sorted(out.items(), key=lambda kv: (kv[0][0], kv[0][1] or "")))
+
+
+# ============ Uzgadnianie dni ============
+
+def nazwa_wyjscia(klucz: Klucz, fmt: str) -> str:
+    d, h = klucz
+    ext = "" if fmt == "csv" else f".{fmt}"
+    return f"{h}_{d}{ext}" if h else f"{d}{ext}"
+
+
+def plik_okna(stan: str | Path, hotel: Optional[str]) -> Path:
+    """Stan okna międzydniowego osobno dla każdego hotelu (PMID-y różnych hoteli nie mogą się parować)."""
+    stan = Path(stan)
+    return stan.with_name(f"{stan.stem}_{hotel}{stan.suffix}") if hotel else stan
+
+
+def _podmien(tmp: Path, dest: Path):
+    """
+    Podmiana wyniku na nowy. os.replace nie nadpisze niepustego katalogu (csv), więc stary katalog
+    najpierw odsuwamy, wstawiamy nowy i dopiero wtedy usuwamy stary.
+    """
+    if not dest.is_dir():
+        os.replace(tmp, dest)
+        return
+    stary = dest.with_name(f".{dest.name}.old")
+    if stary.exists():
+        shutil.rmtree(stary)
+    os.replace(dest, stary)
+    os.replace(tmp, dest)
+    shutil.rmtree(stary, ignore_errors=True)
+
+
+def _uzgodnij_dzien(ops: List[str], loyalty: List[str], tolerancja: float, out: str, fmt: str,
+                    cache_dir: Optional[str], opcje: Optional[dict] = None, okno: Optional[dict] = None) -> dict:
+    """
+    opcje — jak w compare.porownaj (parowanie, paruj_rozne_liczby, kara_za_dzien, prog_nazwisk);
+    okno — {"stan": plik, "dni": K, "dzien": RRRR-MM-DD}: pary międzydniowe jak w `run --window`.
+    """
+    from .ingest import wczytaj_wejscia
+    from .compare import porownaj
+    from .report import WRITERS
+
+    t0 = time.perf_counter()
+    lojal_df, ops_df = wczytaj_wejscia(ops, loyalty, cache_dir=cache_dir)
+    wyniki = porownaj(lojal_df, ops_df, tolerancja=tolerancja, **(opcje or {}))
+    if okno:
+        from .window import OknoNiesparowanych, dolacz_do_wynikow
+        stan = OknoNiesparowanych(okno["stan"], okno_dni=okno["dni"], tolerancja=tolerancja,
+                                  paruj_rozne_liczby=(opcje or {}).get("paruj_rozne_liczby", False))
+        miedzy = stan.przetworz_dzien(lojal_df, ops_df, date.fromisoformat(okno["dzien"]))
+        stan.zapisz()
+        wyniki = dolacz_do_wynikow(wyniki, miedzy)
+
+    # zapis atomowy: plik tymczasowy → rename; przerwany dzień nie zostawi „gotowego” wyniku
+    dest = Path(out)
+    tmp = dest.with_name(f".{dest.stem}.part{dest.suffix}")
+    if tmp.exists():
+        shutil.rmtree(tmp) if tmp.is_dir() else tmp.unlink()
+    with contextlib.redirect_stdout(io.StringIO()):   # writer podałby nazwę pliku .part; gotowy dzień zgłasza _wynik
+        WRITERS[fmt](wyniki, tmp)
+    _podmien(tmp, dest)
+    return {
+        "sekcje": {r["Sekcja"]: int(r["Wierszy"]) for _, r in wyniki["00_PODSUMOWANIE"].iterrows()},
+        "czas_s": time.perf_counter() - t0,
+    }
+
+
+def uruchom_backfill(
+    root: str | Path,
+    output_dir: str | Path,
+    tolerancja: float = 0.10,
+    fmt: str = "xlsx",
+    jobs: int = 1,
+    od: Optional[date] = None,
+    do: Optional[date] = None,
+    force: bool = False,
+    cache_dir: Optional[str | Path] = None,
+    opcje: Optional[dict] = None,
+    okno_dni: int = 0,
+    stan_okna: Optional[str | Path] = None,
+) -> pd.DataFrame:
+    """
+    Uzgadnia wszystkie dni z archiwum (równolegle, w ograniczonej puli procesów) i zapisuje wyniki
+    pod deterministycznymi nazwami RRRR-MM-DD[.xlsx]. Dni z istniejącym wynikiem są pomijane
+    (wznowienie po przerwaniu), chyba że force=True. Zwraca dziennik przebiegu.
+
+    opcje — opcje porównania jak w compare.porownaj. okno_dni > 0 — okno międzydniowe (stan per hotel
+    obok `stan_okna`, domyślnie okno_niesparowanych.pkl w output_dir); dzień zależy wtedy od poprzednich,
+    więc dni liczone są po kolei, bez puli.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    stan_okna = Path(stan_okna) if stan_okna else output_dir / "okno_niesparowanych.pkl"
+    cdir = str(cache_dir) if cache_dir else str(output_dir / ".cache")
+
+    pary = skanuj_archiwum(root, cdir, jobs)
+    dziennik, zadania = [], []
+    for klucz, grupa in pary.items():
+        d = date.fromisoformat(klucz[0])
+        if (od and d < od) or (do and d > do):
+            continue
+        wiersz = {"Data": klucz[0], "Hotel": klucz[1] or "", "Raport": nazwa_wyjscia(klucz, fmt),
+                  "Pliki_Operations": len(grupa["operations"]), "Pliki_Loyalty": len(grupa["loyalty"])}
+        if not grupa["operations"] or not grupa["loyalty"]:
+            brak = "Operations" if not grupa["operations"] else "Loyalty"
+            dziennik.append({**wiersz, "Status": "BRAK_PARY", "Uwagi": f"Brak pliku {brak}."})
+            continue
+        dest = output_dir / wiersz["Raport"]
+        if dest.exists() and not force:
+            dziennik.append({**wiersz, "Status": "POMINIĘTY", "Uwagi": "Wynik już istnieje."})
+            continue
+        okno = {"stan": str(plik_okna(stan_okna, klucz[1])), "dni": okno_dni, "dzien": klucz[0]} if okno_dni > 0 else None
+        zadania.append((wiersz, [str(p) for p in grupa["operations"]], [str(p) for p in grupa["loyalty"]], str(dest), okno))
+
+    print(f"📆 Dni do uzgodnienia: {len(zadania)} (pominięte/niekompletne: {len(dziennik)})")
+
+    def _wynik(wiersz, res=None, err=None) -> dict:
+        if err is not None:
+            print(f"❌ {wiersz['Raport']}: {err}")
+            return {**wiersz, "Status": "BŁĄD", "Uwagi": f"{type(err).__name__}: {err}"}
+        print(f"✅ {wiersz['Raport']}")
+        return {**wiersz, "Status": "OK", **res["sekcje"], "Czas_s": round(res["czas_s"], 2)}
+
+    def _odbierz(wiersz, fut) -> dict:
+        try:
+            return _wynik(wiersz, fut.result())
+        except Exception as e:
+            return _wynik(wiersz, err=e)
+
+    if jobs > 1 and len(zadania) > 1 and okno_dni <= 0:
+        # ograniczona liczba zadań w locie — przy tysiącach dni nie kolejkujemy wszystkiego naraz
+        limit = 2 * jobs
+        with ProcessPoolExecutor(max_workers=min(jobs, len(zadania))) as ex:
+            w_locie = {}
+            for wiersz, ops, loy, dest, okno in zadania:
+                w_locie[ex.submit(_uzgodnij_dzien, ops, loy, tolerancja, dest, fmt, cdir, opcje, okno)] = wiersz
+                if len(w_locie) >= limit:
+                    gotowe, _ = wait(w_locie, return_when=FIRST_COMPLETED)
+                    for f in gotowe:
+                        dziennik.append(_odbierz(w_locie.pop(f), f))
+            for f in as_completed(w_locie):
+                dziennik.append(_odbierz(w_locie[f], f))
+    else:
+        # zadania są w kolejności dat — okno międzydniowe dostaje dni po kolei
+        for wiersz, ops, loy, dest, okno in zadania:
+            try:
+                dziennik.append(_wynik(wiersz, _uzgodnij_dzien(ops, loy, tolerancja, dest, fmt, cdir, opcje, okno)))
+            except Exception as e:
+                dziennik.append(_wynik(wiersz, err=e))
+
+    df = pd.DataFrame(dziennik)
+    if not df.empty:
+        df = df.sort_values(["Data", "Hotel"], kind="mergesort").reset_index(drop=True)
+    return df
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from .utils import rodzaj_pliku, hotel_z_nazwy
+
+
+@dataclass
+class Obiekt:
+    """Pliki jednego hotelu (property) znalezione w trybie wsadowym."""
+    hotel: str
+    ops: List[Path] = field(default_factory=list)
+    loyalty: List[Path] = field(default_factory=list)
+
+
+def _hotel_jawny(p: Path, root: Path) -> Optional[str]:
+    # kod w nazwie pliku (H3417_LoyaltyExport_...) albo w nazwie któregoś podfolderu
+    h = hotel_z_nazwy(p.name)
+    if h:
+        return h
+    for part in reversed(p.relative_to(root).parts[:-1]):
+        h = hotel_z_nazwy(part)
+        if h:
+            return h
+    return None
+
+
+def znajdz_obiekty(root: str | Path, tylko_najnowsze: bool = False) -> Dict[str, Obiekt]:
+    """
+    Przeszukuje folder (rekurencyjnie) i grupuje pliki Operations/Loyalty po hotelu.
+    Hotel: kod z nazwy pliku lub podfolderu. Plik bez kodu trafia do hoteli znalezionych w tym samym
+    folderze; w podfolderze bez żadnego kodu hotelem jest nazwa podfolderu; pliki Operations bez kodu
+    leżące w korzeniu są wspólne dla hoteli, które nie mają własnych.
+    """
+    root = Path(root).resolve()
+    obiekty: Dict[str, Obiekt] = {}
+    bez_kodu: Dict[Path, List[Tuple[str, Path]]] = {}
+    hotele_w_folderze: Dict[Path, set] = {}
+    for dirpath, _dirs, files in os.walk(root):
+        for name in files:
+            p = Path(dirpath) / name
+            r = rodzaj_pliku(p)
+            if r is None:
+                continue
+            h = _hotel_jawny(p, root)
+            if h is None:
+                bez_kodu.setdefault(p.parent, []).append((r, p))
+                continue
+            hotele_w_folderze.setdefault(p.parent, set()).add(h)
+            o = obiekty.setdefault(h, Obiekt(h))
+            (o.ops if r == "operations" else o.loyalty).append(p)
+
+    wspolne_ops: List[Path] = []
+    for folder, pliki in bez_kodu.items():
+        hotele = hotele_w_folderze.get(folder)
+        if folder == root and not hotele:
+            wspolne_ops += [p for r, p in pliki if r == "operations"]
+            for r, p in pliki:
+                if r == "loyalty":
+                    print(f"ℹ️ Pomijam (nie wiem, który hotel): {p.name}")
+            continue
+        cele = sorted(hotele) if hotele else [folder.relative_to(root).parts[0]]
+        for h in cele:
+            o = obiekty.setdefault(h, Obiekt(h))
+            for r, p in pliki:
+                (o.ops if r == "operations" else o.loyalty).append(p)
+
+    for o in obiekty.values():
+        if not o.ops:
+            o.ops = list(wspolne_ops)
+        for attr in ("ops", "loyalty"):
+            lista = sorted(getattr(o, attr), key=lambda x: x.stat().st_mtime, reverse=True)
+            setattr(o, attr, lista[:1] if tylko_najnowsze else sorted(lista))
+    return dict(sorted(obiekty.items()))
+
+
+def _uzgodnij_obiekt(hotel: str, ops: List[str], loyalty: List[str], tolerancja: float, out: str, fmt: str) -> dict:
+    from .ingest import wczytaj_wejscia
+    from .compare import porownaj
+    from .report import WRITERS
+
+    t0 = time.perf_counter()
+    lojal_df, ops_df = wczytaj_wejscia(ops, loyalty)
+    wyniki = porownaj(lojal_df, ops_df, tolerancja=tolerancja)
+    WRITERS[fmt](wyniki, Path(out))
+    return {
+        "hotel": hotel,
+        "sekcje": {r["Sekcja"]: int(r["Wierszy"]) for _, r in wyniki["00_PODSUMOWANIE"].iterrows()},
+        "czas_s": time.perf_counter() - t0,
+    }
+
+
+def uruchom_wsadowo(
+    obiekty: Dict[str, Obiekt],
+    output_dir: str | Path,
+    tolerancja: float = 0.10,
+    fmt: str = "xlsx",
+    jobs: int = 1,
+) -> pd.DataFrame:
+    """
+    Uzgadnia każdy hotel osobno (równolegle w procesach przy jobs > 1), zapisuje raport per hotel
+    i zwraca tabelę zbiorczą: hotel × liczności sekcji.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    ext = "" if fmt == "csv" else f".{fmt}"
+
+    zadania, wiersze = {}, []
+    for h, o in obiekty.items():
+        if not o.ops or not o.loyalty:
+            brak = "Operations" if not o.ops else "Loyalty"
+            wiersze.append({"Hotel": h, "Status": "POMINIĘTY", "Uwagi": f"Brak plików {brak}."})
+            continue
+        zadania[h] = ([str(p) for p in o.ops], [str(p) for p in o.loyalty], str(output_dir / f"{h}{ext}"))
+
+    def _wiersz(h, res=None, err=None):
+        o = obiekty[h]
+        w = {"Hotel": h, "Status": "OK" if err is None else "BŁĄD",
+             "Pliki_Operations": ", ".join(p.name for p in o.ops),
+             "Pliki_Loyalty": ", ".join(p.name for p in o.loyalty)}
+        if res:
+            w.update(res["sekcje"])
+            w["Czas_s"] = round(res["czas_s"], 2)
+            w["Raport"] = Path(zadania[h][2]).name
+        if err:
+            w["Uwagi"] = err
+        return w
+
+    if jobs > 1 and len(zadania) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(zadania))) as ex:
+            futs = {ex.submit(_uzgodnij_obiekt, h, ops, loy, tolerancja, out, fmt): h
+                    for h, (ops, loy, out) in zadania.items()}
+            for f in as_completed(futs):
+                h = futs[f]
+                try:
+                    wiersze.append(_wiersz(h, f.result()))
+                    print(f"✅ {h}")
+                except Exception as e:
+                    wiersze.append(_wiersz(h, err=f"{type(e).__name__}: {e}"))
+                    print(f"❌ {h}: {e}")
+    else:
+        for h, (ops, loy, out) in zadania.items():
+            try:
+                wiersze.append(_wiersz(h, _uzgodnij_obiekt(h, ops, loy, tolerancja, out, fmt)))
+                print(f"✅ {h}")
+            except Exception as e:
+                traceback.print_exc()
+                wiersze.append(_wiersz(h, err=f"{type(e).__name__}: {e}"))
+
+    df = pd.DataFrame(wiersze)
+    if df.empty:
+        return df
+    df = df.sort_values("Hotel", kind="mergesort").reset_index(drop=True)
+    # liczności sekcji jako int (pominięte/błędne hotele → 0)
+    sekcje = [c for c in df.columns if c[:2].isdigit()]
+    df[sekcje] = df[sekcje].fillna(0).astype(int)
+    first = ["Hotel", "Status"] + sekcje
+    return df[first + [c for c in df.columns if c not in first]]
@@ -0,0 +1,210 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark potoku na danych syntetycznych (core.generator): odczyt plików, normalizacja, porownaj
+i zapisz_do_excela dla kilku rozmiarów zbioru.
+
+Czasy etapów pochodzą z profilera etapów (core.profiling) — najlepszy z `powtorzenia` przebiegów;
+szczyt pamięci Pythona (tracemalloc) z osobnego przebiegu, żeby śledzenie alokacji nie zawyżało czasów.
+Wyniki trafiają do pliku JSON; porównanie z zapisaną bazą wskazuje etapy wolniejsze lub bardziej
+pamięciożerne o więcej niż próg.
+"""
+
+from __future__ import annotations
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# etap benchmarku → etap profilera
+ETAPY = {
+    "odczyt": "odczyt",
+    "normalizacja": "normalizacja",
+    "porownaj": "porownanie",
+    "zapis_excela": "zapis",
+}
+
+ROZMIARY = (1_000, 10_000, 100_000)
+
+
+def przygotuj_dane(rozmiar: int, folder: str | Path, fmt: str = "xlsx", seed: int = 0) -> Tuple[List[Path], List[Path]]:
+    """
+    (pliki Operations, pliki Loyalty) zbioru o `rozmiar` pobytach. Wygenerowane pliki zostają w `folder`
+    i są używane ponownie przy kolejnych uruchomieniach (generowanie dużych xlsx trwa).
+    """
+    from .generator import partie, zapisz_partie
+
+    kat = Path(folder) / f"{rozmiar}_{seed}_{fmt}"
+    znacznik = kat / "gotowe.json"
+    if znacznik.exists():
+        pliki = [kat / n for n in json.loads(znacznik.read_text(encoding="utf-8"))]
+    else:
+        shutil.rmtree(kat, ignore_errors=True)
+        pliki = zapisz_partie(partie(rozmiar, seed=seed), kat, fmt=fmt)
+        znacznik.write_text(json.dumps([p.name for p in pliki]), encoding="utf-8")
+    return ([p for p in pliki if p.name.startswith("operations")],
+            [p for p in pliki if not p.name.startswith("operations")])
+
+
+def _przebieg(ops_paths: Sequence[Path], loy_paths: Sequence[Path], out: Path):
+    from .ingest import wczytaj_wejscia
+    from .compare import porownaj
+    from .report import zapisz_do_excela
+
+    lojal_df, ops_df = wczytaj_wejscia(ops_paths, loy_paths)
+    wyniki = porownaj(lojal_df, ops_df)
+    with contextlib.redirect_stdout(io.StringIO()):   # bez „Raport zapisany” w każdym przebiegu
+        zapisz_do_excela(wyniki, out)
+
+
+def _etapy(prof) -> Dict[str, dict]:
+    """Zdarzenia profilera zsumowane per etap benchmarku: czas [s], wiersze na wyjściu, szczyt Pythona [MB]."""
+    out: Dict[str, dict] = {}
+    for nazwa, etap in ETAPY.items():
+        zd = [z for z in prof.zdarzenia if z["name"] == etap]
+        if not zd:
+            continue
+        out[nazwa] = {
+            "czas_s": sum(z["dur"] for z in zd) / 1e6,
+            "wiersze": sum(z["args"].get("wiersze_wy", 0) for z in zd) or None,
+            "szczyt_mb": max(z["args"].get("py_szczyt_mb", 0.0) for z in zd),
+        }
+    return out
+
+
+def zmierz(rozmiar: int, ops_paths: Sequence[Path], loy_paths: Sequence[Path],
+           powtorzenia: int = 3, pamiec: bool = True) -> List[dict]:
+    """Wiersze wyników dla jednego rozmiaru: {rozmiar, etap, czas_s, czas_mediana_s, szczyt_mb, wiersze, wyjscie_b}."""
+    from .profiling import Profiler, ProfilerPamieci
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as tmp:
+        out = Path(tmp) / "raport.xlsx"
+        czasy: Dict[str, List[float]] = {}
+        wiersze: Dict[str, Optional[int]] = {}
+        for _ in range(max(1, powtorzenia)):
+            with Profiler() as prof:
+                _przebieg(ops_paths, loy_paths, out)
+            for nazwa, e in _etapy(prof).items():
+                czasy.setdefault(nazwa, []).append(e["czas_s"])
+                wiersze[nazwa] = e["wiersze"]
+        rozmiar_wyjscia = out.stat().st_size
+
+        szczyty: Dict[str, float] = {}
+        if pamiec:
+            # bez migawek (top=0): tylko szczyt alokacji w etapie
+            with ProfilerPamieci(top=0) as prof:
+                _przebieg(ops_paths, loy_paths, out)
+            szczyty = {nazwa: e["szczyt_mb"] for nazwa, e in _etapy(prof).items()}
+
+    wyniki = []
+    for nazwa, cz in czasy.items():
+        cz = sorted(cz)
+        wyniki.append({
+            "rozmiar": rozmiar,
+            "etap": nazwa,
+            "czas_s": round(cz[0], 4),
+            "czas_mediana_s": round(cz[len(cz) // 2], 4),
+            "szczyt_mb": szczyty.get(nazwa),
+            "wiersze": wiersze.get(nazwa),
+            "wyjscie_b": rozmiar_wyjscia if nazwa == "zapis_excela" else None,
+        })
+    return wyniki
+
+
+def metadane(**dodatkowe) -> dict:
+    import numpy as np
+    import pandas as pd
+    return {
+        "data": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "maszyna": f"{platform.node()} / {platform.machine()} / {os.cpu_count()} CPU",
+        "system": platform.platform(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        **dodatkowe,
+    }
+
+
+def uruchom(
+    rozmiary: Sequence[int] = ROZMIARY,
+    folder_danych: str | Path = ".bench",
+    fmt: str = "xlsx",
+    powtorzenia: int = 3,
+    pamiec: bool = True,
+    seed: int = 0,
+    log=print,
+) -> dict:
+    """Cały benchmark: {"meta": ..., "wyniki": [...]} (do zapisz_wyniki / porownaj_z_baza)."""
+    wyniki: List[dict] = []
+    for rozmiar in rozmiary:
+        t0 = time.perf_counter()
+        ops_paths, loy_paths = przygotuj_dane(rozmiar, folder_danych, fmt, seed)
+        log(f"📦 {rozmiar:_} pobytów: dane gotowe ({time.perf_counter() - t0:.1f}s), pomiar…".replace("_", " "))
+        wyniki.extend(zmierz(rozmiar, ops_paths, loy_paths, powtorzenia, pamiec))
+    return {"meta": metadane(rozmiary=list(rozmiary), powtorzenia=powtorzenia, format=fmt, seed=seed),
+            "wyniki": wyniki}
+
+
+def zapisz_wyniki(wynik: dict, plik: str | Path):
+    Path(plik).write_text(json.dumps(wynik, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+def wczytaj_wyniki(plik: str | Path) -> dict:
+    return json.loads(Path(plik).read_text(encoding="utf-8"))
+
+
+def porownaj_z_baza(
+    wynik: dict,
+    baza: dict,
+    prog: float = 0.25,
+    min_czas_s: float = 0.05,
+    min_mb: float = 1.0,
+) -> List[dict]:
+    """
+    Regresje względem bazy: etap (rozmiar × etap obecny w obu) wolniejszy albo z wyższym szczytem pamięci
+    o więcej niż `prog` (0.25 = 25%). Różnice poniżej `min_czas_s` / `min_mb` to szum — nie są regresją.
+    """
+    bazowe = {(w["rozmiar"], w["etap"]): w for w in baza.get("wyniki", [])}
+    regresje = []
+    for w in wynik["wyniki"]:
+        b = bazowe.get((w["rozmiar"], w["etap"]))
+        if b is None:
+            continue
+        for miara, minimum in (("czas_s", min_czas_s), ("szczyt_mb", min_mb)):
+            teraz, bylo = w.get(miara), b.get(miara)
+            if teraz is None or bylo is None:
+                continue
+            if teraz - bylo > minimum and teraz > bylo * (1 + prog):
+                regresje.append({"rozmiar": w["rozmiar"], "etap": w["etap"], "miara": miara,
+                                 "baza": bylo, "teraz": teraz, "zmiana": teraz / bylo - 1 if bylo else float("inf")})
+    return regresje
+
+
+def fmt_wyniki(wynik: dict, baza: Optional[dict] = None) -> str:
+    """Tabela wyników; z bazą — także zmiana czasu względem niej."""
+    bazowe = {(w["rozmiar"], w["etap"]): w for w in (baza or {}).get("wyniki", [])}
+    linie = [f"{'Rozmiar':>10}  {'Etap':<14}{'Czas [s]':>10}{'Mediana [s]':>13}{'Szczyt MB':>11}"
+             f"{'Wyjście MB':>12}{'vs baza':>10}"]
+    for w in wynik["wyniki"]:
+        b = bazowe.get((w["rozmiar"], w["etap"]))
+        zmiana = f"{w['czas_s'] / b['czas_s'] - 1:+.0%}" if b and b.get("czas_s") else "—"
+        mb = "—" if w["szczyt_mb"] is None else f"{w['szczyt_mb']:.1f}"
+        wy = "—" if w["wyjscie_b"] is None else f"{w['wyjscie_b'] / 2**20:.2f}"
+        rozmiar = f"{w['rozmiar']:_}".replace("_", " ")
+        linie.append(f"{rozmiar:>10}  {w['etap']:<14}{w['czas_s']:>10.3f}{w['czas_mediana_s']:>13.3f}"
+                     f"{mb:>11}{wy:>12}{zmiana:>10}")
+    return "\n".join(linie)
+
+
+def fmt_regresje(regresje: List[dict]) -> str:
+    jednostki = {"czas_s": "s", "szczyt_mb": "MB"}
+    return "\n".join(
+        f"  {r['rozmiar']} / {r['etap']} / {r['miara']}: {r['baza']:.3f} → {r['teraz']:.3f} {jednostki[r['miara']]} "
+        f"({r['zmiana']:+.0%})"
+        for r in regresje
+    )
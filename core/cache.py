@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+import pandas as pd
+
+# zmień przy każdej zmianie normalizacji — stare wpisy przestaną pasować
+CACHE_VERSION = 3
+
+
+def _klucz(path: Path, rodzaj: str) -> str:
+    st = path.stat()
+    raw = f"{CACHE_VERSION}|{rodzaj}|{path.resolve()}|{st.st_size}|{st.st_mtime_ns}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class ParseCache:
+    """
+    Dyskowy cache znormalizowanych ramek (pickle), kluczowany ścieżką, rozmiarem i mtime pliku.
+    Zmieniony plik źródłowy = nowy klucz, więc nieaktualne wpisy nigdy nie są zwracane.
+    """
+
+    def __init__(self, folder: str | Path):
+        self.folder = Path(folder)
+        self.folder.mkdir(parents=True, exist_ok=True)
+
+    def _plik(self, path: Path, rodzaj: str) -> Path:
+        return self.folder / f"{rodzaj}_{_klucz(path, rodzaj)}.pkl"
+
+    def get(self, path: str | Path, rodzaj: str) -> Optional[pd.DataFrame]:
+        p = self._plik(Path(path), rodzaj)
+        if not p.exists():
+            return None
+        try:
+            with open(p, "rb") as f:
+                return pickle.load(f)
+        except Exception:
+            # uszkodzony wpis — potraktuj jak brak
+            return None
+
+    def put(self, path: str | Path, rodzaj: str, df: pd.DataFrame) -> None:
+        p = self._plik(Path(path), rodzaj)
+        tmp = p.with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            pickle.dump(df, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, p)
+
+    def get_or_load(self, path: str | Path, rodzaj: str, loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        df = self.get(path, rodzaj)
+        if df is None:
+            df = loader(str(path))
+            self.put(path, rodzaj, df)
+        return df
+
+
+class MemoryCache:
+    """
+    Ciepła pamięć sparsowanych ramek (LRU) dla procesów długo działających (czuwanie, usługa HTTP).
+    Klucz: rozwiązana ścieżka + (rozmiar, mtime) — podmieniony plik jest parsowany ponownie.
+    Bezpieczna wątkowo; zwracane ramki są współdzielone, więc wołający nie powinien ich modyfikować.
+    """
+
+    def __init__(self, max_items: int = 64, disk: Optional[ParseCache] = None):
+        self.max_items = max_items
+        self.disk = disk
+        self.hits = 0
+        self.misses = 0
+        self._items: "OrderedDict[Tuple[str, str], Tuple[Tuple[int, int], pd.DataFrame]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, path: str | Path, rodzaj: str, loader: Callable[[str], pd.DataFrame]) -> pd.DataFrame:
+        p = Path(path).resolve()
+        st = p.stat()
+        sig = (st.st_size, st.st_mtime_ns)
+        key = (str(p), rodzaj)
+        with self._lock:
+            hit = self._items.get(key)
+            if hit is not None and hit[0] == sig:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return hit[1]
+        # parsowanie poza blokadą — inne wątki mogą w tym czasie korzystać z pamięci
+        df = self.disk.get_or_load(p, rodzaj, loader) if self.disk else loader(str(p))
+        with self._lock:
+            self.misses += 1
+            self._items[key] = (sig, df)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+        return df
+
+    def discard(self, path: str | Path):
+        p = str(Path(path).resolve())
+        with self._lock:
+            for key in [k for k in self._items if k[0] == p]:
+                del self._items[key]
+
+    def __len__(self) -> int:
+        return len(self._items)
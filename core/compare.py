@@ -1,212 +1,387 @@
 # -*- coding: utf-8 -*-
 
-from typing import Dict, Set
+from typing import Dict, List, Optional, Sequence
+import numpy as np
 import pandas as pd
 
-from .utils import fmt_set, fmt_list, fmt_list_s, fmt_deltas
+from .utils import fmt_list_s
+from .money import kolumna_groszy, tolerancja_w_groszach, fmt_grosze, fmt_lista_groszy, fmt_roznice_groszy
+from .matching import mapa_pmid, paruj_w_tolerancji, dopasuj_optymalnie
+from .names import IndeksNazwisk, SlownikNazwisk, najlepsza_para
+from .profiling import etap, mierz
 
 
-def porownaj(lojal_df: pd.DataFrame, ops_df: pd.DataFrame, tolerancja: float = 0.10) -> Dict[str, pd.DataFrame]:
-    lojal_df = lojal_df.copy()
-    ops_df   = ops_df.copy()
+# sekcje wyznaczane per PMID (kolejność arkuszy); 07_FREQ liczone osobno, globalnie po nazwiskach
+SEKCJE_PMID = (
+    "01_ZGODNE_≤0,10",
+    "02_NIEZGODNE_>0,10",
+    "03_KARTA_OK_INNE_NAZWISKA",
+    "04_RÓŻNA_LICZBA_POZYCJI",
+    "05_BRAK_KARTY_W_OPERATIONS",
+    "06_KARTY_W_OPERATIONS_BRAK_W_LOYALTY",
+)
+PRZEGLAD = "99_PRZEGLAD_TRANSAKCJI"
+
+
+@mierz("porownanie")
+def porownaj(
+    lojal_df: pd.DataFrame,
+    ops_df: pd.DataFrame,
+    tolerancja: float = 0.10,
+    parowanie: str = "kwota",
+    paruj_rozne_liczby: bool = False,
+    kara_za_dzien: float = 1.0,
+    prog_nazwisk: Optional[float] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Porównanie Loyalty ↔ Operations; zwraca {arkusz: DataFrame} (00_PODSUMOWANIE, 01..07, 99).
+
+    parowanie — jak zestawiać transakcje PMID o równej liczbie pozycji:
+    "kwota" (domyślnie, rosnąco po kwocie), "data" (najbliższa data wyjazdu, potem kwota) albo
+    "optymalne" (przydział minimalizujący sumę |Δ| + kara_za_dzien × odległość dat w dniach).
+    paruj_rozne_liczby — PMID o różnej liczbie pozycji nie trafiają w całości do 04: kwoty zgodne
+    w granicach tolerancji są parowane i klasyfikowane zwykle, a w 04 zostają tylko pozycje bez pary.
+    prog_nazwisk — zgodność nazwisk przybliżona (core.names, podobieństwo 0–1 ≥ prog) zamiast równości
+    napisów; w 99 dochodzi kolumna Podobieństwo_Nazwisk. None = dokładne porównanie.
+    """
+    sekcje = porownaj_pmidy(lojal_df, ops_df, tolerancja, parowanie, paruj_rozne_liczby, kara_za_dzien, prog_nazwisk)
+    with etap("czestotliwosc", wiersze=len(ops_df)) as e:
+        freq_rows = czestotliwosc(ops_df)
+        e.wynik(len(freq_rows))
+    with etap("wyniki", wiersze=len(sekcje[PRZEGLAD])) as e:
+        wyniki = zloz_wyniki(sekcje, freq_rows, podobienstwo=prog_nazwisk is not None)
+        e.wynik(sum(len(df) for df in wyniki.values()))
+    return wyniki
 
-    lojal_df["pair_loyal"] = lojal_df.apply(
-        lambda r: (r["loyal_kwota"], r["loyal_data_str"]) if pd.notna(r["loyal_kwota"]) else None, axis=1
-    )
-    ops_df["pair_ops"] = ops_df.apply(
-        lambda r: (r["ops_kwota"], r["ops_data_str"]) if pd.notna(r["ops_kwota"]) else None, axis=1
-    )
 
-    # grupy po PMID
-    loj_grp = lojal_df.groupby("pmid").agg(
-        loj_pary=("pair_loyal", lambda x: sorted([p for p in x if p is not None], key=lambda t: t[0])),
-        loj_nazwiska=("gosc_nazwisko", lambda x: set(s for s in x if s))
-    ).reset_index()
-    ops_grp = ops_df.groupby("pmid").agg(
-        ops_pary=("pair_ops",  lambda x: sorted([p for p in x if p is not None], key=lambda t: t[0])),
-        ops_nazwiska=("nazwisko", lambda x: set(s for s in x if s))
-    ).reset_index()
-
-    # mapy
-    loj_map, ops_map = {}, {}
-    for _, r in loj_grp.iterrows():
-        kw, dt = zip(*r["loj_pary"]) if r["loj_pary"] else ([], [])
-        loj_map[r["pmid"]] = {"kw": list(kw), "daty": list(dt), "naz": r["loj_nazwiska"]}
-    for _, r in ops_grp.iterrows():
-        kw, dt = zip(*r["ops_pary"]) if r["ops_pary"] else ([], [])
-        ops_map[r["pmid"]] = {"kw": list(kw), "daty": list(dt), "naz": r["ops_nazwiska"]}
-
-    wszystkie_ops_nazwiska: Set[str] = set(ops_df["nazwisko"].dropna().astype(str).tolist())
-    wszystkie_pmid = sorted(set(loj_map) | set(ops_map))
+def porownaj_pmidy(
+    lojal_df: pd.DataFrame,
+    ops_df: pd.DataFrame,
+    tolerancja: float = 0.10,
+    parowanie: str = "kwota",
+    paruj_rozne_liczby: bool = False,
+    kara_za_dzien: float = 1.0,
+    prog_nazwisk: Optional[float] = None,
+    ops_nazwiska: Optional[Sequence[str]] = None,
+    indeks_nazwisk: Optional[IndeksNazwisk] = None,
+) -> Dict[str, List[dict]]:
+    """
+    Część porównania zależna tylko od wierszy danego PMID: {sekcja 01..06 / 99: lista wierszy},
+    wiersze w kolejności PMID. ops_nazwiska — wszystkie nazwiska z Operations do sprawdzenia
+    „globalnie”, gdy ops_df to tylko fragment danych (shard); domyślnie nazwiska z ops_df.
+    indeks_nazwisk — gotowy IndeksNazwisk(ops_nazwiska) (przy prog_nazwisk), żeby wołający kolejne
+    partie / shardy nie budował go od nowa dla każdej; domyślnie budowany tutaj.
+    """
+    with etap("grupowanie", wiersze=len(lojal_df) + len(ops_df)) as e:
+        # kwoty w groszach (int): porównanie z tolerancją dokładne, bez dryfu floatów przy Δ = 0,10
+        tol = tolerancja_w_groszach(tolerancja)
+
+        # mapy {pmid: kwoty/daty} — jedno sortowanie całej ramki zamiast pętli po grupach
+        loj_map = mapa_pmid(lojal_df, kolumna_groszy(lojal_df, "loyal"), "loyal_data_str", "loyal_data", parowanie)
+        ops_map = mapa_pmid(ops_df, kolumna_groszy(ops_df, "ops"), "ops_data_str", "ops_data", parowanie)
+        # nazwiska jako kody int; zgodność w PMID i obecność globalna policzone od razu dla wszystkich PMID
+        naz = SlownikNazwisk(lojal_df["pmid"], lojal_df["gosc_nazwisko"], ops_df["pmid"], ops_df["nazwisko"], ops_nazwiska)
+        if parowanie == "optymalne":
+            dopasuj_optymalnie(loj_map, ops_map, kara_za_dzien)
+
+        wszystkie_pmid = sorted(set(loj_map) | set(ops_map))
+
+        indeks_naz, podob = None, {}
+        if prog_nazwisk is not None:
+            indeks_naz = indeks_nazwisk if indeks_nazwisk is not None else IndeksNazwisk(naz.nazwy[naz.w_ops].tolist())
+
+        rozne_pary = {}
+        if paruj_rozne_liczby:
+            rozne = [p for p in wszystkie_pmid
+                     if p in loj_map and p in ops_map and len(loj_map[p]["kw"]) != len(ops_map[p]["kw"])]
+            rozne_pary = paruj_w_tolerancji(loj_map, ops_map, rozne, tol)
+        e.wynik(len(wszystkie_pmid))
 
     # sekcje
     zgodne, niezgodne, inne_naz = [], [], []
     roznaliczb, brak_w_ops, ops_brak_w_loyal = [], [], []
-    freq_rows, przeglad_rows = [], []
-
-    # porównanie
-    for pmid in wszystkie_pmid:
-        L = loj_map.get(pmid)
-        O = ops_map.get(pmid)
-
-        if L is None and O is not None:
-            przeglad_rows.append({
-                "PMID": pmid,
-                "Kwota_Loyalty": "—", "Kwota_Operations": fmt_list(O["kw"]), "Δ": "—",
-                "Data_Loyalty": "—", "Data_Operations": fmt_list_s(O["daty"]),
-                "Nazwiska_Loyalty": "—", "Nazwiska_Operations": fmt_set(O["naz"]),
-                "Status_Auto": "BRAK_W_LOYALTY", "Uwaga": "Brak transakcji w Loyalty."
-            })
-            ops_brak_w_loyal.append({
-                "PMID": pmid,
-                "Nazwiska_Operations": fmt_set(O["naz"]),
-                "Kwoty_Operations": fmt_list(O["kw"]),
-                "Daty_Operations": fmt_list_s(O["daty"])
-            })
-            continue
-
-        if L is not None and O is None:
-            przeglad_rows.append({
-                "PMID": pmid,
-                "Kwota_Loyalty": fmt_list(L["kw"]), "Kwota_Operations": "—", "Δ": "—",
-                "Data_Loyalty": fmt_list_s(L["daty"]), "Data_Operations": "—",
-                "Nazwiska_Loyalty": fmt_set(L["naz"]), "Nazwiska_Operations": "—",
-                "Status_Auto": "BRAK_W_OPERATIONS", "Uwaga": "Brak transakcji w Operations."
-            })
-            brak_w_ops.append({
-                "PMID": pmid,
-                "Nazwiska_Loyalty": fmt_set(L["naz"]),
-                "Kwoty_Loyalty": fmt_list(L["kw"]),
-                "Daty_Loyalty": fmt_list_s(L["daty"])
-            })
-            continue
-
-        # pmid w obu
-        loj_kw, ops_kw = L["kw"], O["kw"]
-        loj_dt, ops_dt = L["daty"], O["daty"]
-        loj_naz, ops_naz = L["naz"], O["naz"]
-        globalnie_brak_naz = not (loj_naz & wszystkie_ops_nazwiska)
-
-        if len(loj_kw) != len(ops_kw):
-            roznaliczb.append({
-                "PMID": pmid,
-                "Nazwiska_Loyalty": fmt_set(loj_naz), "Nazwiska_Operations": fmt_set(ops_naz),
-                "Kwoty_Loyalty": fmt_list(loj_kw),  "Kwoty_Operations": fmt_list(ops_kw),
-                "Daty_Loyalty": fmt_list_s(loj_dt), "Daty_Operations": fmt_list_s(ops_dt),
-            })
-            przeglad_rows.append({
-                "PMID": pmid,
-                "Kwota_Loyalty": fmt_list(loj_kw), "Kwota_Operations": fmt_list(ops_kw), "Δ": "—",
-                "Data_Loyalty": fmt_list_s(loj_dt), "Data_Operations": fmt_list_s(ops_dt),
-                "Nazwiska_Loyalty": fmt_set(loj_naz), "Nazwiska_Operations": fmt_set(ops_naz),
-                "Status_Auto": "ROZNA_LICZBA_TRANSAKCJI",
-                "Uwaga": "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz else "—"
-            })
-            continue
-
-        roznice = [abs(lv - ov) for lv, ov in zip(loj_kw, ops_kw)]
-        wszystkie_ok = all(d <= tolerancja for d in roznice)
-
-        for lv, ov, dl, do in zip(loj_kw, ops_kw, loj_dt, ops_dt):
-            d = abs(lv - ov)
-            if d <= tolerancja:
-                if (loj_naz & ops_naz):
-                    status = "ZGODNE"
-                    uwaga = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz else "—"
+    przeglad_rows = []
+
+    with etap("klasyfikacja", wiersze=len(wszystkie_pmid)) as e:
+        # porównanie
+        for pmid in wszystkie_pmid:
+            L = loj_map.get(pmid)
+            O = ops_map.get(pmid)
+
+            if L is None and O is not None:
+                przeglad_rows.append({
+                    "PMID": pmid,
+                    "Kwota_Loyalty": "—", "Kwota_Operations": fmt_lista_groszy(O["kw"]), "Δ": "—",
+                    "Data_Loyalty": "—", "Data_Operations": fmt_list_s(O["daty"]),
+                    "Nazwiska_Loyalty": "—", "Nazwiska_Operations": naz.tekst(naz.kody("operations", pmid)),
+                    "Status_Auto": "BRAK_W_LOYALTY", "Uwaga": "Brak transakcji w Loyalty."
+                })
+                ops_brak_w_loyal.append({
+                    "PMID": pmid,
+                    "Nazwiska_Operations": naz.tekst(naz.kody("operations", pmid)),
+                    "Kwoty_Operations": fmt_lista_groszy(O["kw"]),
+                    "Daty_Operations": fmt_list_s(O["daty"])
+                })
+                continue
+
+            if L is not None and O is None:
+                przeglad_rows.append({
+                    "PMID": pmid,
+                    "Kwota_Loyalty": fmt_lista_groszy(L["kw"]), "Kwota_Operations": "—", "Δ": "—",
+                    "Data_Loyalty": fmt_list_s(L["daty"]), "Data_Operations": "—",
+                    "Nazwiska_Loyalty": naz.tekst(naz.kody("loyalty", pmid)), "Nazwiska_Operations": "—",
+                    "Status_Auto": "BRAK_W_OPERATIONS", "Uwaga": "Brak transakcji w Operations."
+                })
+                brak_w_ops.append({
+                    "PMID": pmid,
+                    "Nazwiska_Loyalty": naz.tekst(naz.kody("loyalty", pmid)),
+                    "Kwoty_Loyalty": fmt_lista_groszy(L["kw"]),
+                    "Daty_Loyalty": fmt_list_s(L["daty"])
+                })
+                continue
+
+            # pmid w obu
+            loj_kw, ops_kw = L["kw"], O["kw"]
+            loj_dt, ops_dt = L["daty"], O["daty"]
+            loj_kody, ops_kody = naz.kody("loyalty", pmid), naz.kody("operations", pmid)
+            t_loj, t_ops = naz.tekst(loj_kody), naz.tekst(ops_kody)
+            globalnie_brak_naz = pmid not in naz.globalnie
+            naz_ok = pmid in naz.wspolne
+            uwaga_podobne = None
+            if indeks_naz is not None:
+                loj_naz = naz.zbior(loj_kody)
+                wynik, a, b = najlepsza_para(loj_naz, naz.zbior(ops_kody))
+                podob[pmid] = wynik
+                if not naz_ok and wynik >= prog_nazwisk:
+                    naz_ok = True
+                    uwaga_podobne = f"Nazwiska podobne ({wynik:.2f}): {a} ~ {b}"
+                if globalnie_brak_naz:
+                    globalnie_brak_naz = all(indeks_naz.najlepszy_wynik(n, prog_nazwisk) < prog_nazwisk for n in loj_naz)
+
+            uwaga_glob = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz else "—"
+
+            if pmid in rozne_pary:
+                pary, reszta_l, reszta_o = rozne_pary[pmid]
+                pl_kw = [loj_kw[i] for i, _ in pary]
+                po_kw = [ops_kw[j] for _, j in pary]
+                for i, j in pary:
+                    lv, ov = loj_kw[i], ops_kw[j]
+                    if naz_ok:
+                        status, uwaga = "ZGODNE", uwaga_glob if globalnie_brak_naz else (uwaga_podobne or "—")
+                    else:
+                        status = "INNE_NAZWISKA"
+                        uwaga = uwaga_glob if globalnie_brak_naz \
+                            else f"Różne nazwiska: Loyalty={t_loj} vs Operations={t_ops}"
+                    przeglad_rows.append({
+                        "PMID": pmid,
+                        "Kwota_Loyalty": fmt_grosze(lv), "Kwota_Operations": fmt_grosze(ov), "Δ": fmt_grosze(abs(lv - ov)),
+                        "Data_Loyalty": loj_dt[i], "Data_Operations": ops_dt[j],
+                        "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                        "Status_Auto": status, "Uwaga": uwaga
+                    })
+                for i in reszta_l:
+                    przeglad_rows.append({
+                        "PMID": pmid,
+                        "Kwota_Loyalty": fmt_grosze(loj_kw[i]), "Kwota_Operations": "—", "Δ": "—",
+                        "Data_Loyalty": loj_dt[i], "Data_Operations": "—",
+                        "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                        "Status_Auto": "ROZNA_LICZBA_TRANSAKCJI",
+                        "Uwaga": uwaga_glob if globalnie_brak_naz else "Pozycja Loyalty bez pary w Operations."
+                    })
+                for j in reszta_o:
+                    przeglad_rows.append({
+                        "PMID": pmid,
+                        "Kwota_Loyalty": "—", "Kwota_Operations": fmt_grosze(ops_kw[j]), "Δ": "—",
+                        "Data_Loyalty": "—", "Data_Operations": ops_dt[j],
+                        "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                        "Status_Auto": "ROZNA_LICZBA_TRANSAKCJI",
+                        "Uwaga": uwaga_glob if globalnie_brak_naz else "Pozycja Operations bez pary w Loyalty."
+                    })
+                if pary:
+                    target = zgodne if naz_ok else inne_naz
+                    target.append({
+                        "PMID": pmid,
+                        "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                        "Kwoty_Loyalty": fmt_lista_groszy(pl_kw),  "Kwoty_Operations": fmt_lista_groszy(po_kw),
+                        "Daty_Loyalty": fmt_list_s([loj_dt[i] for i, _ in pary]),
+                        "Daty_Operations": fmt_list_s([ops_dt[j] for _, j in pary]),
+                        "Różnice_Δ": fmt_roznice_groszy(pl_kw, po_kw)
+                    })
+                roznaliczb.append({
+                    "PMID": pmid,
+                    "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                    "Kwoty_Loyalty": fmt_lista_groszy([loj_kw[i] for i in reszta_l]),
+                    "Kwoty_Operations": fmt_lista_groszy([ops_kw[j] for j in reszta_o]),
+                    "Daty_Loyalty": fmt_list_s([loj_dt[i] for i in reszta_l]),
+                    "Daty_Operations": fmt_list_s([ops_dt[j] for j in reszta_o]),
+                    "Sparowane": len(pary),
+                })
+                continue
+
+            if len(loj_kw) != len(ops_kw):
+                roznaliczb.append({
+                    "PMID": pmid,
+                    "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                    "Kwoty_Loyalty": fmt_lista_groszy(loj_kw),  "Kwoty_Operations": fmt_lista_groszy(ops_kw),
+                    "Daty_Loyalty": fmt_list_s(loj_dt), "Daty_Operations": fmt_list_s(ops_dt),
+                })
+                przeglad_rows.append({
+                    "PMID": pmid,
+                    "Kwota_Loyalty": fmt_lista_groszy(loj_kw), "Kwota_Operations": fmt_lista_groszy(ops_kw), "Δ": "—",
+                    "Data_Loyalty": fmt_list_s(loj_dt), "Data_Operations": fmt_list_s(ops_dt),
+                    "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                    "Status_Auto": "ROZNA_LICZBA_TRANSAKCJI",
+                    "Uwaga": "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz else "—"
+                })
+                continue
+
+            roznice = [abs(lv - ov) for lv, ov in zip(loj_kw, ops_kw)]
+            wszystkie_ok = all(d <= tol for d in roznice)
+
+            for lv, ov, dl, do in zip(loj_kw, ops_kw, loj_dt, ops_dt):
+                d = abs(lv - ov)
+                if d <= tol:
+                    if naz_ok:
+                        status = "ZGODNE"
+                        uwaga = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz \
+                            else (uwaga_podobne or "—")
+                    else:
+                        status = "INNE_NAZWISKA"
+                        uwaga = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz \
+                            else f"Różne nazwiska: Loyalty={t_loj} vs Operations={t_ops}"
                 else:
-                    status = "INNE_NAZWISKA"
-                    uwaga = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz \
-                        else f"Różne nazwiska: Loyalty={fmt_set(loj_naz)} vs Operations={fmt_set(ops_naz)}"
+                    status = "ROZNICA_KWOT"
+                    uwaga = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz else "—"
+
+                przeglad_rows.append({
+                    "PMID": pmid,
+                    "Kwota_Loyalty": fmt_grosze(lv), "Kwota_Operations": fmt_grosze(ov), "Δ": fmt_grosze(d),
+                    "Data_Loyalty": dl, "Data_Operations": do,
+                    "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                    "Status_Auto": status, "Uwaga": uwaga
+                })
+
+            if wszystkie_ok:
+                target = zgodne if naz_ok else inne_naz
+                target.append({
+                    "PMID": pmid,
+                    "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                    "Kwoty_Loyalty": fmt_lista_groszy(loj_kw),  "Kwoty_Operations": fmt_lista_groszy(ops_kw),
+                    "Daty_Loyalty": fmt_list_s(loj_dt), "Daty_Operations": fmt_list_s(ops_dt),
+                    "Różnice_Δ": fmt_roznice_groszy(loj_kw, ops_kw)
+                })
             else:
-                status = "ROZNICA_KWOT"
-                uwaga = "Nazwisko z Loyalty nie występuje w Operations (globalnie)." if globalnie_brak_naz else "—"
-
-            przeglad_rows.append({
-                "PMID": pmid,
-                "Kwota_Loyalty": f"{lv:.2f}", "Kwota_Operations": f"{ov:.2f}", "Δ": f"{d:.2f}",
-                "Data_Loyalty": dl, "Data_Operations": do,
-                "Nazwiska_Loyalty": fmt_set(loj_naz), "Nazwiska_Operations": fmt_set(ops_naz),
-                "Status_Auto": status, "Uwaga": uwaga
-            })
-
-        if wszystkie_ok:
-            target = zgodne if (loj_naz & ops_naz) else inne_naz
-            target.append({
-                "PMID": pmid,
-                "Nazwiska_Loyalty": fmt_set(loj_naz), "Nazwiska_Operations": fmt_set(ops_naz),
-                "Kwoty_Loyalty": fmt_list(loj_kw),  "Kwoty_Operations": fmt_list(ops_kw),
-                "Daty_Loyalty": fmt_list_s(loj_dt), "Daty_Operations": fmt_list_s(ops_dt),
-                "Różnice_Δ": fmt_deltas(loj_kw, ops_kw)
-            })
-        else:
-            niezgodne.append({
-                "PMID": pmid,
-                "Nazwiska_Loyalty": fmt_set(loj_naz), "Nazwiska_Operations": fmt_set(ops_naz),
-                "Kwoty_Loyalty": fmt_list(loj_kw),  "Kwoty_Operations": fmt_list(ops_kw),
-                "Daty_Loyalty": fmt_list_s(loj_dt), "Daty_Operations": fmt_list_s(ops_dt),
-                "Różnice_Δ": fmt_deltas(loj_kw, ops_kw)
-            })
-
-    # FREQ
-    ops_tmp = ops_df.copy()
-    ops_tmp["ma_punkty"] = ops_tmp["ops_punkty"].fillna(0) > 0
-    freq = ops_tmp.groupby("nazwisko").agg(
-        Wiersze=("nazwisko","size"),
-        Wiersze_z_punktami=("ma_punkty","sum")
-    ).reset_index()
-    for _, r in freq.iterrows():
-        nazw, rows, zpkt = r["nazwisko"] or "—", int(r["Wiersze"]), int(r["Wiersze_z_punktami"])
-        if rows <= 2: continue
-        if rows == 3 and zpkt == 2: status, uw = "OK", "3 wpisy, punkty za 2 — dozwolone."
-        elif zpkt >= rows:          status, uw = "OSTRZEŻENIE", "Punkty za wszystkie — możliwe duplikaty."
-        else:                       status, uw = "INFO", "Inny przypadek — do weryfikacji."
-        freq_rows.append({"Nazwisko": nazw, "Wiersze": rows, "Wiersze_z_punktami": zpkt, "Status": status, "Uwagi": uw})
-
-    # PRZEGLĄD
-    df_przeglad = pd.DataFrame(przeglad_rows)
-    if not df_przeglad.empty:
-        def _kat(s):  return "OK" if s=="ZGODNE" else "PROBLEM"
-        def _prio(s):
-            if s in ("ROZNICA_KWOT", "ROZNA_LICZBA_TRANSAKCJI", "BRAK_W_OPERATIONS", "BRAK_W_LOYALTY"): return 1
-            if s=="INNE_NAZWISKA": return 2
-            return 3
-        df_przeglad["Kategoria"] = df_przeglad["Status_Auto"].map(_kat)
-        df_przeglad["Priorytet"] = df_przeglad["Status_Auto"].map(_prio)
-        df_przeglad["Status_Manual"] = ""
-        df_przeglad["Status_Final"]  = df_przeglad["Status_Auto"]
-
-        order = ["Kategoria","Priorytet","Status_Auto","Status_Manual","Status_Final",
-                 "PMID","Nazwiska_Loyalty","Nazwiska_Operations",
-                 "Kwota_Loyalty","Kwota_Operations","Δ",
-                 "Data_Loyalty","Data_Operations","Uwaga"]
-        df_przeglad = df_przeglad[order].sort_values(
-            ["Kategoria","Priorytet","PMID"], ascending=[True,True,True], kind="mergesort"
-        )
-    else:
-        df_przeglad = pd.DataFrame(columns=[
-            "Kategoria","Priorytet","Status_Auto","Status_Manual","Status_Final",
-            "PMID","Nazwiska_Loyalty","Nazwiska_Operations",
-            "Kwota_Loyalty","Kwota_Operations","Δ","Data_Loyalty","Data_Operations","Uwaga"
-        ])
-
-    wyniki = {
-        "00_PODSUMOWANIE": pd.DataFrame([
-            {"Sekcja":"01_ZGODNE_≤0,10","Wierszy":len(zgodne)},
-            {"Sekcja":"02_NIEZGODNE_>0,10","Wierszy":len(niezgodne)},
-            {"Sekcja":"03_KARTA_OK_INNE_NAZWISKA","Wierszy":len(inne_naz)},
-            {"Sekcja":"04_RÓŻNA_LICZBA_POZYCJI","Wierszy":len(roznaliczb)},
-            {"Sekcja":"05_BRAK_KARTY_W_OPERATIONS","Wierszy":len(brak_w_ops)},
-            {"Sekcja":"06_KARTY_W_OPERATIONS_BRAK_W_LOYALTY","Wierszy":len(ops_brak_w_loyal)},
-            {"Sekcja":"07_FREQ","Wierszy":len(freq_rows)},
-            {"Sekcja":"99_PRZEGLAD_TRANSAKCJI","Wierszy":len(df_przeglad)},
-        ]),
-        "01_ZGODNE_≤0,10": pd.DataFrame(zgodne),
-        "02_NIEZGODNE_>0,10": pd.DataFrame(niezgodne),
-        "03_KARTA_OK_INNE_NAZWISKA": pd.DataFrame(inne_naz),
-        "04_RÓŻNA_LICZBA_POZYCJI": pd.DataFrame(roznaliczb),
-        "05_BRAK_KARTY_W_OPERATIONS": pd.DataFrame(brak_w_ops),
-        "06_KARTY_W_OPERATIONS_BRAK_W_LOYALTY": pd.DataFrame(ops_brak_w_loyal),
-        "07_FREQ": pd.DataFrame(freq_rows),
-        "99_PRZEGLAD_TRANSAKCJI": df_przeglad,
-    }
+                niezgodne.append({
+                    "PMID": pmid,
+                    "Nazwiska_Loyalty": t_loj, "Nazwiska_Operations": t_ops,
+                    "Kwoty_Loyalty": fmt_lista_groszy(loj_kw),  "Kwoty_Operations": fmt_lista_groszy(ops_kw),
+                    "Daty_Loyalty": fmt_list_s(loj_dt), "Daty_Operations": fmt_list_s(ops_dt),
+                    "Różnice_Δ": fmt_roznice_groszy(loj_kw, ops_kw)
+                })
+        e.wynik(len(przeglad_rows))
+
+    if indeks_naz is not None:
+        for r in przeglad_rows:
+            r["Podobieństwo_Nazwisk"] = f"{podob[r['PMID']]:.2f}" if r["PMID"] in podob else "—"
+
+    return dict(zip(SEKCJE_PMID + (PRZEGLAD,),
+                    (zgodne, niezgodne, inne_naz, roznaliczb, brak_w_ops, ops_brak_w_loyal, przeglad_rows)))
+
+
+def czestotliwosc(ops_df: pd.DataFrame) -> List[dict]:
+    """07_FREQ: nazwiska z więcej niż 2 wierszami w Operations (globalnie, niezależnie od PMID)."""
+    ma_punkty = ops_df["ops_punkty"].fillna(0) > 0
+    freq = ma_punkty.groupby(ops_df["nazwisko"], observed=True).agg(["size", "sum"])
+    freq = freq.rename(columns={"size": "Wiersze", "sum": "Wiersze_z_punktami"}).rename_axis("nazwisko").reset_index()
+    return statusy_czestotliwosci(freq)
+
+
+def statusy_czestotliwosci(freq: pd.DataFrame) -> List[dict]:
+    """Wiersze 07_FREQ z agregatu {nazwisko, Wiersze, Wiersze_z_punktami} (posortowanego po nazwisku)."""
+    freq = freq[freq["Wiersze"] > 2]
+    if freq.empty:
+        return []
+    rows = freq["Wiersze"].astype("int64").to_numpy()
+    zpkt = freq["Wiersze_z_punktami"].astype("int64").to_numpy()
+    ok, ostrz = (rows == 3) & (zpkt == 2), zpkt >= rows
+    nazw = freq["nazwisko"].astype(object)
+    return pd.DataFrame({
+        "Nazwisko": nazw.where(nazw != "", "—").to_numpy(),
+        "Wiersze": rows,
+        "Wiersze_z_punktami": zpkt,
+        "Status": np.select([ok, ostrz], ["OK", "OSTRZEŻENIE"], "INFO"),
+        "Uwagi": np.select([ok, ostrz], ["3 wpisy, punkty za 2 — dozwolone.", "Punkty za wszystkie — możliwe duplikaty."],
+                           "Inny przypadek — do weryfikacji."),
+    }).to_dict("records")
+
+
+def kategoria(status: str) -> str:
+    return "OK" if status == "ZGODNE" else "PROBLEM"
+
+
+def priorytet(status: str) -> int:
+    if status in ("ROZNICA_KWOT", "ROZNA_LICZBA_TRANSAKCJI", "BRAK_W_OPERATIONS", "BRAK_W_LOYALTY"): return 1
+    if status == "INNE_NAZWISKA": return 2
+    return 3
+
+
+def kolumny_przegladu(podobienstwo: bool = False) -> List[str]:
+    order = ["Kategoria","Priorytet","Status_Auto","Status_Manual","Status_Final",
+             "PMID","Nazwiska_Loyalty","Nazwiska_Operations",
+             "Kwota_Loyalty","Kwota_Operations","Δ",
+             "Data_Loyalty","Data_Operations","Uwaga"]
+    if podobienstwo:
+        order.insert(order.index("Nazwiska_Operations") + 1, "Podobieństwo_Nazwisk")
+    return order
+
+
+def ramka_przegladu(wiersze: List[dict], podobienstwo: bool = False) -> pd.DataFrame:
+    """Arkusz 99 z wierszy przeglądu (w kolejności PMID): kolumny statusów, sortowanie Kategoria → Priorytet → PMID."""
+    df_przeglad = pd.DataFrame(wiersze)
+    if df_przeglad.empty:
+        return pd.DataFrame(columns=kolumny_przegladu(podobienstwo))
+    df_przeglad["Kategoria"] = df_przeglad["Status_Auto"].map(kategoria)
+    df_przeglad["Priorytet"] = df_przeglad["Status_Auto"].map(priorytet)
+    df_przeglad["Status_Manual"] = ""
+    df_przeglad["Status_Final"]  = df_przeglad["Status_Auto"]
+    return df_przeglad[kolumny_przegladu(podobienstwo)].sort_values(
+        ["Kategoria","Priorytet","PMID"], ascending=[True,True,True], kind="mergesort"
+    )
+
+
+def zloz_wyniki(sekcje: Dict[str, List[dict]], freq_rows: List[dict], podobienstwo: bool = False) -> Dict[str, pd.DataFrame]:
+    """Składa arkusze wyniku z wierszy sekcji (porownaj_pmidy) i 07_FREQ (czestotliwosc)."""
+    df_przeglad = ramka_przegladu(sekcje[PRZEGLAD], podobienstwo)
+
+    wyniki = {"00_PODSUMOWANIE": pd.DataFrame(
+        [{"Sekcja": k, "Wierszy": len(sekcje[k])} for k in SEKCJE_PMID]
+        + [{"Sekcja": "07_FREQ", "Wierszy": len(freq_rows)},
+           {"Sekcja": PRZEGLAD, "Wierszy": len(df_przeglad)}]
+    )}
+    for k in SEKCJE_PMID:
+        wyniki[k] = pd.DataFrame(sekcje[k])
+    wyniki["07_FREQ"] = pd.DataFrame(freq_rows)
+    wyniki[PRZEGLAD] = df_przeglad
     return wyniki
+
+
+def dodaj_sekcje(wyniki: Dict[str, pd.DataFrame], nazwa: str, sekcja: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Wstawia dodatkowy arkusz `nazwa` przed 99_* (lub na koniec) i jego liczność do 00_PODSUMOWANIE."""
+    out: Dict[str, pd.DataFrame] = {}
+    for k, v in wyniki.items():
+        if k.startswith("99_"):
+            out[nazwa] = sekcja
+        out[k] = v
+    out.setdefault(nazwa, sekcja)
+
+    pod = out["00_PODSUMOWANIE"]
+    pod = pod[pod["Sekcja"] != nazwa]
+    i99 = pod.index[pod["Sekcja"].str.startswith("99_")]
+    wiersz = pd.DataFrame([{"Sekcja": nazwa, "Wierszy": len(sekcja)}])
+    if len(i99):
+        pos = pod.index.get_loc(i99[0])
+        pod = pd.concat([pod.iloc[:pos], wiersz, pod.iloc[pos:]], ignore_index=True)
+    else:
+        pod = pd.concat([pod, wiersz], ignore_index=True)
+    out["00_PODSUMOWANIE"] = pod
+    return out
@@ -17,6 +17,11 @@ COLS_O = {
     "dep": "Check-out date",  # opcjonalnie
 }
 
+# indeks wiersza nagłówka (header= w read_excel): Loyalty — 13. wiersz, Operations — 3. wiersz;
+# dane zaczynają się wiersz niżej, więc nr wiersza w arkuszu = indeks ramki + NAGLOWEK + 2
+NAGLOWEK_L = 12
+NAGLOWEK_O = 2
+
 STATUS_ALLOWED = [
     "ZGODNE",
     "INNE_NAZWISKA",
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Wykrywanie zdublowanych transakcji: ten sam PMID, kwota, data wyjazdu i nazwisko więcej niż raz
+po jednej stronie — np. pobyt zaksięgowany dwa razy albo ten sam wiersz z nakładających się eksportów.
+
+Klucz wiersza to 64-bitowy odcisk (pd.util.hash_pandas_object) liczony wektorowo na całej kolumnie,
+więc wykrycie jest liniowe także dla milionów wierszy; grupowanie tylko na wierszach z powtórzonym odciskiem.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .compare import dodaj_sekcje
+from .money import kolumna_groszy, grosze_na_zl
+
+_SEKCJA = "09_DUPLIKATY"
+
+# strona → (etykieta, kolumna nazwiska, prefiks kolumn kwoty/daty)
+_STRONY = {
+    "loyalty": ("Loyalty", "gosc_nazwisko", "loyal"),
+    "operations": ("Operations", "nazwisko", "ops"),
+}
+
+
+def kolumny_klucza(df: pd.DataFrame, rodzaj: str) -> pd.DataFrame:
+    """Znormalizowane kolumny biznesowe wiersza: PMID, kwota w groszach, data wyjazdu, nazwisko."""
+    _, kol_naz, pref = _STRONY[rodzaj]
+    return pd.DataFrame({
+        "pmid": df["pmid"],
+        "grosze": kolumna_groszy(df, pref),
+        "data": df[f"{pref}_data_str"],
+        "nazwisko": df[kol_naz],
+    }, index=df.index)
+
+
+# odcisk braku w kolumnie tekstowej (None, NaN i <NA> hashowane jednakowo)
+_HASH_BRAKU = pd.util.hash_array(np.array([None], dtype=object), categorize=False)[0]
+
+
+def _hash_kolumny(s: pd.Series) -> np.ndarray:
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        # słownik hashowany raz, wiersze przez kody — wartość jak dla zwykłego napisu
+        kat = _hash_kolumny(pd.Series(s.cat.categories, dtype=object))
+        kody = s.cat.codes.to_numpy()
+        return np.where(kody >= 0, kat[np.maximum(kody, 0)], _HASH_BRAKU)
+    if s.dtype == object or isinstance(s.dtype, pd.StringDtype):
+        arr = s.to_numpy(dtype=object)
+        braki = pd.isna(arr)
+        if braki.any():
+            arr = np.where(braki, None, arr)
+        return pd.util.hash_array(arr, categorize=False)
+    return pd.util.hash_pandas_object(s, index=False).to_numpy()
+
+
+def odcisk(klucz: pd.DataFrame) -> np.ndarray:
+    """
+    Odcisk (uint64) każdego wiersza ramki — stabilny między procesami i uruchomieniami
+    (w przeciwieństwie do hash() Pythona); categorical, napisy Arrow i object z tym samym
+    tekstem dają ten sam odcisk, brak (None/NaN/<NA>) w kolumnie tekstowej — zawsze ten sam.
+    """
+    h = np.zeros(len(klucz), dtype=np.uint64)
+    for c in klucz.columns:
+        h = (h * np.uint64(0x100000001B3)) ^ _hash_kolumny(klucz[c])
+    return h
+
+
+def wykryj_duplikaty(lojal_df: pd.DataFrame, ops_df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Sekcja 09_DUPLIKATY: jeden wiersz na powtórzoną transakcję (Strona, PMID, Nazwisko, Kwota, Data,
+    Wystąpienia, Źródła). Wystąpienia w kilku plikach wskazują na nakładające się eksporty,
+    w jednym pliku — na możliwe podwójne zaksięgowanie.
+    """
+    czesci: List[pd.DataFrame] = []
+    for rodzaj, df in (("loyalty", lojal_df), ("operations", ops_df)):
+        if df.empty or "pmid" not in df.columns:
+            continue
+        klucz = kolumny_klucza(df, rodzaj)
+        h = pd.Series(odcisk(klucz), index=df.index)
+        powt = h.duplicated(keep=False).to_numpy()
+        if not powt.any():
+            continue
+        sub = klucz[powt].assign(_h=h[powt])
+        sub["Źródło"] = df.loc[powt, "Źródło"].astype(object) if "Źródło" in df.columns else "—"
+        g = sub.groupby("_h", sort=False)
+        wynik = g.first().assign(
+            Wystąpienia=g.size(),
+            Plików=g["Źródło"].nunique(),
+            Źródła=g["Źródło"].agg(lambda s: ", ".join(sorted(set(map(str, s))))),
+        )
+        wynik.insert(0, "Strona", _STRONY[rodzaj][0])
+        czesci.append(wynik)
+
+    kolumny = ["Strona", "PMID", "Nazwisko", "Kwota", "Data", "Wystąpienia", "Źródła", "Uwaga"]
+    if not czesci:
+        return pd.DataFrame(columns=kolumny)
+    out = pd.concat(czesci, ignore_index=True)
+    out["PMID"] = out["pmid"].astype(object)
+    out["Nazwisko"] = out["nazwisko"].astype(object)
+    out["Kwota"] = grosze_na_zl(out["grosze"])
+    out["Data"] = out["data"].astype(object)
+    out["Uwaga"] = np.where(out["Plików"] > 1, "W kilku plikach — nakładające się eksporty?",
+                            "W jednym pliku — możliwe podwójne zaksięgowanie.")
+    return out[kolumny].sort_values(["Strona", "PMID"], kind="mergesort", ignore_index=True)
+
+
+def usun_duplikaty_plikow(
+    df: pd.DataFrame,
+    rodzaj: str,
+    tryb: str = "usun",
+    raport: Optional[List[dict]] = None,
+) -> pd.DataFrame:
+    """
+    Scalanie nakładających się eksportów: wiersz, który już był w jednym z wcześniejszych plików
+    (ten sam odcisk PMID/kwota/data/nazwisko), jest usuwany (tryb="usun") albo tylko oznaczany
+    w kolumnie „Duplikat_z” nazwą pliku, w którym wystąpił pierwszy raz (tryb="oznacz").
+    Liczone z krotnością: k-te wystąpienie odcisku w pliku jest duplikatem tylko wtedy, gdy
+    któryś wcześniejszy plik też ma co najmniej k takich wierszy — powtórzenia w obrębie jednego pliku
+    (np. dwa takie same pobyty) zostają. „Źródło” zachowanego wiersza to plik pierwszego wystąpienia.
+    Przy podanym `raport` dopisuje {Strona, Plik, Wierszy, Duplikaty} dla każdego pliku.
+    """
+    if tryb not in ("usun", "oznacz"):
+        raise ValueError(f"Nieznany tryb deduplikacji: {tryb!r} (dostępne: usun, oznacz)")
+    if df.empty or "Źródło" not in df.columns or df["Źródło"].nunique() < 2:
+        return df
+
+    h = odcisk(kolumny_klucza(df, rodzaj))
+    plik = pd.factorize(df["Źródło"], sort=False)[0]
+    # numer wystąpienia odcisku w obrębie pliku; para (odcisk, numer) już widziana = wiersz z wcześniejszego pliku
+    nr = pd.Series(h).groupby([plik, h], sort=False).cumcount().to_numpy()
+    klucz = pd.DataFrame({"h": h, "nr": nr})
+    dup = klucz.duplicated(keep="first").to_numpy()
+
+    if raport is not None:
+        zrodla = df["Źródło"].astype(object)
+        licz = pd.Series(dup).groupby(zrodla.to_numpy(), sort=False).agg(["size", "sum"])
+        for nazwa, r in licz.iterrows():
+            raport.append({"Strona": _STRONY[rodzaj][0], "Plik": nazwa, "Wierszy": int(r["size"]),
+                           "Duplikaty": int(r["sum"])})
+
+    if tryb == "usun":
+        return df[~dup].reset_index(drop=True)
+    out = df.copy()
+    pierwszy = df["Źródło"].astype(object).groupby([h, nr], sort=False).transform("first")
+    out["Duplikat_z"] = pierwszy.where(dup, None).to_numpy()
+    return out
+
+
+def fmt_raport_dedup(raport: List[dict]) -> str:
+    if not raport:
+        return ""
+    return pd.DataFrame(raport)[["Strona", "Plik", "Wierszy", "Duplikaty"]].to_string(index=False)
+
+
+def dolacz_do_wynikow(wyniki: Dict[str, pd.DataFrame], sekcja: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Dodaje sekcję 09_DUPLIKATY (przed 99_*) i jej liczność w 00_PODSUMOWANIE."""
+    return dodaj_sekcje(wyniki, _SEKCJA, sekcja)
@@ -0,0 +1,347 @@
+# -*- coding: utf-8 -*-
+"""
+Testy różnicowe silników porównania: wynik kandydata (compare.porownaj, porownaj_rownolegle,
+porownaj_poza_pamiecia, dowolna szybsza implementacja) ma być identyczny z wzorcem — te same arkusze,
+kolumny, wiersze, kolejność (sort_values(["Kategoria","Priorytet","PMID"], kind="mergesort") w 99)
+i wartości komórek.
+
+Wzorcem jest zamrożona kopia porównania sprzed optymalizacji (core.reference), więc regresja w samym
+porownaj też jest wykrywana. Opcji, których tamten kod nie znał (parowanie po dacie / optymalne,
+paruj_rozne_liczby, prog_nazwisk), nie ma z czym zestawić — dla nich wzorcem jest porownaj, a kandydatami
+pozostałe silniki.
+
+Zbiory: losowe (losowy_zbior — własności trudne dla porównania: kolizje PMID, kwoty na granicy
+tolerancji, brak kwot/dat/nazwisk, znaki diakrytyczne, puste strony), syntetyczne pliki z core.generator
+(także przez odczyt plików) i prawdziwe eksporty.
+"""
+
+from __future__ import annotations
+import importlib
+import tempfile
+import traceback
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .compare import porownaj
+from .reference import porownaj_wzorzec
+from .utils import fmt_date
+
+# zestawy opcji porownaj sprawdzane na każdym zbiorze
+OPCJE: List[dict] = [
+    {},
+    {"parowanie": "data"},
+    {"parowanie": "optymalne", "kara_za_dzien": 0.5},
+    {"paruj_rozne_liczby": True},
+    {"prog_nazwisk": 0.85},
+    {"tolerancja": 0.0},
+]
+
+_NAZWISKA = np.array(["KOWALSKI", "NOWAK", "WÓJCIK", "ŁOŚ", "ZIELIŃSKA", "MÜLLER", "O'NEIL", "KOWALSKA",
+                      "NOWAK-KOWALSKA", "SMITH", "SMYTH", ""], dtype=object)
+
+
+@dataclass
+class Zbior:
+    """Dane wejściowe jednego przypadku: znormalizowane ramki i (opcjonalnie) pliki, z których pochodzą."""
+    nazwa: str
+    lojal_df: pd.DataFrame
+    ops_df: pd.DataFrame
+    ops_paths: List[Path] = field(default_factory=list)
+    loy_paths: List[Path] = field(default_factory=list)
+
+
+@dataclass
+class Przypadek:
+    """Wynik kandydata na jednym zbiorze z jednym zestawem opcji; roznice puste = identyczny wynik."""
+    zbior: str
+    silnik: str
+    opcje: dict
+    roznice: List[dict]
+    wzorzec: str = "wzorzec"
+
+
+# ============ Silniki ============
+
+def _wzorzec(z: Zbior, tolerancja: float = 0.10) -> Dict[str, pd.DataFrame]:
+    return porownaj_wzorzec(z.lojal_df, z.ops_df, tolerancja)
+
+
+def _porownaj(z: Zbior, **opcje) -> Dict[str, pd.DataFrame]:
+    return porownaj(z.lojal_df, z.ops_df, **opcje)
+
+
+def _odniesienie(opcje: dict) -> Tuple[str, Callable[..., Dict[str, pd.DataFrame]]]:
+    """(nazwa, silnik) wzorca dla zestawu opcji: zamrożona kopia, jeśli zna te opcje, inaczej porownaj."""
+    if set(opcje) <= {"tolerancja"}:
+        return "wzorzec", _wzorzec
+    return "porownaj", _porownaj
+
+
+def _rownolegle(z: Zbior, **opcje) -> Dict[str, pd.DataFrame]:
+    from .parallel import porownaj_rownolegle
+    # shardy w procesie (jobs=1): sprawdza podział po PMID i scalanie, bez kosztu puli
+    return porownaj_rownolegle(z.lojal_df, z.ops_df, jobs=1, shardy=3, **opcje)
+
+
+def _poza_pamiecia(z: Zbior, **opcje) -> Dict[str, pd.DataFrame]:
+    from .outofcore import MagazynPMID, porownaj_poza_pamiecia
+    # małe partie, żeby PMID-y rozkładały się na wiele partii
+    if z.ops_paths and z.loy_paths:
+        return porownaj_poza_pamiecia(z.ops_paths, z.loy_paths, pmidow_na_partie=7, **opcje)
+    with MagazynPMID() as mag:
+        mag.dodaj("loyalty", z.lojal_df)
+        mag.dodaj("operations", z.ops_df)
+        mag.porownaj(pmidow_na_partie=7, **opcje)
+        return mag.wyniki()
+
+
+SILNIKI: Dict[str, Callable[..., Dict[str, pd.DataFrame]]] = {
+    "porownaj": _porownaj,
+    "rownolegle": _rownolegle,
+    "poza_pamiecia": _poza_pamiecia,
+}
+
+
+def kandydat_z_importu(sciezka: str) -> Callable[..., Dict[str, pd.DataFrame]]:
+    """
+    'pakiet.modul:funkcja' → silnik. Funkcja ma sygnaturę porownaj: (lojal_df, ops_df, **opcje) → {arkusz: DataFrame}.
+    """
+    modul, _, nazwa = sciezka.partition(":")
+    if not nazwa:
+        raise ValueError(f"Kandydat w postaci modul:funkcja, a jest: {sciezka!r}")
+    func = getattr(importlib.import_module(modul), nazwa)
+    return lambda z, **opcje: func(z.lojal_df, z.ops_df, **opcje)
+
+
+# ============ Zbiory ============
+
+def losowy_zbior(seed: int) -> Zbior:
+    """
+    Mały losowy zbiór (do ~300 wierszy na stronę) w postaci wyniku loaderów. Mało różnych PMID, więc
+    są PMID z wieloma pozycjami i różną liczbą pozycji; kwoty z siatki wokół wspólnych wartości, więc
+    różnice trafiają dokładnie w 0,10 i tuż obok; braki kwot, dat i nazwisk; czasem pusta strona.
+    """
+    rng = np.random.default_rng(seed)
+    n_pmid = int(rng.integers(1, 80))
+    pmidy = np.array([f"{int(x):08d}" for x in rng.choice(10**8, n_pmid, replace=False)], dtype=object)
+    bazowe = rng.integers(1_000, 200_000, n_pmid)        # grosze; wspólne dla obu stron, żeby kwoty się schodziły
+    nazwiska = _NAZWISKA[rng.integers(0, 4 + int(rng.integers(0, len(_NAZWISKA) - 3)), size=n_pmid)]
+    poczatek = pd.Timestamp("2025-03-01")
+
+    def strona(pref: str, kol_naz: str) -> pd.DataFrame:
+        n = 0 if rng.random() < 0.03 else int(rng.integers(1, 300))
+        idx = rng.integers(0, n_pmid, n)
+        grosze = bazowe[idx] + rng.choice([0, 0, 0, 1, -1, 9, 10, 11, -10, -11, 500], n)
+        grosze = pd.array(np.where(rng.random(n) < 0.05, -1, grosze), dtype="Int64")
+        grosze[grosze.to_numpy(dtype="int64", na_value=0) < 0] = pd.NA
+        naz = nazwiska[idx].copy()
+        inne = rng.random(n) < 0.15
+        naz[inne] = rng.choice(_NAZWISKA, int(inne.sum()))
+        daty = pd.Series(poczatek + pd.to_timedelta(rng.integers(0, 5, n), unit="D"))
+        daty[rng.random(n) < 0.05] = pd.NaT
+        df = pd.DataFrame({
+            "pmid": pmidy[idx],
+            kol_naz: naz,
+            f"{pref}_grosze": grosze,
+            f"{pref}_data": daty,
+        })
+        df[f"{pref}_kwota"] = df[f"{pref}_grosze"].astype("Float64").div(100).astype(float)
+        df[f"{pref}_data_str"] = df[f"{pref}_data"].apply(fmt_date)
+        return df
+
+    lojal = strona("loyal", "gosc_nazwisko")
+    ops = strona("ops", "nazwisko")
+    ops["ops_punkty"] = np.where(rng.random(len(ops)) < 0.3, 0.0, ops["ops_kwota"].fillna(0.0))
+    return Zbior(f"losowy seed={seed}", lojal, ops)
+
+
+def zbior_z_generatora(wiersze: int, folder: str | Path, seed: int = 0, fmt: str = "csv") -> Zbior:
+    """Pliki z core.generator zapisane w `folder` i wczytane loaderami (kandydat może też czytać pliki sam)."""
+    from .generator import partie, zapisz_partie
+    from .ingest import wczytaj_wejscia
+
+    pliki = zapisz_partie(partie(wiersze, seed=seed), folder, fmt=fmt)
+    ops_paths = [p for p in pliki if p.name.startswith("operations")]
+    loy_paths = [p for p in pliki if not p.name.startswith("operations")]
+    lojal_df, ops_df = wczytaj_wejscia(ops_paths, loy_paths)
+    return Zbior(f"generator {wiersze} seed={seed} ({fmt})", lojal_df, ops_df, ops_paths, loy_paths)
+
+
+def zbior_z_plikow(ops_paths: Sequence[str | Path], loy_paths: Sequence[str | Path]) -> Zbior:
+    from .ingest import wczytaj_wejscia
+
+    ops_paths, loy_paths = [Path(p) for p in ops_paths], [Path(p) for p in loy_paths]
+    lojal_df, ops_df = wczytaj_wejscia(ops_paths, loy_paths)
+    nazwa = ", ".join(p.name for p in ops_paths + loy_paths)
+    return Zbior(nazwa, lojal_df, ops_df, ops_paths, loy_paths)
+
+
+# ============ Porównanie arkuszy ============
+
+def _rowne(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Równość komórek dwóch kolumn (object); brak == brak (NaN, None, <NA>, NaT)."""
+    na_a, na_b = pd.isna(a), pd.isna(b)
+    obie = ~na_a & ~na_b
+    rowne = np.fromiter((bool(x == y) for x, y in zip(a[obie], b[obie])), dtype=bool, count=int(obie.sum()))
+    out = na_a & na_b
+    out[obie] = rowne
+    return out
+
+
+def porownaj_arkusze(
+    oczekiwane: Dict[str, pd.DataFrame],
+    wynik: Dict[str, pd.DataFrame],
+    limit: int = 10,
+) -> List[dict]:
+    """
+    Różnice wyniku kandydata względem wzorca: {arkusz, rodzaj, opis[, wiersz, PMID, kolumna,
+    oczekiwane, jest]}. Komórki porównywane pozycyjnie (indeks pomijany — nie trafia do raportu);
+    najwyżej `limit` różnic komórek na arkusz, reszta zliczona w jednym wpisie.
+    """
+    roznice: List[dict] = []
+    if list(oczekiwane) != list(wynik):
+        roznice.append({"arkusz": "—", "rodzaj": "arkusze",
+                        "opis": f"arkusze {list(wynik)}, oczekiwano {list(oczekiwane)}"})
+
+    for ark, ref in oczekiwane.items():
+        kand = wynik.get(ark)
+        if kand is None:
+            continue
+        if list(ref.columns) != list(kand.columns):
+            roznice.append({"arkusz": ark, "rodzaj": "kolumny",
+                            "opis": f"kolumny {list(kand.columns)}, oczekiwano {list(ref.columns)}"})
+            continue
+        if len(ref) != len(kand):
+            brak = _klucze(ref) - _klucze(kand)
+            nadmiar = _klucze(kand) - _klucze(ref)
+            roznice.append({"arkusz": ark, "rodzaj": "liczba_wierszy",
+                            "opis": f"{len(kand)} wierszy, oczekiwano {len(ref)}"
+                                    + (f"; PMID tylko we wzorcu: {_skrot(brak)}" if brak else "")
+                                    + (f"; PMID tylko u kandydata: {_skrot(nadmiar)}" if nadmiar else "")})
+            continue
+
+        komorki = []
+        for kol in ref.columns:
+            a, b = ref[kol].to_numpy(dtype=object), kand[kol].to_numpy(dtype=object)
+            for i in np.flatnonzero(~_rowne(a, b)):
+                komorki.append((int(i), kol, a[i], b[i]))
+        for kol in ref.columns:
+            if ref[kol].dtype != kand[kol].dtype and not ref.empty:
+                roznice.append({"arkusz": ark, "rodzaj": "typ", "kolumna": kol,
+                                "opis": f"kolumna {kol}: typ {kand[kol].dtype}, oczekiwano {ref[kol].dtype}"})
+        if not komorki:
+            continue
+
+        komorki.sort(key=lambda k: (k[0], list(ref.columns).index(k[1])))
+        pmid = ref["PMID"].to_numpy(dtype=object) if "PMID" in ref.columns else None
+        if _wiersze(ref) == _wiersze(kand):
+            i = komorki[0][0]
+            gdzie = f" (PMID {pmid[i]}, u kandydata {kand['PMID'].iat[i]})" if pmid is not None else ""
+            roznice.append({"arkusz": ark, "rodzaj": "kolejnosc",
+                            "opis": f"te same wiersze w innej kolejności — pierwsza różnica w wierszu {i + 1}{gdzie}"})
+            continue
+        for i, kol, a, b in komorki[:limit]:
+            roznice.append({"arkusz": ark, "rodzaj": "komorka", "wiersz": i + 1,
+                            "PMID": None if pmid is None else pmid[i], "kolumna": kol,
+                            "oczekiwane": a, "jest": b})
+        if len(komorki) > limit:
+            wiersze = len({i for i, *_ in komorki})
+            roznice.append({"arkusz": ark, "rodzaj": "komorka",
+                            "opis": f"… razem {len(komorki)} różnych komórek w {wiersze} wierszach"})
+    return roznice
+
+
+def _klucze(df: pd.DataFrame) -> set:
+    return set(df["PMID"].astype(str)) if "PMID" in df.columns else set()
+
+
+def _wiersze(df: pd.DataFrame) -> list:
+    # wiersze jako krotki tekstów — porównanie zawartości bez względu na kolejność
+    return sorted(map(tuple, df.astype(str).itertuples(index=False)))
+
+
+def _skrot(pmidy: Iterable[str], n: int = 5) -> str:
+    pmidy = sorted(pmidy)
+    return ", ".join(pmidy[:n]) + (f" … (+{len(pmidy) - n})" if len(pmidy) > n else "")
+
+
+# ============ Uruchomienie ============
+
+def _uruchom(silnik: Callable, z: Zbior, opcje: dict):
+    try:
+        return silnik(z, **opcje), None
+    except Exception as e:
+        return None, e
+
+
+def sprawdz(
+    zbiory: Iterable[Zbior],
+    silniki: Dict[str, Callable[..., Dict[str, pd.DataFrame]]],
+    opcje: Sequence[dict] = OPCJE,
+    limit: int = 10,
+    log: Optional[Callable[[str], None]] = None,
+) -> List[Przypadek]:
+    """Każdy zbiór × zestaw opcji: wzorzec, potem każdy kandydat i porównanie arkuszy."""
+    przypadki: List[Przypadek] = []
+    for z in zbiory:
+        for op in opcje:
+            nazwa_ref, silnik_ref = _odniesienie(op)
+            ref, blad_ref = _uruchom(silnik_ref, z, op)
+            for nazwa, silnik in silniki.items():
+                if silnik is silnik_ref:
+                    continue
+                wynik, blad = _uruchom(silnik, z, op)
+                if blad_ref is not None or blad is not None:
+                    roznice = _roznice_bledow(blad_ref, blad)
+                else:
+                    roznice = porownaj_arkusze(ref, wynik, limit)
+                przypadki.append(Przypadek(z.nazwa, nazwa, op, roznice, nazwa_ref))
+        if log:
+            zle = sum(1 for p in przypadki if p.zbior == z.nazwa and p.roznice)
+            log(f"{'❌' if zle else '✅'} {z.nazwa}" + (f": {zle} niezgodnych" if zle else ""))
+    return przypadki
+
+
+def _roznice_bledow(blad_ref: Optional[Exception], blad: Optional[Exception]) -> List[dict]:
+    # oba silniki odrzucają dane tym samym wyjątkiem → zgodne
+    if blad_ref is not None and blad is not None and type(blad_ref) is type(blad) and str(blad_ref) == str(blad):
+        return []
+    opis = lambda e: "bez wyjątku" if e is None else "".join(traceback.format_exception_only(type(e), e)).strip()
+    return [{"arkusz": "—", "rodzaj": "wyjatek", "opis": f"kandydat: {opis(blad)}; wzorzec: {opis(blad_ref)}"}]
+
+
+def fmt_raport(przypadki: List[Przypadek]) -> str:
+    """Czytelny raport: podsumowanie, a dla niezgodnych przypadków lista różnic per arkusz."""
+    zle = [p for p in przypadki if p.roznice]
+    linie = [f"Przypadków: {len(przypadki)}, zgodnych: {len(przypadki) - len(zle)}, niezgodnych: {len(zle)}"]
+    for p in zle:
+        opcje = ", ".join(f"{k}={v!r}" for k, v in p.opcje.items()) or "domyślne opcje"
+        linie.append(f"\n❌ {p.silnik} (wzgl. {p.wzorzec}) | {p.zbior} | {opcje}")
+        for r in p.roznice:
+            if r["rodzaj"] == "komorka" and "opis" not in r:
+                gdzie = f"wiersz {r['wiersz']}" + (f" (PMID {r['PMID']})" if r.get("PMID") is not None else "")
+                linie.append(f"   {r['arkusz']}: {gdzie}, {r['kolumna']}: "
+                             f"oczekiwano {r['oczekiwane']!r}, jest {r['jest']!r}")
+            else:
+                linie.append(f"   {r['arkusz']}: {r['opis']}")
+    return "\n".join(linie)
+
+
+def zbiory_domyslne(
+    losowe: int = 50,
+    seed: int = 0,
+    rozmiary: Sequence[int] = (2_000,),
+    folder: Optional[str | Path] = None,
+) -> Iterable[Zbior]:
+    """Zbiory losowe (seed, seed+1, …) i syntetyczne z generatora (pliki w `folder` albo w katalogu tymczasowym)."""
+    for s in range(seed, seed + losowe):
+        yield losowy_zbior(s)
+    if not rozmiary:
+        return
+    with tempfile.TemporaryDirectory(prefix="equiv_") as tmp:
+        for wiersze in rozmiary:
+            yield zbior_z_generatora(wiersze, Path(folder or tmp) / str(wiersze), seed)
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Syntetyczne pliki Operations i Loyalty do testów wydajności — bez prawdziwych danych gości.
+
+Układ jak w eksportach: Operations z nagłówkiem w 3. wierszu (kolumny COLS_O, różne Credit type,
+kolumna punktów „Rewards Points” albo „Reward points”), Loyalty z nagłówkiem w 13. wierszu (COLS_L,
+numery kart, z których PMID wychodzi tak jak w wyciagnij_pmid_z_karty). Każdy PMID dostaje jeden
+z przypadków porównania w zadanych proporcjach (zgodne, różnica kwot, inne nazwiska, różna liczba
+pozycji, brak po jednej ze stron), więc raport ma przewidywalny rozkład sekcji.
+
+Generowanie jest wektorowe (NumPy), także dla milionów wierszy; wolniejszy jest tylko zapis Excela.
+"""
+
+from __future__ import annotations
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .config import COLS_L, COLS_O, NAGLOWEK_L, NAGLOWEK_O
+
+# przypadek PMID → domyślny udział
+PROPORCJE = {
+    "zgodne": 0.70,
+    "niezgodne": 0.10,
+    "inne_nazwiska": 0.08,
+    "rozna_liczba": 0.05,
+    "brak_w_operations": 0.04,
+    "brak_w_loyalty": 0.03,
+}
+
+FORMATY = ("xlsx", "xls", "csv")
+
+# pobytów w jednej partii generowania / zapisu
+PARTIA = 100_000
+
+# limit wierszy arkusza (z nagłówkiem i wierszami nad nim)
+_LIMIT_WIERSZY = {"xlsx": 1_048_576, "xls": 65_536}
+
+_RDZENIE = ["KOWAL", "NOW", "WIŚNIEW", "WÓJCI", "KAMIŃ", "LEWAND", "ZIELIŃ", "SZYMAŃ", "WOŹNI", "DĄBROW",
+            "KOZŁOW", "JANKOW", "MAZUR", "KWIATKOW", "KRAWCZY", "PIOTROW", "GRABOW", "NOWAKOW", "PAWŁOW", "MICHAL",
+            "ADAM", "DUDZI", "ZAJĄC", "WIECZOR", "JABŁOŃ", "KRÓL", "MAJEW", "OLSZEW", "JAWOR", "WRÓBL"]
+_KONCOWKI = ["SKI", "SKA", "AK", "EK", "CZYK", "OWSKI", "IAK", "CKI"]
+_OBCE = ["SMITH", "MÜLLER", "DUPONT", "ROSSI", "GARCIA", "SCHMIDT", "MARTIN", "BERNARD", "JOHNSON", "FISCHER",
+         "WEBER", "MOREAU", "BIANCHI", "LOPEZ", "NOVÁK", "HORVÁTH", "JENSEN", "NIELSEN", "O'BRIEN", "KOWALSKA-NOWAK"]
+_IMIONA = ["JAN", "ANNA", "PIOTR", "MARIA", "KRZYSZTOF", "KATARZYNA", "TOMASZ", "AGNIESZKA", "PAWEŁ", "EWA",
+           "JOHN", "EMMA", "HANS", "CLAIRE", "MARCO", "LAURA"]
+_INNE_KREDYTY = ["Bonus", "Promotion", "Partner", "Adjustment", "Hotel Link"]
+_WARIANTY_HOTEL_STAY = ["Hotel Stay", "Hotel Stay", "Hotel Stay", "HOTEL STAY", " Hotel Stay "]
+_LITERY_PMID = np.array(list("ABCM"))
+_LITERY_KONTROLNE = np.array(list("ABCDEF"))
+
+
+def _nazwiska() -> np.ndarray:
+    return np.array([r + k for r in _RDZENIE for k in _KONCOWKI] + _OBCE, dtype=object)
+
+
+def _proporcje(proporcje: Optional[Dict[str, float]]) -> np.ndarray:
+    p = dict(PROPORCJE)
+    for k, v in (proporcje or {}).items():
+        if k not in p:
+            raise ValueError(f"Nieznany przypadek: {k!r} (dostępne: {', '.join(p)})")
+        if v < 0:
+            raise ValueError(f"Udział nie może być ujemny: {k}={v}")
+        p[k] = float(v)
+    w = np.array(list(p.values()))
+    if w.sum() <= 0:
+        raise ValueError("Suma udziałów musi być dodatnia.")
+    return w / w.sum()
+
+
+def _kwota_tekst(grosze: np.ndarray, sep: str) -> np.ndarray:
+    zl = pd.Series(grosze // 100).astype(str)
+    gr = pd.Series(grosze % 100).astype(str).str.zfill(2)
+    return (zl + sep + gr).to_numpy(dtype=object)
+
+
+def partie(
+    wiersze: int = 1000,
+    proporcje: Optional[Dict[str, float]] = None,
+    inne_kredyty: float = 0.10,
+    miesiac: str = "2025-03",
+    seed: Optional[int] = None,
+    na_partie: int = PARTIA,
+) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+    """
+    Kolejne partie (ops, lojal) — surowe arkusze (tekst, nagłówki jak w eksportach) — razem `wiersze` pobytów,
+    po najwyżej `na_partie` w partii. PMID są różne we wszystkich partiach, więc partie można dopisywać
+    do jednego pliku: w pamięci jest naraz tylko jedna.
+
+    `proporcje` — udziały przypadków PMID (klucze jak w PROPORCJE, brakujące = domyślne; normalizowane
+    do sumy 1). `inne_kredyty` — dodatkowe wiersze Operations z innym Credit type niż Hotel Stay (loader
+    je odfiltrowuje), jako ułamek wierszy Hotel Stay. Ten sam `seed` daje te same dane.
+    """
+    if wiersze < 1:
+        raise ValueError("Liczba wierszy musi być dodatnia.")
+    rng = np.random.default_rng(seed)
+    udzialy = _proporcje(proporcje)
+    nazwiska = _nazwiska()
+    waga_naz = 1.0 / (np.arange(len(nazwiska)) + 10.0)   # kilka częstych nazwisk, długi ogon
+    waga_naz /= waga_naz.sum()
+    poczatek = pd.Timestamp(f"{miesiac}-01")
+    dni = pd.date_range(poczatek, poczatek + pd.offsets.MonthEnd(0), freq="D").strftime("%d/%m/%Y").to_numpy(dtype=object)
+    # eksporty mają kolumnę punktów pod jedną z dwóch nazw
+    kol_punktow = COLS_O["points1"] if rng.random() < 0.5 else COLS_O["points2"]
+
+    # karty: 308103 + 7 cyfr + litera PMID + litera kontrolna; PMID = 8 znaków przed ostatnim.
+    # Różne numery bez losowania bez zwracania (pamięć O(partii)): i → (a·i + b) mod M, a względnie pierwsze z M
+    m = 9_000_000 * len(_LITERY_PMID)
+    a = int(next(x for x in rng.integers(m // 3, m, 64) if np.gcd(int(x), m) == 1))
+    b = int(rng.integers(0, m))
+
+    pierwszy_pmid = 0
+    for od in range(0, wiersze, na_partie):
+        ops, lojal, n_pmid = _partia(rng, min(na_partie, wiersze - od), pierwszy_pmid, a, b, m, udzialy,
+                                     nazwiska, waga_naz, dni, kol_punktow, inne_kredyty)
+        pierwszy_pmid += n_pmid
+        yield ops, lojal
+
+
+def generuj(
+    wiersze: int = 1000,
+    proporcje: Optional[Dict[str, float]] = None,
+    inne_kredyty: float = 0.10,
+    miesiac: str = "2025-03",
+    seed: Optional[int] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """(ops, lojal) w całości — partie() sklejone w dwie ramki; te same dane co przy zapisie partiami."""
+    czesci = list(partie(wiersze, proporcje, inne_kredyty, miesiac, seed))
+    return (pd.concat([o for o, _ in czesci], ignore_index=True),
+            pd.concat([l for _, l in czesci], ignore_index=True))
+
+
+def _partia(rng, wiersze, pierwszy_pmid, a, b, m, udzialy, nazwiska, waga_naz, dni, kol_punktow, inne_kredyty):
+    # pobyty na PMID: zwykle jeden, czasem 2–3; ostatni PMID przycięty do dokładnie `wiersze` pobytów
+    n_pmid = int(wiersze / 1.18 * 1.02) + 64
+    k = rng.choice([1, 2, 3], size=n_pmid, p=[0.85, 0.12, 0.03])
+    koniec = np.cumsum(k)
+    n_pmid = int(np.searchsorted(koniec, wiersze) + 1)
+    k = k[:n_pmid]
+    k[-1] -= int(koniec[n_pmid - 1] - wiersze)
+
+    nr = (a * np.arange(pierwszy_pmid, pierwszy_pmid + n_pmid, dtype=np.int64) + b) % m
+    pmid = pd.Series(nr // len(_LITERY_PMID) + 1_000_000).astype(str) + _LITERY_PMID[nr % len(_LITERY_PMID)]
+    karta = ("308103" + pmid + _LITERY_KONTROLNE[rng.integers(0, len(_LITERY_KONTROLNE), n_pmid)]).to_numpy(dtype=object)
+    pmid = pmid.to_numpy(dtype=object)
+
+    przypadek = rng.choice(len(udzialy), size=n_pmid, p=udzialy)
+    P = {nazwa: i for i, nazwa in enumerate(PROPORCJE)}
+    naz_kod = rng.choice(len(nazwiska), size=n_pmid, p=waga_naz)
+    imie = np.array(_IMIONA, dtype=object)[rng.integers(0, len(_IMIONA), n_pmid)]
+
+    # pobyty
+    p_idx = np.repeat(np.arange(n_pmid), k)
+    pierwszy = np.r_[True, p_idx[1:] != p_idx[:-1]]
+    n = len(p_idx)
+    grosze = np.clip(rng.lognormal(np.log(45_000), 0.8, n), 3_000, 2_500_000).astype(np.int64)
+    dzien = rng.integers(0, len(dni), n)
+    pc = przypadek[p_idx]
+
+    # --- Loyalty ---
+    jest_l = pc != P["brak_w_loyalty"]
+    lojal = pd.DataFrame({
+        COLS_L["card"]: karta[p_idx[jest_l]],
+        COLS_L["guest"]: imie[p_idx[jest_l]] + " " + nazwiska[naz_kod[p_idx[jest_l]]],
+        COLS_L["rev"]: _kwota_tekst(grosze[jest_l], "."),
+        COLS_L["dep"]: dni[dzien[jest_l]],
+    })
+
+    # --- Operations: pobyty (Hotel Stay) ---
+    jest_o = pc != P["brak_w_operations"]
+    o_gr = grosze.copy()
+    # drobne różnice w tolerancji (do 5 gr) przy części zgodnych
+    drobne = (pc == P["zgodne"]) & (rng.random(n) < 0.05)
+    o_gr[drobne] += rng.integers(-5, 6, int(drobne.sum()))
+    # różnica kwot ponad tolerancję na pierwszym pobycie PMID
+    zle = (pc == P["niezgodne"]) & pierwszy
+    o_gr[zle] += rng.choice([-1, 1], int(zle.sum())) * rng.integers(100, 20_000, int(zle.sum()))
+    o_gr = np.maximum(o_gr, 100)
+    o_naz = naz_kod[p_idx].copy()
+    inne = pc == P["inne_nazwiska"]
+    o_naz[inne] = (o_naz[inne] + rng.integers(1, len(nazwiska), int(inne.sum()))) % len(nazwiska)
+    ops_p, ops_gr, ops_naz, ops_dzien = p_idx[jest_o], o_gr[jest_o], o_naz[jest_o], dzien[jest_o]
+
+    # różna liczba pozycji: jeden dodatkowy pobyt w Operations
+    extra = np.flatnonzero(przypadek == P["rozna_liczba"])
+    ops_p = np.r_[ops_p, extra]
+    ops_gr = np.r_[ops_gr, np.clip(rng.lognormal(np.log(45_000), 0.8, len(extra)), 3_000, 2_500_000).astype(np.int64)]
+    ops_naz = np.r_[ops_naz, naz_kod[extra]]
+    ops_dzien = np.r_[ops_dzien, rng.integers(0, len(dni), len(extra))]
+    kredyt = np.array(_WARIANTY_HOTEL_STAY, dtype=object)[rng.integers(0, len(_WARIANTY_HOTEL_STAY), len(ops_p))]
+
+    # wiersze z innym Credit type (odfiltrowywane przez loader)
+    n_inne = int(round(inne_kredyty * len(ops_p)))
+    if n_inne:
+        z = rng.integers(0, len(ops_p), n_inne)
+        ops_p = np.r_[ops_p, ops_p[z]]
+        ops_gr = np.r_[ops_gr, rng.integers(0, 50_000, n_inne)]
+        ops_naz = np.r_[ops_naz, ops_naz[z]]
+        ops_dzien = np.r_[ops_dzien, ops_dzien[z]]
+        kredyt = np.r_[kredyt, np.array(_INNE_KREDYTY, dtype=object)[rng.integers(0, len(_INNE_KREDYTY), n_inne)]]
+
+    punkty = np.array(["0", "100", "100", "250", "500"], dtype=object)[rng.integers(0, 5, len(ops_p))]
+    ops = pd.DataFrame({
+        COLS_O["pmid"]: pmid[ops_p],
+        COLS_O["card"]: karta[ops_p],
+        COLS_O["holder"]: nazwiska[ops_naz],
+        COLS_O["rev_hotel"]: _kwota_tekst(ops_gr, ","),
+        kol_punktow: punkty,
+        COLS_O["credit"]: kredyt,
+        COLS_O["dep"]: dni[ops_dzien],
+    })
+
+    # eksporty nie są posortowane po PMID
+    ops = ops.iloc[rng.permutation(len(ops))].reset_index(drop=True)
+    lojal = lojal.iloc[rng.permutation(len(lojal))].reset_index(drop=True)
+    return ops, lojal, n_pmid
+
+
+# ---------- zapis ----------
+
+def _typowane(df: pd.DataFrame, kwoty: List[str], daty: List[str]) -> pd.DataFrame:
+    """Komórki jak w starych eksportach .xls: kwoty jako liczby, daty jako numer seryjny Excela."""
+    out = df.astype(object).copy()
+    for c in kwoty:
+        out[c] = pd.to_numeric(df[c].str.replace(",", ".", regex=False), errors="coerce")
+    for c in daty:
+        dt = pd.to_datetime(df[c], format="%d/%m/%Y", errors="coerce")
+        out[c] = ((dt - pd.Timestamp("1899-12-30")).dt.days).astype(float)
+    return out
+
+
+class _Zapis:
+    """Pliki jednej strony dopisywane partiami; arkusz ponad limit formatu przechodzi do pliku „_cz2”, „_cz3”…"""
+
+    def __init__(self, folder: Path, stem: str, naglowek: int, tytul: str, fmt: str, xlwt_jest: bool,
+                 kwoty: List[str], daty: List[str]):
+        self.folder, self.stem, self.naglowek, self.tytul = folder, stem, naglowek, tytul
+        self.fmt, self.xlwt_jest, self.kwoty, self.daty = fmt, xlwt_jest, kwoty, daty
+        self.pliki: List[Path] = []
+        self._plik = None      # otwarty plik CSV / skoroszyt
+        self._ws = None
+        self._wiersz = 0       # następny wolny wiersz arkusza
+
+    def _otworz(self, kolumny: List[str]):
+        if self.fmt == "csv":
+            path = self.folder / f"{self.stem}.csv"
+            # ten sam układ co w Excelu (nagłówek w wierszu naglowek+1), separator ; i przecinek dziesiętny
+            self._plik = open(path, "w", encoding="utf-8-sig", newline="")
+            self._plik.write(self.tytul + "\n" + "\n" * (self.naglowek - 1))
+        else:
+            sufiks = ".xls" if self.xlwt_jest else ".xlsx"
+            nr = len(self.pliki) + 1
+            path = self.folder / (f"{self.stem}{sufiks}" if nr == 1 else f"{self.stem}_cz{nr}{sufiks}")
+            if self.xlwt_jest:
+                import xlwt  # opcjonalnie — tylko do zapisu prawdziwego .xls
+                self._plik = xlwt.Workbook(encoding="utf-8")
+                self._ws = self._plik.add_sheet("Sheet1")
+                self._ws.write(0, 0, self.tytul)
+                for c, nazwa in enumerate(kolumny):
+                    self._ws.write(self.naglowek, c, nazwa)
+            else:
+                import xlsxwriter
+                # constant_memory: wiersze lecą prosto na dysk — stała pamięć także przy milionie wierszy
+                self._plik = xlsxwriter.Workbook(str(path), {"constant_memory": True})
+                self._ws = self._plik.add_worksheet("Sheet1")
+                self._ws.write(0, 0, self.tytul)
+                self._ws.write_row(self.naglowek, 0, kolumny)
+            self._wiersz = self.naglowek + 1
+        self.pliki.append(path)
+
+    def _zamknij_plik(self):
+        if self._plik is None:
+            return
+        if self.fmt == "csv" or not self.xlwt_jest:
+            self._plik.close()
+        else:
+            self._plik.save(str(self.pliki[-1]))
+        self._plik = self._ws = None
+
+    def dopisz(self, df: pd.DataFrame):
+        if self.fmt == "csv":
+            if self._plik is None:
+                self._otworz(list(df.columns))
+                df.to_csv(self._plik, sep=";", index=False, lineterminator="\n")
+            else:
+                df.to_csv(self._plik, sep=";", index=False, header=False, lineterminator="\n")
+            return
+        if self.fmt == "xls":
+            df = _typowane(df, self.kwoty, self.daty)
+        limit = _LIMIT_WIERSZY[self.fmt]
+        od = 0
+        while od < len(df) or self._plik is None:
+            if self._plik is None or self._wiersz >= limit:
+                self._zamknij_plik()
+                self._otworz(list(df.columns))
+            ile = min(len(df) - od, limit - self._wiersz)
+            for wiersz in df.iloc[od:od + ile].itertuples(index=False, name=None):
+                if self.xlwt_jest:
+                    for c, v in enumerate(wiersz):
+                        self._ws.write(self._wiersz, c, v)
+                else:
+                    self._ws.write_row(self._wiersz, 0, wiersz)
+                self._wiersz += 1
+            od += ile
+
+    def zamknij(self) -> List[Path]:
+        self._zamknij_plik()
+        return self.pliki
+
+
+def zapisz_partie(
+    czesci: Iterable[Tuple[pd.DataFrame, pd.DataFrame]],
+    folder: str | Path,
+    fmt: str = "xlsx",
+    data: str = "2025-03-01",
+    hotel: str = "H3417",
+) -> List[Path]:
+    """
+    Zapisuje partie (ops, lojal) z partie() pod nazwami jak eksporty („operations_<data>”,
+    „<hotel>_LoyaltyExport_<data>”), więc rozpoznają je watch/batch i wybór najnowszego pliku.
+    Zwraca listę zapisanych plików.
+
+    xlsx — tekst jak w eksportach; arkusz większy niż limit Excela dzielony na pliki „_cz2”, „_cz3”…
+    xls  — dane zgodne z .xls: kwoty jako liczby, daty jako numer seryjny, najwyżej 65 536 wierszy na plik;
+           zapis prawdziwego .xls wymaga pakietu xlwt, bez niego te same dane trafiają do plików .xlsx.
+    csv  — jeden plik na stronę, separator ;, UTF-8 z BOM.
+    """
+    if fmt not in FORMATY:
+        raise ValueError(f"Nieznany format: {fmt!r} (dostępne: {', '.join(FORMATY)})")
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    xlwt_jest = False
+    if fmt == "xls":
+        try:
+            import xlwt  # noqa: F401
+            xlwt_jest = True
+        except ImportError:
+            pass
+
+    strony = (
+        _Zapis(folder, f"operations_{data}", NAGLOWEK_O, "Operations — dane syntetyczne", fmt, xlwt_jest,
+               [COLS_O["rev_hotel"]], [COLS_O["dep"]]),
+        _Zapis(folder, f"{hotel}_LoyaltyExport_{data}", NAGLOWEK_L, f"Loyalty export {hotel} — dane syntetyczne",
+               fmt, xlwt_jest, [COLS_L["rev"]], [COLS_L["dep"]]),
+    )
+    try:
+        for ops, lojal in czesci:
+            strony[0].dopisz(ops)
+            strony[1].dopisz(lojal)
+    finally:
+        zapisane = [p for s in strony for p in s.zamknij()]
+    return zapisane
+
+
+def zapisz_zbior(ops: pd.DataFrame, lojal: pd.DataFrame, folder: str | Path, fmt: str = "xlsx",
+                 data: str = "2025-03-01", hotel: str = "H3417") -> List[Path]:
+    """Jak zapisz_partie dla całych ramek z generuj()."""
+    return zapisz_partie([(ops, lojal)], folder, fmt, data, hotel)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+
+from .io_loyalty import wczytaj_loyalty
+from .io_operations import wczytaj_operations
+from .cache import ParseCache, MemoryCache
+from .profiling import etap, mierz
+
+_LOADERS = {
+    "loyalty": wczytaj_loyalty,
+    "operations": wczytaj_operations,
+}
+
+
+def _wczytaj_jeden(rodzaj: str, path: str, cache_dir: Optional[str] = None) -> pd.DataFrame:
+    loader = _LOADERS[rodzaj]
+    if cache_dir:
+        df = ParseCache(cache_dir).get_or_load(path, rodzaj, loader)
+    else:
+        df = loader(path)
+    df["Źródło"] = Path(path).name
+    return df
+
+
+def wczytaj_z_pamieci(pamiec: MemoryCache, rodzaj: str, path: str | Path) -> pd.DataFrame:
+    """Jak _wczytaj_jeden, ale przez ciepłą pamięć procesu; zwraca kopię z kolumną „Źródło”."""
+    df = pamiec.get_or_load(path, rodzaj, _LOADERS[rodzaj]).copy()
+    df["Źródło"] = Path(path).name
+    return df
+
+
+def _scal(frames: list[pd.DataFrame], rodzaj: str) -> pd.DataFrame:
+    if not frames:
+        if rodzaj == "loyalty":
+            return pd.DataFrame(columns=["pmid", "gosc_nazwisko", "loyal_kwota", "loyal_data_str"])
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    return pd.concat(frames, ignore_index=True)
+
+
+@mierz("wczytaj")
+def wczytaj_wejscia(
+    ops_paths: Iterable[str | Path],
+    loy_paths: Iterable[str | Path],
+    jobs: int = 1,
+    cache_dir: Optional[str | Path] = None,
+    kompakt: bool = False,
+    raport_pamieci: Optional[list] = None,
+    deduplikacja: Optional[str] = None,
+    raport_dedup: Optional[list] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Wczytuje i scala wszystkie pliki Operations i Loyalty.
+    Przy jobs > 1 pliki (obu rodzajów naraz) są parsowane równolegle w osobnych procesach;
+    kolejność plików w wyniku jest zawsze taka jak na wejściu.
+    kompakt=True — każda ramka zwężona przez core.schema.kompaktuj jeszcze przed scaleniem
+    (rozmiary przed/po trafiają do listy raport_pamieci, jeśli podana).
+    deduplikacja="usun"/"oznacz" — przy scalaniu wiersze powtórzone z wcześniejszego pliku są usuwane
+    albo oznaczane (core.duplicates.usun_duplikaty_plikow; liczności per plik do raport_dedup).
+    Zwraca (lojal_df, ops_df).
+    """
+    zadania = [("loyalty", str(p)) for p in loy_paths] + [("operations", str(p)) for p in ops_paths]
+    cdir = str(cache_dir) if cache_dir else None
+
+    if jobs > 1 and len(zadania) > 1:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(zadania))) as ex:
+            futs = [ex.submit(_wczytaj_jeden, r, p, cdir) for r, p in zadania]
+            frames = [f.result() for f in futs]
+    else:
+        frames = [_wczytaj_jeden(r, p, cdir) for r, p in zadania]
+
+    if kompakt:
+        from .schema import kompaktuj
+        frames = [kompaktuj(df, r, Path(p).name, raport_pamieci) for (r, p), df in zip(zadania, frames)]
+
+    loj = [df for (r, _), df in zip(zadania, frames) if r == "loyalty"]
+    ops = [df for (r, _), df in zip(zadania, frames) if r == "operations"]
+    with etap("scalanie", wiersze=sum(len(df) for df in frames)) as e:
+        lojal_df, ops_df = _scal(loj, "loyalty"), _scal(ops, "operations")
+        if deduplikacja:
+            from .duplicates import usun_duplikaty_plikow
+            lojal_df = usun_duplikaty_plikow(lojal_df, "loyalty", deduplikacja, raport_dedup)
+            ops_df = usun_duplikaty_plikow(ops_df, "operations", deduplikacja, raport_dedup)
+        e.wynik(len(lojal_df) + len(ops_df))
+    if kompakt:
+        # concat categoricali o różnych słownikach daje object — ponowna kategoryzacja po scaleniu
+        if len(loj) > 1:
+            lojal_df = kompaktuj(lojal_df, "loyalty")
+        if len(ops) > 1:
+            ops_df = kompaktuj(ops_df, "operations")
+    return lojal_df, ops_df
@@ -5,31 +5,41 @@ import pandas as pd
 from pathlib import Path
 from typing import Iterable
 
-from .config import COLS_L
+from .config import COLS_L, NAGLOWEK_L
+from .money import parsuj_grosze, grosze_na_zl
+from .profiling import etap
 from .utils import (
-    read_excel_safe,               
+    read_table_safe,
     normalizuj_numer_karty,
     wyciagnij_pmid_z_karty,
     wyodrebnij_nazwisko,
-    przecinek_na_kropke,
     parse_date_any,
     fmt_date,
 )
 
 def wczytaj_loyalty(path: str) -> pd.DataFrame:
     """
-    Czyta pojedynczy plik loyaltyexport (nagłówki od 13. wiersza -> header=12),
-    wyprowadza PMID z numeru karty i normalizuje kluczowe kolumny.
+    Czyta pojedynczy plik loyaltyexport (nagłówki od 13. wiersza -> header=12; także CSV w tym
+    samym układzie), wyprowadza PMID z numeru karty i normalizuje kluczowe kolumny.
     """
-    c = COLS_L
-    engine = "xlrd" if str(path).lower().endswith(".xls") else "openpyxl"
     try:
-        df = read_excel_safe(path, dtype=str, header=12, engine=engine)
+        with etap("odczyt") as e:
+            df, naglowek = read_table_safe(path, NAGLOWEK_L, (COLS_L["card"], COLS_L["guest"]))
+            e.wynik(len(df))
     except ImportError as e:
         print("❌ Brak biblioteki do odczytu Excela:", e)
         print("Zainstaluj: pip install openpyxl et-xmlfile  (dla .xlsx) oraz/lub xlrd (dla .xls).")
         raise
 
+    with etap("normalizacja", wiersze=len(df)) as e:
+        df = _normalize_loyalty(df, naglowek)
+        e.wynik(len(df))
+    return df
+
+
+def _normalize_loyalty(df: pd.DataFrame, naglowek: int = NAGLOWEK_L) -> pd.DataFrame:
+    c = COLS_L
+
     # Nagłówki potrafią nie być str (np. daty) — wymuś str i strip
     df.columns = [(x if isinstance(x, str) else str(x)).strip() for x in df.columns]
 
@@ -38,6 +48,8 @@ def wczytaj_loyalty(path: str) -> pd.DataFrame:
         raise ValueError(f"W Loyalty brakuje kolumn: {missing}.")
 
     df = df[[c["card"], c["guest"], c["rev"]] + ([c["dep"]] if c["dep"] in df.columns else [])].copy()
+    # nr wiersza w arkuszu źródłowym (do drill-down, core.provenance)
+    df["Wiersz"] = (df.index + naglowek + 2).astype("int32")
 
     # PMID z numeru karty
     df["karta_norm"] = df[c["card"]].astype(str).apply(normalizuj_numer_karty)
@@ -47,9 +59,9 @@ def wczytaj_loyalty(path: str) -> pd.DataFrame:
     df["gosc_nazwa_raw"] = df[c["guest"]].astype(str).str.strip().str.upper()
     df["gosc_nazwisko"]  = df["gosc_nazwa_raw"].apply(wyodrebnij_nazwisko)
 
-    # Kwoty
-    df["loyal_kwota_raw"] = df[c["rev"]].astype(str).apply(przecinek_na_kropke)
-    df["loyal_kwota"]     = pd.to_numeric(df["loyal_kwota_raw"], errors="coerce")
+    # Kwoty — w groszach (int); float w złotych tylko pochodną dla arkuszy
+    df["loyal_grosze"] = parsuj_grosze(df[c["rev"]])
+    df["loyal_kwota"]  = grosze_na_zl(df["loyal_grosze"])
 
     # Daty (opcjonalnie)
     if c["dep"] in df.columns:
@@ -61,10 +73,11 @@ def wczytaj_loyalty(path: str) -> pd.DataFrame:
     return df
 
 
-def wczytaj_loyalty_many(paths: Iterable[str | Path]) -> pd.DataFrame:
+def wczytaj_loyalty_many(paths: Iterable[str | Path], deduplikacja: str | None = None) -> pd.DataFrame:
     """
     Scala wiele plików Loyalty w jeden DataFrame (dodaje kolumnę „Źródło”).
     Zwraca pustą ramkę z wymaganymi kolumnami, jeśli lista ścieżek jest pusta.
+    deduplikacja="usun"/"oznacz" — jak w wczytaj_operations_many.
     """
     paths = [Path(p) for p in paths]
     if not paths:
@@ -76,4 +89,8 @@ def wczytaj_loyalty_many(paths: Iterable[str | Path]) -> pd.DataFrame:
         df["Źródło"] = p.name
         frames.append(df)
 
-    return pd.concat(frames, ignore_index=True)
+    df = pd.concat(frames, ignore_index=True)
+    if deduplikacja:
+        from .duplicates import usun_duplikaty_plikow
+        df = usun_duplikaty_plikow(df, "loyalty", deduplikacja)
+    return df
@@ -3,9 +3,11 @@
 from pathlib import Path
 import pandas as pd
 
-from .config import COLS_O
+from .config import COLS_O, NAGLOWEK_O
+from .money import parsuj_grosze, grosze_na_zl
+from .profiling import etap
 from .utils import (
-    read_excel_safe, normalizuj_numer_karty, normalizuj_pmid,
+    read_table_safe, normalizuj_numer_karty, normalizuj_pmid,
     przecinek_na_kropke, parse_date_any, fmt_date
 )
 
@@ -31,8 +33,8 @@ def _normalize_ops(df: pd.DataFrame) -> pd.DataFrame:
     # 4) Kwota
     if c["rev_hotel"] not in df.columns:
         raise ValueError(f"Brak kolumny w Operations: '{c['rev_hotel']}'")
-    df["ops_kwota_raw"] = df[c["rev_hotel"]].astype(str).apply(przecinek_na_kropke)
-    df["ops_kwota"] = pd.to_numeric(df["ops_kwota_raw"], errors="coerce")
+    df["ops_grosze"] = parsuj_grosze(df[c["rev_hotel"]])
+    df["ops_kwota"] = grosze_na_zl(df["ops_grosze"])
 
     # 5) Data (opcjonalnie)
     if c["dep"] in df.columns:
@@ -61,14 +63,24 @@ def _normalize_ops(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 def wczytaj_operations(path: str) -> pd.DataFrame:
-    """Czyta pojedynczy plik Operations (nagłówki w 3. wierszu)."""
-    engine = "xlrd" if str(path).lower().endswith(".xls") else "openpyxl"
-    df = read_excel_safe(path, dtype=str, header=2, engine=engine)  # <— KLUCZOWE
+    """Czyta pojedynczy plik Operations (nagłówki w 3. wierszu; także CSV w tym samym układzie)."""
+    with etap("odczyt") as e:
+        df, naglowek = read_table_safe(path, NAGLOWEK_O, (COLS_O["pmid"], COLS_O["credit"]))  # <— KLUCZOWE
+        e.wynik(len(df))
     df.columns = [(x if isinstance(x, str) else str(x)).strip() for x in df.columns]
-    return _normalize_ops(df)
+    # nr wiersza w arkuszu źródłowym (do drill-down, core.provenance); filtr Hotel Stay go zachowuje
+    df["Wiersz"] = (df.index + naglowek + 2).astype("int32")
+    with etap("normalizacja", wiersze=len(df)) as e:
+        df = _normalize_ops(df)
+        e.wynik(len(df))
+    return df
 
-def wczytaj_operations_many(paths: list[str | Path]) -> pd.DataFrame:
-    """Scala wiele plików Operations."""
+def wczytaj_operations_many(paths: list[str | Path], deduplikacja: str | None = None) -> pd.DataFrame:
+    """
+    Scala wiele plików Operations.
+    deduplikacja="usun"/"oznacz" — wiersze powtórzone z wcześniejszego pliku (nakładające się eksporty)
+    są usuwane albo oznaczane w kolumnie „Duplikat_z” (core.duplicates.usun_duplikaty_plikow).
+    """
     frames: list[pd.DataFrame] = []
     for p in paths:
         df = wczytaj_operations(str(p))  # już czyści i normalizuje
@@ -76,4 +88,8 @@ def wczytaj_operations_many(paths: list[str | Path]) -> pd.DataFrame:
         frames.append(df)
     if not frames:
         return pd.DataFrame()
-    return pd.concat(frames, ignore_index=True)
+    df = pd.concat(frames, ignore_index=True)
+    if deduplikacja:
+        from .duplicates import usun_duplikaty_plikow
+        df = usun_duplikaty_plikow(df, "operations", deduplikacja)
+    return df
@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+from itertools import permutations
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+# tryby parowania transakcji w obrębie PMID (przy równej liczbie pozycji po obu stronach)
+PAROWANIA = ("kwota", "data", "optymalne")
+
+# grupy do tej wielkości liczone przeglądem wszystkich permutacji naraz (8! = 40320), większe — metodą węgierską
+_MAX_PERMUTACJE = 8
+
+
+def _klucz_daty(df: pd.DataFrame, data_col: str, data_str_col: str) -> pd.Series:
+    if data_col in df.columns:
+        return pd.to_datetime(df[data_col], errors="coerce")
+    # ramki bez sparsowanej daty (np. z zewnętrznych źródeł) — odtwórz ją z tekstu RRRR-MM-DD
+    return pd.to_datetime(df[data_str_col].where(df[data_str_col] != "—"), errors="coerce", format="%Y-%m-%d")
+
+
+def _kawalki(klucze: pd.Series, wartosci: pd.Series):
+    """(klucz, lista wartości) dla ciągłych bloków posortowanego klucza — bez groupby.agg per grupa."""
+    k = klucze.to_numpy()
+    if not len(k):
+        return
+    w = wartosci.tolist()
+    starty = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    for a, b in zip(starty.tolist(), np.r_[starty[1:], len(k)].tolist()):
+        yield k[a], w[a:b]
+
+
+def mapa_pmid(
+    df: pd.DataFrame,
+    grosze: pd.Series,
+    data_str_col: str,
+    data_col: str,
+    parowanie: str = "kwota",
+) -> Dict[str, dict]:
+    """
+    Buduje {pmid: {"kw": [...], "daty": [...]}} jednym sortowaniem całej ramki; kwoty w groszach (int),
+    `grosze` wyrównane z wierszami df (core.money.kolumna_groszy). Nazwiska trzyma core.names.SlownikNazwisk.
+
+    parowanie="kwota" — pozycje PMID rosnąco po kwocie (stabilnie: remisy w kolejności wierszy);
+    parowanie="data"  — rosnąco po dacie wyjazdu (brak daty na końcu), potem po kwocie;
+    parowanie="optymalne" — jak "kwota" (kolejność Operations ustala potem dopasuj_optymalnie).
+    Obie strony posortowane tym samym kluczem i zestawione po numerze pozycji w PMID to sort-merge
+    po całym zbiorze: w trybie „data” i-ty najwcześniejszy pobyt w Loyalty trafia na i-ty w Operations,
+    co minimalizuje łączną odległość dat (dla równych liczności) bez pętli po PMID.
+    """
+    if parowanie not in PAROWANIA:
+        raise ValueError(f"Nieznany tryb parowania: {parowanie!r} (dostępne: {', '.join(PAROWANIA)})")
+
+    pmidy = df["pmid"].dropna().unique()
+
+    jest = grosze.notna().to_numpy()
+    kw = df.loc[jest, ["pmid", data_str_col]].assign(_grosze=grosze[jest].astype(np.int64))
+    if parowanie == "data":
+        kw = kw.assign(_dt=_klucz_daty(df.loc[kw.index], data_col, data_str_col))
+        kw = kw.sort_values(["pmid", "_dt", "_grosze"], kind="mergesort", na_position="last")
+    else:
+        kw = kw.sort_values(["pmid", "_grosze"], kind="mergesort")
+    kw_map = dict(_kawalki(kw["pmid"], kw["_grosze"]))
+    dt_map = dict(_kawalki(kw["pmid"], kw[data_str_col]))
+
+    return {
+        p: {"kw": kw_map.get(p, []), "daty": dt_map.get(p, [])}
+        for p in pmidy
+    }
+
+
+def paruj_w_tolerancji(
+    loj_map: Dict[str, dict],
+    ops_map: Dict[str, dict],
+    pmidy: List[str],
+    tolerancja: int,
+) -> Dict[str, Tuple[List[Tuple[int, int]], List[int], List[int]]]:
+    """
+    Paruje kwoty PMID o różnej liczbie pozycji w granicach tolerancji (kwoty i tolerancja w groszach).
+    Zwraca {pmid: (pary (i_loj, i_ops), reszta_loj, reszta_ops)} — indeksy w listach z map.
+
+    Kwoty obu stron trafiają do płaskich tablic posortowanych po (PMID, kwota) — O(n log n) — z osobną
+    parą wskaźników na PMID. Każdy krok przesuwa wskaźniki wszystkich PMID naraz (operacje na tablicach):
+    |Δ| ≤ tolerancja → para, inaczej przesuwa się wskaźnik mniejszej kwoty. Kroków jest tyle, ile pozycji
+    ma najdłuższy PMID (obie strony), a nie tyle, ile wszystkich pozycji. Na posortowanych kwotach taki
+    zachłanny przebieg daje największą możliwą liczbę par.
+    """
+    def _plaskie(mapa):
+        dl = np.fromiter((len(mapa[p]["kw"]) for p in pmidy), dtype=np.int64, count=len(pmidy))
+        kody = np.repeat(np.arange(len(pmidy), dtype=np.int64), dl)
+        kwoty = np.fromiter((v for p in pmidy for v in mapa[p]["kw"]), dtype=np.int64, count=int(dl.sum()))
+        idx = np.arange(len(kody), dtype=np.int64) - np.repeat(np.cumsum(dl) - dl, dl)
+        kolejnosc = np.lexsort((kwoty, kody))
+        return dl, np.cumsum(dl) - dl, kwoty[kolejnosc], idx[kolejnosc]
+
+    dl_l, od_l, lv, li = _plaskie(loj_map)
+    dl_o, od_o, ov, oi = _plaskie(ops_map)
+
+    # partner[i] — pozycja (w płaskiej tablicy Operations) sparowana z i-tą pozycją Loyalty, -1 = brak
+    partner = np.full(len(lv), -1, dtype=np.int64)
+    sparowane_o = np.zeros(len(ov), dtype=bool)
+    wi = np.zeros(len(pmidy), dtype=np.int64)
+    wj = np.zeros(len(pmidy), dtype=np.int64)
+    aktywne = np.flatnonzero((dl_l > 0) & (dl_o > 0))
+    while len(aktywne):
+        a = od_l[aktywne] + wi[aktywne]
+        b = od_o[aktywne] + wj[aktywne]
+        d = lv[a] - ov[b]
+        para = np.abs(d) <= tolerancja
+        partner[a[para]] = b[para]
+        sparowane_o[b[para]] = True
+        wi[aktywne] += para | (d < 0)
+        wj[aktywne] += para | (d > 0)
+        aktywne = aktywne[(wi[aktywne] < dl_l[aktywne]) & (wj[aktywne] < dl_o[aktywne])]
+
+    kody_l = np.repeat(np.arange(len(pmidy)), dl_l).tolist()
+    kody_o = np.repeat(np.arange(len(pmidy)), dl_o).tolist()
+    wynik = {p: ([], [], []) for p in pmidy}
+    for k, i, b in zip(kody_l, li.tolist(), partner.tolist()):
+        if b >= 0:
+            wynik[pmidy[k]][0].append((i, int(oi[b])))
+        else:
+            wynik[pmidy[k]][1].append(i)
+    for k, j, s in zip(kody_o, oi.tolist(), sparowane_o.tolist()):
+        if not s:
+            wynik[pmidy[k]][2].append(j)
+    return wynik
+
+
+# ============ Parowanie optymalne (problem przydziału) ============
+
+def _dni(daty: List[str]) -> np.ndarray:
+    # "RRRR-MM-DD" → numer dnia; brak daty → NaN (bez kary za odległość)
+    a = np.array(daty, dtype=object)
+    jest = a != "—"
+    out = np.full(len(a), np.nan)
+    try:
+        out[jest] = np.array(a[jest].tolist(), dtype="datetime64[D]").astype(np.int64)
+    except ValueError:
+        d = pd.to_datetime(pd.Series(a[jest]), errors="coerce", format="%Y-%m-%d")
+        out[jest] = (d - pd.Timestamp("1970-01-01")).dt.days.to_numpy(dtype=float)
+    return out
+
+
+def _koszty(loj: List[dict], ops: List[dict], k: int, kara_za_dzien: float) -> np.ndarray:
+    """Tensor kosztów (m, k, k) w groszach: |Δ kwot| + kara_za_dzien [zł] × |Δ dni|, dla m grup po k pozycji."""
+    lk = np.array([L["kw"] for L in loj], dtype=float).reshape(-1, k)
+    ok = np.array([O["kw"] for O in ops], dtype=float).reshape(-1, k)
+    koszt = np.abs(lk[:, :, None] - ok[:, None, :])
+    if kara_za_dzien:
+        ld = _dni([d for L in loj for d in L["daty"]]).reshape(-1, k)
+        od = _dni([d for O in ops for d in O["daty"]]).reshape(-1, k)
+        dd = np.nan_to_num(np.abs(ld[:, :, None] - od[:, None, :]), nan=0.0)
+        koszt = koszt + (kara_za_dzien * 100) * dd
+    return koszt
+
+
+def _wegierska(c: np.ndarray) -> List[int]:
+    """Metoda węgierska O(k³) dla kwadratowej macierzy kosztów; zwraca przydział wiersz → kolumna."""
+    n = c.shape[0]
+    u, v = np.zeros(n + 1), np.zeros(n + 1)
+    p, way = np.zeros(n + 1, dtype=int), np.zeros(n + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0], j0 = i, 0
+        minv = np.full(n + 1, np.inf)
+        used = np.zeros(n + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            cur = c[i0 - 1] - u[i0] - v[1:]
+            wolne = ~used[1:]
+            lepsze = wolne & (cur < minv[1:])
+            minv[1:][lepsze] = cur[lepsze]
+            way[1:][lepsze] = j0
+            kand = np.where(wolne, minv[1:], np.inf)
+            j1 = int(np.argmin(kand)) + 1
+            delta = kand[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][wolne] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    przydzial = [0] * n
+    for j in range(1, n + 1):
+        przydzial[p[j] - 1] = j - 1
+    return przydzial
+
+
+def dopasuj_optymalnie(
+    loj_map: Dict[str, dict],
+    ops_map: Dict[str, dict],
+    kara_za_dzien: float = 1.0,
+) -> int:
+    """
+    Dla PMID o równej liczbie pozycji (>1) przestawia kwoty/daty Operations tak, by zestawienie
+    z Loyalty (po pozycji) minimalizowało sumę |Δ| + kara_za_dzien × |różnica dni wyjazdu|.
+    Zmienia ops_map w miejscu; zwraca liczbę PMID, w których kolejność się zmieniła.
+
+    Grupy są zbierane według wielkości i liczone wsadowo: 2:2 to porównanie dwóch przydziałów na całej
+    tablicy naraz, do _MAX_PERMUTACJE pozycji — wektorowy przegląd wszystkich permutacji, powyżej —
+    metoda węgierska per PMID (takie grupy są rzadkie). Przy remisie zostaje kolejność po kwocie.
+    """
+    wg_k: Dict[int, List[str]] = {}
+    for p, L in loj_map.items():
+        O = ops_map.get(p)
+        if O is not None and len(L["kw"]) == len(O["kw"]) > 1:
+            wg_k.setdefault(len(L["kw"]), []).append(p)
+
+    zmienione = 0
+    for k, pmidy in wg_k.items():
+        if k > _MAX_PERMUTACJE:
+            przydzialy = [_wegierska(_koszty([loj_map[p]], [ops_map[p]], k, kara_za_dzien)[0]) for p in pmidy]
+        else:
+            perm = np.array(list(permutations(range(k))), dtype=np.int64)  # pierwsza = tożsamość
+            paczka = max(1, 4_000_000 // (len(perm) * k))  # ogranicza tensor (m, P, k) do ~32 MB
+            przydzialy = []
+            for a in range(0, len(pmidy), paczka):
+                czesc = pmidy[a:a + paczka]
+                koszt = _koszty([loj_map[p] for p in czesc], [ops_map[p] for p in czesc], k, kara_za_dzien)
+                # suma kosztów dla każdej grupy × permutacji: (m, P)
+                sumy = koszt[:, np.arange(k)[None, :], perm].sum(axis=2)
+                sumy[:, 0] -= 1e-9  # remis → zostaw zestawienie po kwocie
+                przydzialy += perm[np.argmin(sumy, axis=1)].tolist()
+        for p, przydzial in zip(pmidy, przydzialy):
+            if przydzial != list(range(k)):
+                O = ops_map[p]
+                O["kw"] = [O["kw"][j] for j in przydzial]
+                O["daty"] = [O["daty"][j] for j in przydzial]
+                zmienione += 1
+    return zmienione
+
+
+# ============ Benchmark: python -m core.matching [LICZBA_PMID ...] ============
+
+def _dane_testowe(n_pmid: int, seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Ramki w kształcie wyjścia wczytaj_loyalty/wczytaj_operations: 1–10 pobytów na PMID, bliskie kwoty."""
+    rng = np.random.default_rng(seed)
+    k = rng.choice(np.arange(1, 11), size=n_pmid, p=[.70, .18, .06, .02, .01, .01, .005, .005, .005, .005])
+    pmid = np.repeat(np.array([f"{i:07d}A" for i in range(n_pmid)]), k)
+    kwota = np.round(rng.uniform(80, 900, len(pmid)), 2)
+    data = pd.Timestamp("2025-03-01") + pd.to_timedelta(rng.integers(0, 14, len(pmid)), unit="D")
+    naz = np.repeat(np.array([f"GOSC{i}" for i in range(n_pmid)]), k)
+    loj = pd.DataFrame({"pmid": pmid, "gosc_nazwisko": naz, "loyal_kwota": kwota,
+                        "loyal_data": data, "loyal_data_str": data.strftime("%Y-%m-%d")})
+    # Operations: te same pobyty, część kwot z groszowym szumem, kolejność wierszy przemieszana
+    szum = np.where(rng.random(len(pmid)) < 0.1, rng.uniform(-0.5, 0.5, len(pmid)), 0.0)
+    ops = pd.DataFrame({"pmid": pmid, "nazwisko": naz, "ops_kwota": np.round(kwota + szum, 2),
+                        "ops_punkty": 1.0, "ops_data": data, "ops_data_str": data.strftime("%Y-%m-%d")})
+    return loj, ops.sample(frac=1.0, random_state=seed).reset_index(drop=True)
+
+
+def benchmark(rozmiary=(500, 20_000, 100_000), powtorzen: int = 3) -> pd.DataFrame:
+    """Czas porownaj() dla parowania "kwota" (zip po kwocie) i "optymalne"; najlepszy z `powtorzen`."""
+    import time
+    from .compare import porownaj
+
+    wiersze = []
+    for n in rozmiary:
+        loj, ops = _dane_testowe(n)
+        czasy = {}
+        for tryb in ("kwota", "optymalne"):
+            best = float("inf")
+            for _ in range(powtorzen):
+                t0 = time.perf_counter()
+                porownaj(loj, ops, parowanie=tryb)
+                best = min(best, time.perf_counter() - t0)
+            czasy[tryb] = best
+        wiersze.append({"PMID": n, "Wierszy": len(loj), "kwota_s": round(czasy["kwota"], 3),
+                        "optymalne_s": round(czasy["optymalne"], 3),
+                        "Krotność": round(czasy["optymalne"] / czasy["kwota"], 2)})
+    return pd.DataFrame(wiersze)
+
+
+if __name__ == "__main__":
+    import sys
+    rozmiary = tuple(int(a) for a in sys.argv[1:]) or (500, 20_000, 100_000)
+    print(benchmark(rozmiary).to_string(index=False))
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Kwoty pieniężne jako liczby całkowite groszy (int64, w pandas: Int64 z <NA> dla braków).
+
+Porównania z tolerancją, sumy i formatowanie na groszach są dokładne — Δ = 0,10 zł to zawsze
+10 groszy, niezależnie od tego, jak 0.1 wygląda w arytmetyce zmiennoprzecinkowej.
+"""
+
+from __future__ import annotations
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+from .utils import przecinek_na_kropke
+
+# białe znaki (też twarde spacje), apostrofy jako separator tysięcy, oznaczenia waluty
+_SMIECI_RE = r"[\s'’]|PLN|ZŁ|ZL"
+# znak, część całkowita (z ewentualnymi separatorami tysięcy), ostatni separator i cyfry po nim
+_KWOTA_RE = r"^(?P<znak>[-+]?)(?P<cz>[\d.,]*?)(?:(?P<sep>[.,])(?P<ul>\d*))?$"
+
+
+def parsuj_grosze(s: pd.Series) -> pd.Series:
+    """
+    Tekstowe kwoty → grosze (Int64), jednym przebiegiem na całej kolumnie.
+
+    Rozpoznaje oba style: „1 234,56”, „1.234,56”, „1,234.56”, „1234.5”, „1'234.56”, „-12,00 zł”.
+    Ostatni separator jest dziesiętny, chyba że ten sam znak występuje też wcześniej („1.234.567”) —
+    wtedy wszystkie są separatorami tysięcy. Więcej niż 2 miejsca po przecinku (np. zapis floata
+    z Excela „123.44999999999999”) są zaokrąglane do grosza połówkami w górę.
+    Czego wzorzec nie rozpozna (np. „1.2E-5”), przechodzi dotychczasową drogą: przecinek → kropka,
+    pd.to_numeric, zaokrąglenie. Puste / nieliczbowe → <NA>.
+    """
+    txt = s.astype("string").str.upper().str.replace(_SMIECI_RE, "", regex=True)
+    m = txt.str.extract(_KWOTA_RE)
+    sep = m["sep"].fillna("")
+    cz = m["cz"].fillna("")
+    ul = m["ul"].fillna("")
+
+    # ten sam separator także w części całkowitej → separator tysięcy, brak części ułamkowej
+    tysiace = ((sep == ".") & cz.str.contains(".", regex=False)) | ((sep == ",") & cz.str.contains(",", regex=False))
+    cz = cz.where(~tysiace, cz + ul).str.replace(r"[.,]", "", regex=True)
+    ul = ul.where(~tysiace, "")
+
+    calkowite = pd.to_numeric(cz.where(cz != "", "0"), errors="coerce").astype("Int64")
+    ul3 = ul.str.slice(0, 3).str.pad(3, side="right", fillchar="0")
+    tysieczne = pd.to_numeric(ul3, errors="coerce").astype("Int64")
+    grosze = calkowite * 100 + (tysieczne + 5) // 10
+    grosze = grosze.where(m["znak"] != "-", -grosze)
+
+    poprawne = m["cz"].notna() & ((cz != "") | (ul != ""))
+    grosze = grosze.where(poprawne)
+
+    # awaryjnie: dotychczasowe parsowanie dla reszty niepustych wartości
+    reszta = ~poprawne & txt.notna() & (txt != "") & (txt != "NAN")
+    if reszta.any():
+        zl = pd.to_numeric(s[reszta].astype(str).map(przecinek_na_kropke), errors="coerce")
+        grosze[reszta] = zl_na_grosze(zl)
+    return grosze.astype("Int64")
+
+
+def zl_na_grosze(zl) -> pd.Series:
+    """
+    Kwoty w złotych (float) → grosze (Int64); połówki grosza w górę (od zera), jak w parsuj_grosze.
+
+    Iloczyn najpierw zaokrąglany do 6 miejsc, żeby 12.345 * 100 = 1234.4999999999998 liczyło się
+    jak zapisane „12,345” (1235 gr), a nie jak jego przybliżenie binarne.
+    """
+    zl = pd.to_numeric(pd.Series(zl), errors="coerce")
+    setne = np.round(zl.abs() * 100, 6)
+    return (np.sign(zl) * np.floor(setne + 0.5)).astype("Int64")
+
+
+def kolumna_groszy(df: pd.DataFrame, strona: str) -> pd.Series:
+    """Kwoty strony ("loyal"/"ops") w groszach: kolumna <strona>_grosze z loadera albo przeliczenie <strona>_kwota."""
+    if f"{strona}_grosze" in df.columns:
+        return df[f"{strona}_grosze"].astype("Int64")
+    return zl_na_grosze(df[f"{strona}_kwota"])
+
+
+def grosze_na_zl(grosze: pd.Series) -> pd.Series:
+    """Grosze → złote jako float64 (do arkuszy i miejsc, które liczą w złotych); <NA> → NaN."""
+    return grosze.astype("Float64").div(100).astype(float)
+
+
+def tolerancja_w_groszach(tolerancja: float) -> int:
+    return int(round(tolerancja * 100))
+
+
+def suma(grosze: pd.Series) -> int:
+    """Suma kwot w groszach (braki pomijane) — dokładna również dla milionów wierszy."""
+    return int(grosze.sum(skipna=True))
+
+
+def fmt_grosze(v: int) -> str:
+    """12345 → '123.45', -5 → '-0.05' (jak f'{zl:.2f}', ale bez błędów zaokrągleń)."""
+    v = int(v)
+    znak = "-" if v < 0 else ""
+    v = abs(v)
+    return f"{znak}{v // 100}.{v % 100:02d}"
+
+
+def fmt_lista_groszy(a: Sequence[int]) -> str:
+    return ", ".join(fmt_grosze(v) for v in a) if len(a) else "—"
+
+
+def fmt_roznice_groszy(a: Sequence[int], b: Sequence[int]) -> str:
+    if not len(a) or not len(b) or len(a) != len(b):
+        return "—"
+    return ", ".join(f"Δ={fmt_grosze(abs(x - y))}" for x, y in zip(a, b))
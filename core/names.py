@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+import pandas as pd
+
+# litery bez rozkładu NFKD (Ł nie rozpada się na L + znak łączący)
+_FOLD = str.maketrans({"Ł": "L", "Ø": "O", "Đ": "D", "Ħ": "H", "Ŧ": "T", "ß": "SS", "Æ": "AE", "Œ": "OE"})
+_TOKEN_SPLIT_RE = re.compile(r"[\s\-‐‑–—/']+")
+_NIELITERY_RE = re.compile(r"[^A-Z]")
+
+# domyślny próg podobieństwa nazwisk (0–1); KOWALSKI ~ KOWALSKY = 0.875
+PROG_NAZWISK = 0.85
+
+
+@lru_cache(maxsize=65536)
+def normalizuj_nazwisko(s: str) -> Tuple[str, ...]:
+    """'Kowalska-Nowak' → ('KOWALSKA', 'NOWAK'); 'Łukasz Żółć' → ('LUKASZ', 'ZOLC'). Pusty/NaN → ()."""
+    if not isinstance(s, str) or not s.strip():
+        return ()
+    s = unicodedata.normalize("NFKD", s.upper().translate(_FOLD))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    tokeny = (_NIELITERY_RE.sub("", t) for t in _TOKEN_SPLIT_RE.split(s))
+    return tuple(t for t in tokeny if t)
+
+
+def _levenshtein(a: str, b: str, limit: int | None = None) -> int:
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    prev = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i]
+        for j, cb in enumerate(b, 1):
+            cur.append(min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + (ca != cb)))
+        if limit is not None and min(cur) > limit:
+            return limit + 1
+        prev = cur
+    return prev[-1]
+
+
+def _podobienstwo_tokenow(a: str, b: str) -> float:
+    if a == b:
+        return 1.0
+    return 1.0 - _levenshtein(a, b) / max(len(a), len(b))
+
+
+@lru_cache(maxsize=262144)
+def podobienstwo(a: str, b: str) -> float:
+    """
+    Podobieństwo nazwisk 0–1 po normalizacji: najlepsza para członów (nazwiska dwuczłonowe pasują
+    do każdego z członów) lub całość bez separatorów. 1.0 = identyczne po złożeniu znaków diakrytycznych.
+    """
+    ta, tb = normalizuj_nazwisko(a), normalizuj_nazwisko(b)
+    if not ta or not tb:
+        return 0.0
+    best = _podobienstwo_tokenow("".join(ta), "".join(tb))
+    for x in ta:
+        for y in tb:
+            if best == 1.0:
+                return best
+            best = max(best, _podobienstwo_tokenow(x, y))
+    return best
+
+
+def najlepsza_para(loj: Iterable[str], ops: Iterable[str]) -> Tuple[float, str, str]:
+    """(wynik, nazwisko Loyalty, nazwisko Operations) najlepiej pasującej pary z dwóch zbiorów."""
+    best = (0.0, "", "")
+    for a in sorted(loj):
+        for b in sorted(ops):
+            s = podobienstwo(a, b)
+            if s > best[0]:
+                best = (s, a, b)
+    return best
+
+
+def _trigramy(t: str) -> Set[str]:
+    t = f"^{t}$"
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+class IndeksNazwisk:
+    """
+    Indeks trigramowy nad członami nazwisk (np. wszystkich nazwisk z Operations).
+    szukaj() zwraca nazwiska o podobieństwie ≥ prog bez porównywania z całym słownikiem:
+    kandydatów wyznaczają wspólne trigramy, a Levenshtein liczony jest tylko dla nich.
+    """
+
+    def __init__(self, nazwiska: Iterable[str]):
+        self._oryginaly: Dict[str, Set[str]] = {}   # człon → pełne nazwiska, w których występuje
+        self._indeks: Dict[str, List[str]] = {}      # trigram → człony
+        for n in set(nazwiska):
+            tokeny = normalizuj_nazwisko(n)
+            for t in tokeny + ("".join(tokeny),):
+                if not t:
+                    continue
+                if t not in self._oryginaly:
+                    self._oryginaly[t] = set()
+                    for g in _trigramy(t):
+                        self._indeks.setdefault(g, []).append(t)
+                self._oryginaly[t].add(n)
+        self._cache: Dict[Tuple[str, float], List[Tuple[str, float]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._oryginaly)
+
+    def szukaj(self, nazwisko: str, prog: float = PROG_NAZWISK) -> List[Tuple[str, float]]:
+        """[(nazwisko z indeksu, wynik)] malejąco po wyniku, tylko wyniki ≥ prog."""
+        klucz = (nazwisko, prog)
+        if klucz in self._cache:
+            return self._cache[klucz]
+        tokeny = normalizuj_nazwisko(nazwisko)
+        wyniki: Dict[str, float] = {}
+        for q in set(tokeny + ("".join(tokeny),)) if tokeny else ():
+            if q in self._oryginaly:
+                for n in self._oryginaly[q]:
+                    wyniki[n] = 1.0
+            # Levenshtein ≤ d zmienia co najwyżej 3·d trigramów — odrzuca kandydatów z za małą częścią wspólną;
+            # wynik ≥ prog ogranicza długość kandydata do len(q)/prog, a więc d do (1−prog)·len(q)/prog
+            d_max = int((1.0 - prog) * len(q) / prog + 1e-9) if prog > 0 else len(q)
+            tq = _trigramy(q)
+            wspolne: Dict[str, int] = {}
+            for g in tq:
+                for t in self._indeks.get(g, ()):
+                    wspolne[t] = wspolne.get(t, 0) + 1
+            for t, c in wspolne.items():
+                if c < len(tq) - 3 * d_max:
+                    continue
+                dl = max(len(q), len(t))
+                d = _levenshtein(q, t, limit=int((1.0 - prog) * dl + 1e-9))
+                s = 1.0 - d / dl
+                if s >= prog:
+                    for n in self._oryginaly[t]:
+                        if s > wyniki.get(n, -1.0):
+                            wyniki[n] = s
+        out = sorted(wyniki.items(), key=lambda kv: (-kv[1], kv[0]))
+        self._cache[klucz] = out
+        return out
+
+    def najlepszy_wynik(self, nazwisko: str, prog: float = PROG_NAZWISK) -> float:
+        trafienia = self.szukaj(nazwisko, prog)
+        return trafienia[0][1] if trafienia else 0.0
+
+
+# ============ Słownik nazwisk (kody całkowite) ============
+
+_PUSTE = np.empty(0, dtype=np.int64)
+
+
+class SlownikNazwisk:
+    """
+    Wspólny słownik nazwisk obu stron: każde nazwisko dostaje kod int (w kolejności alfabetycznej,
+    więc posortowane kody = posortowane nazwiska), a nazwiska PMID to posortowane listy kodów.
+    Sprawdzenia „wspólne nazwisko w PMID” i „nazwisko z Loyalty występuje gdziekolwiek w Operations”
+    liczone są dla wszystkich PMID naraz testami przynależności na tablicach kodów.
+    """
+
+    def __init__(self, loj_pmid: pd.Series, loj_naz: pd.Series, ops_pmid: pd.Series, ops_naz: pd.Series,
+                 ops_globalne: Optional[Sequence[str]] = None):
+        """ops_globalne — nazwiska z całego Operations, gdy ops_* to tylko fragment (domyślnie: ops_naz)."""
+        loj_ok = (loj_pmid.notna() & loj_naz.notna() & (loj_naz != "")).to_numpy()
+        ops_ok = (ops_pmid.notna() & ops_naz.notna() & (ops_naz != "")).to_numpy()
+        glob = (ops_naz.dropna() if ops_globalne is None else pd.Series(ops_globalne, dtype=object)).to_numpy(dtype=object)
+
+        czesci = [loj_naz.to_numpy(dtype=object)[loj_ok], ops_naz.to_numpy(dtype=object)[ops_ok], glob]
+        kody, self.nazwy = pd.factorize(pd.Series(np.concatenate(czesci), dtype=object).astype(str), sort=True)
+        self.nazwy = np.asarray(self.nazwy, dtype=object)
+        self._nazwy = self.nazwy.tolist()
+        kody = kody.astype(np.int64)
+        n_loj, n_ops = len(czesci[0]), len(czesci[1])
+        lk, ok, ok_all = kody[:n_loj], kody[n_loj:n_loj + n_ops], kody[n_loj + n_ops:]
+
+        lp = loj_pmid.to_numpy(dtype=object)[loj_ok]
+        op = ops_pmid.to_numpy(dtype=object)[ops_ok]
+        pk, pmidy = pd.factorize(pd.Series(np.concatenate([lp, op]), dtype=object))
+        pmidy = np.asarray(pmidy, dtype=object)
+        n = np.int64(max(len(self.nazwy), 1))
+        lkl = np.unique(pk[:len(lp)].astype(np.int64) * n + lk)   # klucz (PMID, nazwisko), posortowany
+        okl = np.unique(pk[len(lp):].astype(np.int64) * n + ok)
+
+        # w Operations gdziekolwiek (również wiersze bez PMID)
+        self.w_ops = np.zeros(len(self.nazwy), dtype=bool)
+        self.w_ops[ok_all] = True
+        self.globalnie: Set[str] = set(pmidy[np.unique(lkl[self.w_ops[lkl % n]] // n)].tolist())
+        self.wspolne: Set[str] = set(pmidy[np.unique(lkl[np.isin(lkl, okl, assume_unique=True)] // n)].tolist())
+
+        self.loj = self._per_pmid(lkl, n, pmidy)
+        self.ops = self._per_pmid(okl, n, pmidy)
+
+    @staticmethod
+    def _per_pmid(klucze: np.ndarray, n: np.int64, pmidy: np.ndarray) -> Dict[str, List[int]]:
+        # bloki kolejnych kluczy tego samego PMID; wycinki list są tańsze niż setki tysięcy tablic numpy
+        p = klucze // n
+        k = (klucze % n).tolist()
+        starty = np.flatnonzero(np.r_[True, p[1:] != p[:-1]]) if len(p) else _PUSTE
+        konce = np.r_[starty[1:], len(p)].tolist()
+        return {pmidy[p[a]]: k[a:b] for a, b in zip(starty.tolist(), konce)}
+
+    def kody(self, strona: str, pmid: str) -> List[int]:
+        return (self.loj if strona == "loyalty" else self.ops).get(pmid, [])
+
+    def tekst(self, kody: List[int]) -> str:
+        """Jak utils.fmt_set: nazwiska alfabetycznie po przecinku, pusty zbiór → '—'."""
+        return ", ".join([self._nazwy[i] for i in kody]) if kody else "—"
+
+    def zbior(self, kody: List[int]) -> Set[str]:
+        return {self._nazwy[i] for i in kody}
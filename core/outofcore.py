@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Porównanie poza pamięcią (dla zbiorów większych niż RAM: rok danych, wiele hoteli).
+
+Znormalizowane wiersze obu stron trafiają plik po pliku do lokalnej bazy SQLite (indeks po PMID),
+a porównanie czyta je partiami kolejnych PMID — w kolejności PMID, z obu tabel naraz — i klasyfikuje
+każdą partię od razu (compare.porownaj_pmidy). Gotowe wiersze sekcji też lądują w bazie, więc w pamięci
+jest naraz tylko jedna partia: przy pmidow_na_partie=1 — największa pojedyncza grupa PMID.
+07_FREQ i nazwiska do sprawdzenia „globalnie” liczone zapytaniami na całej tabeli Operations.
+Wynik identyczny z compare.porownaj. Raport zapisuje zapisz_poza_pamiecia — partiami, prosto z bazy
+(report.WRITERS_PARTIAMI); MagazynPMID.wyniki() składa cały wynik w pamięci (testy, małe zbiory).
+"""
+
+from __future__ import annotations
+import os
+import pickle
+import sqlite3
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .compare import (porownaj_pmidy, statusy_czestotliwosci, zloz_wyniki, ramka_przegladu, kolumny_przegladu,
+                      kategoria, priorytet, SEKCJE_PMID, PRZEGLAD)
+from .matching import _klucz_daty
+from .names import IndeksNazwisk
+from .money import kolumna_groszy
+from .profiling import etap, mierz
+from .report import Partie, WRITERS_PARTIAMI
+
+# strona → (tabela, kolumna nazwiska, prefiks kolumn kwoty/daty)
+_STRONY = {
+    "loyalty": ("loyalty", "gosc_nazwisko", "loyal"),
+    "operations": ("operations", "nazwisko", "ops"),
+}
+
+_SCHEMAT = """
+CREATE TABLE IF NOT EXISTS loyalty (pmid TEXT, nazwisko TEXT, grosze INTEGER, data INTEGER, data_str TEXT);
+CREATE TABLE IF NOT EXISTS operations (pmid TEXT, nazwisko TEXT, grosze INTEGER, data INTEGER, data_str TEXT,
+                                       punkty REAL);
+-- wiersze sekcji per partia; 99 dodatkowo podzielone na grupy sortowania arkusza (Kategoria, Priorytet)
+CREATE TABLE IF NOT EXISTS sekcje (sekcja TEXT, kategoria TEXT, priorytet INTEGER, partia INTEGER, wiersze BLOB);
+"""
+
+
+def _obiekty(s: pd.Series) -> list:
+    """Kolumna → lista wartości Pythona z None zamiast NaN/<NA> (tak zapisuje je sqlite3)."""
+    s = s.astype(object)
+    return s.where(s.notna(), None).tolist()
+
+
+class MagazynPMID:
+    """
+    Baza robocza porównania poza pamięcią. Bez `plik` — plik tymczasowy (w `folder` lub katalogu
+    tymczasowym systemu), usuwany przy zamknięciu. Używać jako context manager.
+    """
+
+    def __init__(self, plik: Optional[str | Path] = None, folder: Optional[str | Path] = None):
+        self._tymczasowy = plik is None
+        if plik is None:
+            if folder:
+                Path(folder).mkdir(parents=True, exist_ok=True)
+            fd, plik = tempfile.mkstemp(prefix="porownanie_", suffix=".sqlite", dir=folder)
+            os.close(fd)
+        self.plik = Path(plik)
+        self.con = sqlite3.connect(str(self.plik))
+        # baza jest robocza — bez dziennika i fsync; po awarii i tak liczymy od nowa
+        self.con.execute("PRAGMA journal_mode=OFF")
+        self.con.execute("PRAGMA synchronous=OFF")
+        self.con.executescript(_SCHEMAT)
+        self._zindeksowane = False
+        self._podobienstwo = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.zamknij()
+
+    def zamknij(self):
+        self.con.close()
+        if self._tymczasowy:
+            self.plik.unlink(missing_ok=True)
+
+    # ---------- zapis wejścia ----------
+
+    def dodaj(self, rodzaj: str, df: pd.DataFrame):
+        """Dopisuje znormalizowaną ramkę Loyalty/Operations (wynik loadera) do tabeli strony."""
+        tabela, kol_naz, pref = _STRONY[rodzaj]
+        if df.empty:
+            return
+        # klucz daty taki, jakiego użyłby mapa_pmid (z kolumny daty albo odtworzony z tekstu)
+        dt = _klucz_daty(df, f"{pref}_data", f"{pref}_data_str")
+        ns = pd.array(dt.to_numpy(dtype="datetime64[ns]").astype(np.int64), dtype="Int64")
+        ns[dt.isna().to_numpy()] = pd.NA
+        kolumny = [
+            _obiekty(df["pmid"]),
+            _obiekty(df[kol_naz]),
+            _obiekty(kolumna_groszy(df, pref)),
+            _obiekty(pd.Series(ns)),
+            _obiekty(df[f"{pref}_data_str"]),
+        ]
+        if rodzaj == "operations":
+            kolumny.append(_obiekty(pd.to_numeric(df["ops_punkty"], errors="coerce")))
+        znaki = ", ".join("?" * len(kolumny))
+        self.con.executemany(f"INSERT INTO {tabela} VALUES ({znaki})", zip(*kolumny))
+        self.con.commit()
+        self._zindeksowane = False
+
+    def wczytaj(self, ops_paths: Iterable[str | Path], loy_paths: Iterable[str | Path],
+                cache_dir: Optional[str | Path] = None):
+        """Wczytuje pliki pojedynczo (jak ingest) i od razu zrzuca je do bazy — w pamięci jeden plik naraz."""
+        from .ingest import _wczytaj_jeden
+        cdir = str(cache_dir) if cache_dir else None
+        for rodzaj, paths in (("loyalty", loy_paths), ("operations", ops_paths)):
+            for p in paths:
+                self.dodaj(rodzaj, _wczytaj_jeden(rodzaj, str(p), cdir))
+
+    def _indeksuj(self):
+        if not self._zindeksowane:
+            self.con.execute("CREATE INDEX IF NOT EXISTS ix_loyalty_pmid ON loyalty (pmid)")
+            self.con.execute("CREATE INDEX IF NOT EXISTS ix_operations_pmid ON operations (pmid)")
+            self._zindeksowane = True
+
+    # ---------- odczyt partiami ----------
+
+    def _zakresy(self, pmidow_na_partie: int) -> Iterator[Tuple[str, str]]:
+        # ORDER BY na TEXT porównuje bajty UTF-8 = kolejność punktów kodowych, jak sorted() w Pythonie
+        cur = self.con.execute(
+            "SELECT pmid FROM loyalty WHERE pmid IS NOT NULL "
+            "UNION SELECT pmid FROM operations WHERE pmid IS NOT NULL ORDER BY pmid")
+        while True:
+            blok = cur.fetchmany(pmidow_na_partie)
+            if not blok:
+                return
+            yield blok[0][0], blok[-1][0]
+
+    def _ramka(self, rodzaj: str, od: str, do: str) -> pd.DataFrame:
+        tabela, kol_naz, pref = _STRONY[rodzaj]
+        # rowid w obrębie PMID = kolejność wierszy z plików (remisy przy sortowaniu jak w porownaj)
+        wiersze = self.con.execute(
+            f"SELECT pmid, nazwisko, grosze, data, data_str FROM {tabela} "
+            f"WHERE pmid BETWEEN ? AND ? ORDER BY pmid, rowid", (od, do)).fetchall()
+        pmid, naz, gr, dt, dt_str = zip(*wiersze) if wiersze else ((),) * 5
+        return pd.DataFrame({
+            "pmid": pd.Series(pmid, dtype=object),
+            kol_naz: pd.Series(naz, dtype=object),
+            f"{pref}_grosze": pd.array(gr, dtype="Int64"),
+            f"{pref}_data": pd.to_datetime(pd.Series(dt, dtype="Int64"), unit="ns"),
+            f"{pref}_data_str": pd.Series(dt_str, dtype=object),
+        })
+
+    def partie(self, pmidow_na_partie: int = 5000) -> Iterator[Tuple[pd.DataFrame, pd.DataFrame]]:
+        """(lojal_df, ops_df) dla kolejnych zakresów PMID; każdy PMID w całości w jednej partii."""
+        self._indeksuj()
+        for od, do in self._zakresy(max(1, pmidow_na_partie)):
+            yield self._ramka("loyalty", od, do), self._ramka("operations", od, do)
+
+    def nazwiska_ops(self) -> List[str]:
+        return [r[0] for r in self.con.execute("SELECT DISTINCT nazwisko FROM operations WHERE nazwisko IS NOT NULL")]
+
+    def czestotliwosc(self) -> List[dict]:
+        """07_FREQ zapytaniem na całej tabeli (jak compare.czestotliwosc na pełnym ops_df)."""
+        freq = pd.DataFrame(self.con.execute(
+            "SELECT nazwisko, COUNT(*), SUM(COALESCE(punkty, 0) > 0) FROM operations "
+            "WHERE nazwisko IS NOT NULL GROUP BY nazwisko ORDER BY nazwisko").fetchall(),
+            columns=["nazwisko", "Wiersze", "Wiersze_z_punktami"])
+        return statusy_czestotliwosci(freq)
+
+    # ---------- porównanie ----------
+
+    def porownaj(self, tolerancja: float = 0.10, pmidow_na_partie: int = 5000, **opcje) -> int:
+        """
+        Klasyfikuje wszystkie PMID partiami (opcje jak w compare.porownaj) i zapisuje wiersze sekcji
+        w bazie. Zwraca liczbę partii. Wynik składa potem wyniki() albo czyta partiami arkusze().
+        """
+        ops_nazwiska = self.nazwiska_ops()
+        self.con.execute("DELETE FROM sekcje")
+        self._podobienstwo = opcje.get("prog_nazwisk") is not None
+        # indeks nazwisk z całego Operations — raz, nie w każdej partii
+        indeks = IndeksNazwisk(str(n) for n in ops_nazwiska) if self._podobienstwo else None
+        self._liczby = dict.fromkeys(SEKCJE_PMID + (PRZEGLAD,), 0)
+        self._kolumny = {k: {} for k in SEKCJE_PMID}
+        n = 0
+        for n, (loj, ops) in enumerate(self.partie(pmidow_na_partie), start=1):
+            sekcje = porownaj_pmidy(loj, ops, tolerancja, ops_nazwiska=ops_nazwiska, indeks_nazwisk=indeks, **opcje)
+            grupy: Dict[Tuple[str, int], List[dict]] = {}
+            for w in sekcje.pop(PRZEGLAD):
+                grupy.setdefault((kategoria(w["Status_Auto"]), priorytet(w["Status_Auto"])), []).append(w)
+                self._liczby[PRZEGLAD] += 1
+            wpisy = [(PRZEGLAD, kat, prio, n, wiersze) for (kat, prio), wiersze in grupy.items()]
+            for k, wiersze in sekcje.items():
+                if wiersze:
+                    # kolumny jak w pd.DataFrame(wszystkie wiersze): suma kluczy w kolejności wystąpienia
+                    self._kolumny[k].update(dict.fromkeys(c for w in wiersze for c in w))
+                    self._liczby[k] += len(wiersze)
+                    wpisy.append((k, "", 0, n, wiersze))
+            self.con.executemany("INSERT INTO sekcje VALUES (?, ?, ?, ?, ?)",
+                                 [(*klucz, pickle.dumps(w, protocol=pickle.HIGHEST_PROTOCOL)) for *klucz, w in wpisy])
+        self.con.commit()
+        return n
+
+    def _wiersze(self, sekcja: str) -> Iterator[List[dict]]:
+        """Wiersze sekcji partia po partii; 99 w kolejności arkusza: Kategoria → Priorytet → PMID."""
+        for (blob,) in self.con.execute(
+                "SELECT wiersze FROM sekcje WHERE sekcja = ? ORDER BY kategoria, priorytet, partia", (sekcja,)):
+            yield pickle.loads(blob)
+
+    def wyniki(self) -> Dict[str, pd.DataFrame]:
+        """Arkusze wyniku (jak compare.porownaj) z zapisanych partii — cały wynik naraz w pamięci."""
+        sekcje = {k: [w for wiersze in self._wiersze(k) for w in wiersze] for k in SEKCJE_PMID + (PRZEGLAD,)}
+        return zloz_wyniki(sekcje, self.czestotliwosc(), podobienstwo=self._podobienstwo)
+
+    def arkusze(self) -> Dict[str, Partie]:
+        """
+        Te same arkusze co wyniki(), ale do zapisu partiami (report.WRITERS_PARTIAMI): każda sekcja
+        czytana z bazy partia po partii, więc w pamięci jest naraz jedna partia wierszy, a nie cały wynik.
+        """
+        freq = pd.DataFrame(self.czestotliwosc())
+        pod = pd.DataFrame(
+            [{"Sekcja": k, "Wierszy": self._liczby[k]} for k in SEKCJE_PMID]
+            + [{"Sekcja": "07_FREQ", "Wierszy": len(freq)},
+               {"Sekcja": PRZEGLAD, "Wierszy": self._liczby[PRZEGLAD]}]
+        )
+
+        def _sekcja(k: str) -> Partie:
+            kolumny = list(self._kolumny[k])
+            return kolumny, lambda: (pd.DataFrame(w).reindex(columns=kolumny) for w in self._wiersze(k))
+
+        arkusze: Dict[str, Partie] = {"00_PODSUMOWANIE": (list(pod.columns), lambda: [pod])}
+        arkusze.update({k: _sekcja(k) for k in SEKCJE_PMID})
+        arkusze["07_FREQ"] = (list(freq.columns), lambda: [freq])
+        arkusze[PRZEGLAD] = (kolumny_przegladu(self._podobienstwo), lambda: (ramka_przegladu(w, self._podobienstwo) for w in self._wiersze(PRZEGLAD)))
+        return arkusze
+
+
+@mierz("porownanie")
+def porownaj_poza_pamiecia(
+    ops_paths: Iterable[str | Path],
+    loy_paths: Iterable[str | Path],
+    tolerancja: float = 0.10,
+    folder: Optional[str | Path] = None,
+    cache_dir: Optional[str | Path] = None,
+    pmidow_na_partie: int = 5000,
+    **opcje,
+) -> Dict[str, pd.DataFrame]:
+    """Pliki → baza robocza w `folder` (domyślnie katalog tymczasowy) → porównanie partiami → arkusze."""
+    with MagazynPMID(folder=folder) as mag:
+        mag.wczytaj(ops_paths, loy_paths, cache_dir)
+        mag.porownaj(tolerancja, pmidow_na_partie, **opcje)
+        return mag.wyniki()
+
+
+def zapisz_poza_pamiecia(
+    ops_paths: Iterable[str | Path],
+    loy_paths: Iterable[str | Path],
+    plik: str | Path,
+    fmt: str = "xlsx",
+    tolerancja: float = 0.10,
+    folder: Optional[str | Path] = None,
+    cache_dir: Optional[str | Path] = None,
+    pmidow_na_partie: int = 5000,
+    **opcje,
+) -> Dict[str, int]:
+    """
+    Jak porownaj_poza_pamiecia, ale raport zapisywany partiami prosto z bazy (pamięć nie rośnie z liczbą
+    wierszy wyniku). Zwraca liczności sekcji.
+    """
+    with MagazynPMID(folder=folder) as mag:
+        mag.wczytaj(ops_paths, loy_paths, cache_dir)
+        with etap("porownanie"):
+            mag.porownaj(tolerancja, pmidow_na_partie, **opcje)
+        WRITERS_PARTIAMI[fmt](mag.arkusze(), Path(plik))
+        return dict(mag._liczby)
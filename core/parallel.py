@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor
+import uuid
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .compare import porownaj_pmidy, czestotliwosc, zloz_wyniki, SEKCJE_PMID, PRZEGLAD
+from .names import IndeksNazwisk
+from .profiling import mierz
+
+# kolumny potrzebne w porownaj_pmidy — tylko one jadą do procesów roboczych
+_KOLUMNY_L = ["pmid", "gosc_nazwisko", "loyal_grosze", "loyal_kwota", "loyal_data", "loyal_data_str"]
+_KOLUMNY_O = ["pmid", "nazwisko", "ops_grosze", "ops_kwota", "ops_data", "ops_data_str"]
+
+
+def _shard_id(pmid: pd.Series, n: int) -> np.ndarray:
+    # hash zawartości (nie hash() Pythona — ten jest losowany per proces), więc podział jest powtarzalny
+    return (pd.util.hash_pandas_object(pmid.astype(str), index=False).to_numpy() % np.uint64(n)).astype(np.int64)
+
+
+def podziel(df: pd.DataFrame, kolumny: List[str], n: int) -> List[pd.DataFrame]:
+    """Dzieli ramkę na n shardów po hashu PMID; wszystkie wiersze danego PMID trafiają do jednego shardu."""
+    df = df[[c for c in kolumny if c in df.columns]]
+    sid = _shard_id(df["pmid"], n)
+    return [df[sid == i] for i in range(n)]
+
+
+# indeks nazwisk Operations w procesie roboczym: (klucz wywołania, indeks) — jeden na wywołanie, nie na shard
+_indeks_procesu: Tuple[Optional[str], Optional[IndeksNazwisk]] = (None, None)
+
+
+def _porownaj_shard(klucz: str, lojal_df: pd.DataFrame, ops_df: pd.DataFrame,
+                    ops_nazwiska: Sequence[str], **opcje) -> Dict[str, List[dict]]:
+    global _indeks_procesu
+    indeks = None
+    if opcje.get("prog_nazwisk") is not None:
+        if _indeks_procesu[0] != klucz:
+            _indeks_procesu = (klucz, IndeksNazwisk(str(n) for n in ops_nazwiska))
+        indeks = _indeks_procesu[1]
+    return porownaj_pmidy(lojal_df, ops_df, ops_nazwiska=ops_nazwiska, indeks_nazwisk=indeks, **opcje)
+
+
+def scal_sekcje(czesci: List[Dict[str, List[dict]]]) -> Dict[str, List[dict]]:
+    """
+    Łączy wiersze sekcji z shardów w kolejności PMID, tak jak w przebiegu szeregowym.
+    Sortowanie jest stabilne, więc wiersze jednego PMID (zawsze z jednego shardu) zachowują kolejność.
+    """
+    out = {}
+    for k in SEKCJE_PMID + (PRZEGLAD,):
+        wiersze = [w for cz in czesci for w in cz[k]]
+        wiersze.sort(key=lambda w: w["PMID"])
+        out[k] = wiersze
+    return out
+
+
+@mierz("porownanie")
+def porownaj_rownolegle(
+    lojal_df: pd.DataFrame,
+    ops_df: pd.DataFrame,
+    tolerancja: float = 0.10,
+    jobs: int = 2,
+    shardy: Optional[int] = None,
+    parowanie: str = "kwota",
+    paruj_rozne_liczby: bool = False,
+    kara_za_dzien: float = 1.0,
+    prog_nazwisk: Optional[float] = None,
+    executor: Optional[ProcessPoolExecutor] = None,
+) -> Dict[str, pd.DataFrame]:
+    """
+    Jak compare.porownaj, ale część per PMID liczona w `shardy` kawałkach (domyślnie = jobs)
+    w puli procesów. 07_FREQ i lista nazwisk do sprawdzenia „globalnie” liczone raz, na całości.
+    Wynik identyczny z porownaj (te same arkusze, wiersze i kolejność).
+    """
+    n = max(1, shardy or jobs)
+    opcje = dict(tolerancja=tolerancja, parowanie=parowanie, paruj_rozne_liczby=paruj_rozne_liczby,
+                 kara_za_dzien=kara_za_dzien, prog_nazwisk=prog_nazwisk)
+    ops_nazwiska = ops_df["nazwisko"].dropna().unique().tolist()
+    zadania = list(zip(podziel(lojal_df, _KOLUMNY_L, n), podziel(ops_df, _KOLUMNY_O, n)))
+
+    if jobs <= 1 or n == 1:
+        indeks = IndeksNazwisk(str(x) for x in ops_nazwiska) if prog_nazwisk is not None else None
+        czesci = [porownaj_pmidy(l, o, ops_nazwiska=ops_nazwiska, indeks_nazwisk=indeks, **opcje) for l, o in zadania]
+    else:
+        ex = executor or ProcessPoolExecutor(max_workers=min(jobs, n))
+        try:
+            klucz = uuid.uuid4().hex
+            futs = [ex.submit(_porownaj_shard, klucz, l, o, ops_nazwiska, **opcje) for l, o in zadania]
+            freq_rows = czestotliwosc(ops_df)  # w tym czasie shardy liczą się w procesach
+            czesci = [f.result() for f in futs]
+        finally:
+            if executor is None:
+                ex.shutdown()
+        return zloz_wyniki(scal_sekcje(czesci), freq_rows, podobienstwo=prog_nazwisk is not None)
+
+    return zloz_wyniki(scal_sekcje(czesci), czestotliwosc(ops_df), podobienstwo=prog_nazwisk is not None)
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+Pomiar etapów przebiegu (odczyt, normalizacja, grupowanie, klasyfikacja, wyniki, zapis).
+
+Kod oznacza etapy przez `with etap("nazwa", wiersze=n) as e: ...; e.wynik(m)`. Bez aktywnego
+profilera etap() zwraca wspólny pusty obiekt — koszt to jedno sprawdzenie zmiennej modułu.
+Z profilerem (with Profiler() as p: ...) każdy etap zapisuje czas ścienny, czas CPU procesu,
+wiersze na wejściu/wyjściu i pamięć (przyrost RSS w etapie i szczyt RSS procesu); wynik jako podsumowanie tekstowe
+albo plik Chrome trace (chrome://tracing, https://ui.perfetto.dev). ProfilerPamieci dodatkowo
+śledzi alokacje Pythona (tracemalloc): szczyt w etapie i miejsca w kodzie, które najwięcej zaalokowały.
+"""
+
+from __future__ import annotations
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional
+
+_AKTYWNY: Optional["Profiler"] = None
+
+
+def _rss() -> tuple[int, int]:
+    """(bieżący RSS, szczyt RSS procesu) w bajtach; 0, gdy system nie udostępnia pomiaru."""
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return info.rss, getattr(info, "peak_wset", 0) or _szczyt_rusage()
+    except ImportError:
+        pass
+    rss = 0
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    return rss, _szczyt_rusage()
+
+
+def _szczyt_rusage() -> int:
+    try:
+        import resource
+        import sys
+        szczyt = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return szczyt if sys.platform == "darwin" else szczyt * 1024  # Linux: KiB, macOS: bajty
+    except (ImportError, AttributeError):
+        return 0
+
+
+class _NicEtap:
+    """Etap przy wyłączonym profilowaniu — nic nie mierzy."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def wynik(self, wiersze: int):
+        pass
+
+
+_NIC = _NicEtap()
+
+
+class _Etap:
+    __slots__ = ("prof", "nazwa", "wiersze_we", "wiersze_wy", "t0", "cpu0", "rss0")
+
+    def __init__(self, prof: "Profiler", nazwa: str, wiersze: Optional[int]):
+        self.prof, self.nazwa, self.wiersze_we, self.wiersze_wy = prof, nazwa, wiersze, None
+
+    def __enter__(self):
+        self.prof._wejscie(self)
+        self.rss0 = _rss()[0]
+        self.t0 = time.perf_counter_ns()
+        self.cpu0 = time.process_time_ns()
+        return self
+
+    def __exit__(self, *exc):
+        t1, cpu1 = time.perf_counter_ns(), time.process_time_ns()
+        self.prof._zapisz(self, t1, cpu1)
+        return False
+
+    def wynik(self, wiersze: int):
+        """Liczba wierszy na wyjściu etapu."""
+        self.wiersze_wy = int(wiersze)
+
+
+def etap(nazwa: str, wiersze: Optional[int] = None):
+    """Context manager etapu; `wiersze` — liczba wierszy na wejściu (opcjonalnie)."""
+    p = _AKTYWNY
+    if p is None:
+        return _NIC
+    return _Etap(p, nazwa, None if wiersze is None else int(wiersze))
+
+
+def mierz(nazwa: str):
+    """Dekorator: całe wywołanie funkcji jako etap `nazwa` (bez profilera — bezpośrednie wywołanie)."""
+    def dekorator(func):
+        @functools.wraps(func)
+        def opakowanie(*args, **kwargs):
+            if _AKTYWNY is None:
+                return func(*args, **kwargs)
+            with etap(nazwa):
+                return func(*args, **kwargs)
+        return opakowanie
+    return dekorator
+
+
+class Profiler:
+    """Zbiera pomiary etapów w bieżącym procesie, dopóki jest aktywny (with Profiler() as p)."""
+
+    def __init__(self):
+        self.zdarzenia: List[dict] = []
+        self._t_start = time.perf_counter_ns()
+        self._lock = threading.Lock()
+        self._poprzedni: Optional[Profiler] = None
+
+    def __enter__(self):
+        global _AKTYWNY
+        self._poprzedni, _AKTYWNY = _AKTYWNY, self
+        return self
+
+    def __exit__(self, *exc):
+        global _AKTYWNY
+        _AKTYWNY = self._poprzedni
+        return False
+
+    # --- haki dla etapów (nadpisywane w pomiarach pamięci) ---
+
+    def _wejscie(self, e: _Etap):
+        pass
+
+    def _zapisz(self, e: _Etap, t1: int, cpu1: int, **dodatkowe):
+        rss, szczyt = _rss()
+        # szczyt RSS to szczyt całego procesu od startu (ru_maxrss), nie etapu — per etap liczy się przyrost
+        # RSS; prawdziwy szczyt w etapie mierzy ProfilerPamieci (tracemalloc)
+        args = {"cpu_ms": round((cpu1 - e.cpu0) / 1e6, 3), "rss_mb": round(rss / 2**20, 1),
+                "rss_przyrost_mb": round((rss - e.rss0) / 2**20, 1),
+                "szczyt_procesu_mb": round(szczyt / 2**20, 1)}
+        if e.wiersze_we is not None:
+            args["wiersze_we"] = e.wiersze_we
+        if e.wiersze_wy is not None:
+            args["wiersze_wy"] = e.wiersze_wy
+        args.update(dodatkowe)
+        with self._lock:
+            self.zdarzenia.append({
+                "name": e.nazwa, "ph": "X", "cat": "etap",
+                "ts": (e.t0 - self._t_start) / 1e3, "dur": (t1 - e.t0) / 1e3,
+                "pid": os.getpid(), "tid": threading.get_ident(), "args": args,
+            })
+
+    # --- wyniki ---
+
+    def zapisz_trace(self, plik: str | Path):
+        """Plik JSON w formacie Chrome trace (Trace Event Format, zdarzenia „X”)."""
+        with open(plik, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.zdarzenia, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    def podsumowanie(self) -> str:
+        """
+        Tabela: etap, wywołania, czas ścienny i CPU, wiersze we/wy, przyrost RSS w etapie (suma po wywołaniach)
+        i szczyt RSS procesu na końcu etapu (w kolejności pierwszego wystąpienia).
+        """
+        if not self.zdarzenia:
+            return "(brak zmierzonych etapów)"
+        agg: dict = {}
+        for z in sorted(self.zdarzenia, key=lambda z: z["ts"]):
+            a = agg.setdefault(z["name"], {"n": 0, "wall": 0.0, "cpu": 0.0, "we": None, "wy": None, "przyrost": 0.0,
+                                          "szczyt": 0.0})
+            a["n"] += 1
+            a["wall"] += z["dur"] / 1e6
+            a["cpu"] += z["args"]["cpu_ms"] / 1e3
+            for k, kk in (("we", "wiersze_we"), ("wy", "wiersze_wy")):
+                if kk in z["args"]:
+                    a[k] = (a[k] or 0) + z["args"][kk]
+            a["przyrost"] += z["args"]["rss_przyrost_mb"]
+            a["szczyt"] = max(a["szczyt"], z["args"]["szczyt_procesu_mb"])
+        linie = [f"{'Etap':<28}{'N':>5}{'Czas [s]':>11}{'CPU [s]':>10}{'Wiersze we':>13}{'Wiersze wy':>13}"
+                 f"{'RSS Δ MB':>10}{'Szczyt procesu MB':>19}"]
+        for nazwa, a in agg.items():
+            we = "—" if a["we"] is None else f"{a['we']:,}".replace(",", " ")
+            wy = "—" if a["wy"] is None else f"{a['wy']:,}".replace(",", " ")
+            linie.append(f"{nazwa:<28}{a['n']:>5}{a['wall']:>11.3f}{a['cpu']:>10.3f}{we:>13}{wy:>13}"
+                         f"{a['przyrost']:>+10.1f}{a['szczyt']:>19.1f}")
+        return "\n".join(linie)
+
+
+_KATALOG = Path(__file__).resolve().parents[1]
+
+
+def _miejsce(ramka) -> str:
+    """„plik.py:linia” — ścieżka względem projektu albo site-packages (np. pandas/core/frame.py)."""
+    sciezka = Path(ramka.filename)
+    czlony = sciezka.parts
+    if "site-packages" in czlony:
+        sciezka = Path(*czlony[len(czlony) - czlony[::-1].index("site-packages"):])
+    else:
+        try:
+            sciezka = sciezka.resolve().relative_to(_KATALOG)
+        except (ValueError, OSError):
+            sciezka = Path(sciezka.parent.name, sciezka.name)
+    return f"{sciezka.as_posix()}:{ramka.lineno}"
+
+
+class ProfilerPamieci(Profiler):
+    """
+    Profiler z pomiarem pamięci na granicach etapów: migawka tracemalloc i RSS przy wejściu i wyjściu.
+    Dla etapu zapisuje szczyt pamięci Pythona w trakcie etapu (z etapami zagnieżdżonymi), przyrost
+    netto, RSS na wejściu i `top` miejsc w kodzie o największym przyroście zaalokowanej pamięci.
+    `dziennik` — plik tekstowy dopisywany na bieżąco (z fsync) przy wejściu i wyjściu z etapu: gdy proces
+    zginie z braku pamięci, ostatni wpis „▶” bez „◀” wskazuje etap, w którym to się stało.
+    Migawki kosztują (czas rośnie z liczbą żywych obiektów), a czas etapu nadrzędnego obejmuje migawki etapów
+    w nim zagnieżdżonych — czasy mierzyć zwykłym Profilerem, ten służy do diagnozy pamięci.
+    """
+
+    def __init__(self, top: int = 5, dziennik: Optional[str | Path] = None):
+        super().__init__()
+        self.top = top
+        self.dziennik = Path(dziennik) if dziennik else None
+        self._stos: List[list] = []   # [etap, migawka, szczyt Pythona, pamięć Pythona na wejściu]
+        self._wlaczyl = False
+        # alokacje samego pomiaru i importów nie są „miejscami” etapu (filtr na zgrupowanych
+        # liniach — filter_traces na migawce przechodzi po każdym bloku i kosztuje kilka razy więcej)
+        self._pominiete = (tracemalloc.__file__, __file__, "<frozen ")
+
+    def __enter__(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._wlaczyl = True
+        self._pisz(f"start; RSS {_rss()[0] / 2**20:.1f} MB")
+        return super().__enter__()
+
+    def __exit__(self, *exc):
+        super().__exit__(*exc)
+        if self._wlaczyl:
+            tracemalloc.stop()
+            self._wlaczyl = False
+        self._pisz("koniec" if exc[0] is None else f"przerwane: {exc[0].__name__}")
+        return False
+
+    def _pisz(self, tekst: str):
+        if self.dziennik is None:
+            return
+        with open(self.dziennik, "a", encoding="utf-8") as f:
+            f.write(f"{time.strftime('%H:%M:%S')} {tekst}\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _zbierz_szczyt(self):
+        # szczyt od ostatniego odczytu należy do wszystkich otwartych etapów; reset — od teraz liczymy na nowo
+        _, szczyt = tracemalloc.get_traced_memory()
+        for wpis in self._stos:
+            wpis[2] = max(wpis[2], szczyt)
+        tracemalloc.reset_peak()
+
+    def _wejscie(self, e: _Etap):
+        self._zbierz_szczyt()
+        teraz = tracemalloc.get_traced_memory()[0]
+        migawka = tracemalloc.take_snapshot() if self.top else None
+        self._stos.append([e, migawka, teraz, teraz])
+        self._pisz(f"▶ {e.nazwa}; RSS {_rss()[0] / 2**20:.1f} MB, Python {teraz / 2**20:.1f} MB")
+
+    def _zapisz(self, e: _Etap, t1: int, cpu1: int, **dodatkowe):
+        self._zbierz_szczyt()
+        i = next(i for i in range(len(self._stos) - 1, -1, -1) if self._stos[i][0] is e)
+        _, migawka, szczyt, na_wejsciu = self._stos.pop(i)
+        teraz = tracemalloc.get_traced_memory()[0]
+        miejsca = []
+        if migawka is not None:
+            po = tracemalloc.take_snapshot()
+            roznice = [r for r in po.compare_to(migawka, "lineno")
+                       if r.size_diff > 0 and not r.traceback[0].filename.startswith(self._pominiete)]
+            roznice.sort(key=lambda r: r.size_diff, reverse=True)
+            miejsca = [{"miejsce": _miejsce(r.traceback[0]), "mb": round(r.size_diff / 2**20, 2),
+                        "bloki": r.count_diff} for r in roznice[:self.top]]
+        dodatkowe.update(py_szczyt_mb=round(szczyt / 2**20, 1), py_netto_mb=round((teraz - na_wejsciu) / 2**20, 1),
+                         miejsca=miejsca)
+        super()._zapisz(e, t1, cpu1, **dodatkowe)
+        self._pisz(f"◀ {e.nazwa}; szczyt Pythona {szczyt / 2**20:.1f} MB, netto {(teraz - na_wejsciu) / 2**20:+.1f} MB"
+                   + "".join(f"\n      {m['miejsce']} +{m['mb']:.2f} MB" for m in miejsca))
+
+    def podsumowanie(self) -> str:
+        return super().podsumowanie() + "\n\n" + self.podsumowanie_pamieci()
+
+    def podsumowanie_pamieci(self) -> str:
+        """Szczyt i przyrost pamięci Pythona per etap oraz miejsca o największym przyroście (zsumowane po wywołaniach)."""
+        if not self.zdarzenia:
+            return "(brak zmierzonych etapów)"
+        agg: dict = {}
+        for z in sorted(self.zdarzenia, key=lambda z: z["ts"]):
+            a = agg.setdefault(z["name"], {"szczyt": 0.0, "netto": 0.0, "rss": 0.0, "miejsca": {}})
+            a["szczyt"] = max(a["szczyt"], z["args"]["py_szczyt_mb"])
+            a["netto"] += z["args"]["py_netto_mb"]
+            a["rss"] = max(a["rss"], z["args"]["rss_mb"])
+            for m in z["args"]["miejsca"]:
+                a["miejsca"][m["miejsce"]] = a["miejsca"].get(m["miejsce"], 0.0) + m["mb"]
+        linie = [f"{'Etap':<28}{'Python szczyt MB':>18}{'Python netto MB':>17}{'RSS MB':>10}"]
+        for nazwa, a in agg.items():
+            linie.append(f"{nazwa:<28}{a['szczyt']:>18.1f}{a['netto']:>+17.1f}{a['rss']:>10.1f}")
+        linie.append("")
+        linie.append("Najwięcej zaalokowane (przyrost w etapie):")
+        for nazwa, a in agg.items():
+            top = sorted(a["miejsca"].items(), key=lambda kv: kv[1], reverse=True)[:self.top]
+            if top:
+                linie.append(f"  {nazwa}:")
+                linie.extend(f"      {miejsce:<48} +{mb:.2f} MB" for miejsce, mb in top)
+        return "\n".join(linie)
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Indeks pochodzenia wierszy: PMID → (strona, plik, nr wiersza w arkuszu) dla każdej transakcji.
+
+Loadery zapisują w kolumnie „Wiersz” numer wiersza arkusza, a ingest w „Źródło” nazwę pliku.
+Indeks trzyma to w kilku tablicach NumPy posortowanych po PMID (plik jako kod int), więc zajmuje
+kilka bajtów na wiersz, buduje się jednym sortowaniem i odpowiada wyszukiwaniem binarnym.
+"""
+
+from __future__ import annotations
+from typing import Dict, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+_SEKCJA = "ZRODLA"
+STRONY = ("Loyalty", "Operations")
+
+
+class IndeksZrodel:
+    """PMID → wiersze źródłowe obu stron. Budowa: IndeksZrodel.z_ramek(lojal_df, ops_df)."""
+
+    def __init__(self, pmidy: np.ndarray, starty: np.ndarray, strona: np.ndarray, plik: np.ndarray,
+                 wiersz: np.ndarray, pozycja: np.ndarray, pliki: List[str]):
+        self.pmidy = pmidy        # posortowane unikalne PMID
+        self.starty = starty      # granice bloków PMID w tablicach wierszy (len = len(pmidy) + 1)
+        self.strona = strona      # 0 = Loyalty, 1 = Operations
+        self.plik = plik          # kod pliku → self.pliki
+        self.wiersz = wiersz      # nr wiersza w arkuszu (-1, gdy nieznany)
+        self.pozycja = pozycja    # pozycja wiersza w ramce strony (do .iloc)
+        self.pliki = pliki
+
+    @classmethod
+    def z_ramek(cls, lojal_df: pd.DataFrame, ops_df: pd.DataFrame) -> "IndeksZrodel":
+        czesci = []
+        for kod, df in enumerate((lojal_df, ops_df)):
+            if df.empty or "pmid" not in df.columns:
+                continue
+            zrodlo = df["Źródło"].astype(object) if "Źródło" in df.columns else pd.Series("—", index=df.index)
+            wiersz = df["Wiersz"].to_numpy(dtype=np.int32) if "Wiersz" in df.columns \
+                else np.full(len(df), -1, dtype=np.int32)
+            czesci.append(pd.DataFrame({
+                "pmid": df["pmid"].astype(object).to_numpy(),
+                "strona": np.full(len(df), kod, dtype=np.int8),
+                "zrodlo": zrodlo.to_numpy(),
+                "wiersz": wiersz,
+                "pozycja": np.arange(len(df), dtype=np.int64),
+            }))
+        if not czesci:
+            pusta = np.empty(0, dtype=np.int32)
+            return cls(np.empty(0, dtype=object), np.zeros(1, dtype=np.int64), pusta.astype(np.int8),
+                       pusta, pusta, pusta.astype(np.int64), [])
+
+        t = pd.concat(czesci, ignore_index=True)
+        t = t[t["pmid"].notna()]
+        plik, pliki = pd.factorize(t["zrodlo"], sort=False)
+        kody, pmidy = pd.factorize(t["pmid"], sort=True)
+        # stabilnie po PMID: w bloku najpierw Loyalty, potem Operations, każda strona w kolejności wierszy
+        kolej = np.argsort(kody, kind="stable")
+        starty = np.searchsorted(kody[kolej], np.arange(len(pmidy) + 1), side="left")
+        return cls(np.asarray(pmidy, dtype=object), starty, t["strona"].to_numpy()[kolej],
+                   plik[kolej].astype(np.int32), t["wiersz"].to_numpy()[kolej],
+                   t["pozycja"].to_numpy()[kolej], [str(p) for p in pliki])
+
+    def __len__(self) -> int:
+        return len(self.pmidy)
+
+    def __contains__(self, pmid) -> bool:
+        i = np.searchsorted(self.pmidy, pmid)
+        return i < len(self.pmidy) and self.pmidy[i] == pmid
+
+    def _blok(self, pmid) -> slice:
+        i = int(np.searchsorted(self.pmidy, pmid))
+        if i >= len(self.pmidy) or self.pmidy[i] != pmid:
+            return slice(0, 0)
+        return slice(int(self.starty[i]), int(self.starty[i + 1]))
+
+    def wiersze(self, pmid) -> pd.DataFrame:
+        """Wiersze źródłowe PMID: Strona, Plik, Wiersz (pusta ramka, gdy PMID nie występuje)."""
+        b = self._blok(pmid)
+        return pd.DataFrame({
+            "Strona": [STRONY[s] for s in self.strona[b]],
+            "Plik": [self.pliki[p] for p in self.plik[b]],
+            "Wiersz": self.wiersz[b],
+        })
+
+    def pozycje(self, pmid) -> Dict[str, np.ndarray]:
+        """{"Loyalty": pozycje w lojal_df, "Operations": pozycje w ops_df} — do .iloc na ramkach wejścia."""
+        b = self._blok(pmid)
+        s, poz = self.strona[b], self.pozycja[b]
+        return {nazwa: poz[s == kod] for kod, nazwa in enumerate(STRONY)}
+
+    def arkusz(self, pmidy: Sequence[str] | None = None) -> pd.DataFrame:
+        """
+        Arkusz odnośników: jeden wiersz na (PMID, strona, plik) z listą numerów wierszy arkusza,
+        np. „14, 27”. Bez `pmidy` — wszystkie PMID.
+        """
+        n = np.diff(self.starty)
+        pmid = np.repeat(self.pmidy, n)
+        t = pd.DataFrame({"PMID": pmid, "s": self.strona, "p": self.plik, "Wiersz": self.wiersz})
+        if pmidy is not None:
+            t = t[t["PMID"].isin(set(pmidy))]
+        if t.empty:
+            return pd.DataFrame(columns=["PMID", "Strona", "Plik", "Wiersze"])
+        g = t["Wiersz"].astype(str).groupby([t["PMID"], t["s"], t["p"]], sort=False).agg(", ".join)
+        out = g.reset_index()
+        return pd.DataFrame({
+            "PMID": out["PMID"],
+            "Strona": np.asarray(STRONY, dtype=object)[out["s"].to_numpy()],
+            "Plik": np.asarray(self.pliki, dtype=object)[out["p"].to_numpy()],
+            "Wiersze": out["Wiersz"],
+        })
+
+
+def dolacz_do_wynikow(wyniki: Dict[str, pd.DataFrame], indeks: IndeksZrodel) -> Dict[str, pd.DataFrame]:
+    """Dodaje na końcu arkusz ZRODLA (PMID → plik i wiersze arkusza); 00_PODSUMOWANIE bez zmian."""
+    out = dict(wyniki)
+    out[_SEKCJA] = indeks.arkusz()
+    return out
@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 
+import os
 import re
-from typing import Dict
+import json
+from typing import Callable, Dict, Iterable, List, Tuple
 from pathlib import Path
 import pandas as pd
 
 from .config import STATUS_ALLOWED
+from .profiling import etap, mierz
+
+_SHEET_BAD_RE = re.compile(r'[\[\]\:\*\?\/\\]')
 
 
 def _colnum_to_excel(n: int) -> str:
@@ -29,7 +34,7 @@ def safe_sheet_name(name: str, used: set) -> str:
         "CFG": "CFG"
     }
     s = PREFER.get(name, name)
-    s = re.sub(r'[\[\]\:\*\?\/\\]', '_', s)[:31]
+    s = _SHEET_BAD_RE.sub('_', s)[:31]
     base, i = s, 2
     while s in used:
         suf = f"~{i}"
@@ -38,7 +43,7 @@ def safe_sheet_name(name: str, used: set) -> str:
     used.add(s)
     return s
 
-def _apply_sheet_formatting(wb, ws, df: pd.DataFrame):
+def _naglowek(wb, ws, kolumny: List[str]):
     fmt_header = wb.add_format({"bold": True, "bg_color": "#DDEBF7", "border": 1})
     fmt_wrap   = wb.add_format({"text_wrap": True})
     widths = {
@@ -51,13 +56,95 @@ def _apply_sheet_formatting(wb, ws, df: pd.DataFrame):
         "Kwota_Loyalty":16,"Kwota_Operations":18,
         "Data_Loyalty":16,"Data_Operations":16,
     }
-    for j, col in enumerate(df.columns):
+    for j, col in enumerate(kolumny):
         ws.write(0, j, col, fmt_header)
         ws.set_column(j, j, widths.get(col, 24), fmt_wrap)
+    ws.freeze_panes(1, 0)
+
+def _apply_sheet_formatting(wb, ws, df: pd.DataFrame):
+    _naglowek(wb, ws, list(df.columns))
     if not df.empty:
         ws.autofilter(0, 0, len(df), len(df.columns)-1)
-    ws.freeze_panes(1, 0)
 
+def _legenda(wb, ws0, wierszy: int):
+    fmt_title = wb.add_format({"bold": True, "font_size": 14})
+    fmt_wrap  = wb.add_format({"text_wrap": True})
+    ws0.write(2 + wierszy, 0, "Legenda:", fmt_title)
+    ws0.write(3 + wierszy, 0,
+              "• Klucz porównania: PMID (Operations) vs PMID wyprowadzony z numeru karty Loyalty.\n"
+              "• Zgodność: Δ ≤ 0,10; Niezgodność: Δ > 0,10.\n"
+              "• „INNE_NAZWISKA” – zgodność kwot, ale różne nazwiska.\n"
+              "• PRZEGLĄД: Status_Auto (algorytm), Status_Manual (lista), Status_Final (kolor i kategoria).",
+              fmt_wrap)
+
+def _arkusz_cfg(wb, used: set) -> str:
+    """CFG – słownik statusów (ukryty arkusz, źródło listy Status_Manual i VLOOKUP-ów w 99_*)."""
+    cfg_name = safe_sheet_name("CFG", used)
+    df_cfg = pd.DataFrame({
+        "STATUS": STATUS_ALLOWED,
+        "KATEGORIA": ["OK","PROBLEM","PROBLEM","PROBLEM","PROBLEM","PROBLEM"],
+        "PRIORYTET": [3,2,1,1,1,1],
+    })
+    ws_cfg = wb.add_worksheet(cfg_name)
+    _apply_sheet_formatting(wb, ws_cfg, df_cfg)
+    for i, wiersz in enumerate(df_cfg.itertuples(index=False), start=1):
+        ws_cfg.write_row(i, 0, wiersz)
+    try:
+        ws_cfg.hide()
+    except Exception:
+        pass
+    return cfg_name
+
+def _ma_formuly_99(kolumny: List[str]) -> bool:
+    return all(c in kolumny for c in ("Status_Manual", "Status_Final", "Status_Auto"))
+
+def _formuly_99(ws, rr: int, kolumny: List[str], cfg_name: str):
+    """Formuły wiersza rr (numer wiersza Excela) arkusza 99_*: Status_Final, Kategoria, Priorytet."""
+    L_manual = _colnum_to_excel(kolumny.index("Status_Manual"))
+    L_auto   = _colnum_to_excel(kolumny.index("Status_Auto"))
+    c_final  = kolumny.index("Status_Final")
+    L_final  = _colnum_to_excel(c_final)
+    ws.write_formula(rr-1, c_final, f'=IF(LEN(${L_manual}{rr})>0, ${L_manual}{rr}, ${L_auto}{rr})')
+    zakres = f"{cfg_name}!$A$2:$C${1+len(STATUS_ALLOWED)}"
+    if "Kategoria" in kolumny:
+        ws.write_formula(rr-1, kolumny.index("Kategoria"),
+                         f'=IFERROR(VLOOKUP(${L_final}{rr}, {zakres}, 2, FALSE), "INNE")')
+    if "Priorytet" in kolumny:
+        ws.write_formula(rr-1, kolumny.index("Priorytet"),
+                         f'=IFERROR(VLOOKUP(${L_final}{rr}, {zakres}, 3, FALSE), 9)')
+
+def _walidacja_i_kolory_99(wb, ws, kolumny: List[str], wierszy: int, cfg_name: str):
+    """Lista Status_Manual i kolory wierszy wg Status_Final dla wierszy 2..wierszy+1 arkusza 99_*."""
+    c_manual = kolumny.index("Status_Manual")
+    L_final  = _colnum_to_excel(kolumny.index("Status_Final"))
+    ws.data_validation(1, c_manual, wierszy, c_manual, {
+        "validate": "list",
+        "source": f"={cfg_name}!$A$2:$A${1+len(STATUS_ALLOWED)}"
+    })
+
+    fmt_green = wb.add_format({"bg_color": "#C6E0B4"})
+    fmt_yel   = wb.add_format({"bg_color": "#FFF2CC"})
+    fmt_red   = wb.add_format({"bg_color": "#F8CBAD"})
+    first_row, last_row = 1, wierszy
+    first_col, last_col = 0, len(kolumny)-1
+    ws.conditional_format(first_row, first_col, last_row, last_col, {
+        "type": "formula", "criteria": f'=${L_final}2="ZGODNE"', "format": fmt_green
+    })
+    ws.conditional_format(first_row, first_col, last_row, last_col, {
+        "type": "formula", "criteria": f'=${L_final}2="INNE_NAZWISKA"', "format": fmt_yel
+    })
+    ws.conditional_format(first_row, first_col, last_row, last_col, {
+        "type": "formula",
+        "criteria": (
+            f'=OR(${L_final}2="ROZNICA_KWOT",'
+            f'${L_final}2="ROZNA_LICZBA_TRANSAKCJI",'
+            f'${L_final}2="BRAK_W_OPERATIONS",'
+            f'${L_final}2="BRAK_W_LOYALTY")'
+        ),
+        "format": fmt_red
+    })
+
+@mierz("zapis")
 def zapisz_do_excela(wyniki: Dict[str, pd.DataFrame], plik: Path):
     import xlsxwriter
 
@@ -71,30 +158,9 @@ def zapisz_do_excela(wyniki: Dict[str, pd.DataFrame], plik: Path):
         pod.to_excel(writer, sheet_name=s0, index=False)
         ws0 = writer.sheets[s0]
         _apply_sheet_formatting(wb, ws0, pod)
-        fmt_title = wb.add_format({"bold": True, "font_size": 14})
-        fmt_wrap  = wb.add_format({"text_wrap": True})
-        ws0.write(2 + len(pod), 0, "Legenda:", fmt_title)
-        ws0.write(3 + len(pod), 0,
-                  "• Klucz porównania: PMID (Operations) vs PMID wyprowadzony z numeru karty Loyalty.\n"
-                  "• Zgodność: Δ ≤ 0,10; Niezgodność: Δ > 0,10.\n"
-                  "• „INNE_NAZWISKA” – zgodność kwot, ale różne nazwiska.\n"
-                  "• PRZEGLĄД: Status_Auto (algorytm), Status_Manual (lista), Status_Final (kolor i kategoria).",
-                  fmt_wrap)
-
-        # CFG – słownik statusów
-        cfg_name = safe_sheet_name("CFG", used)
-        df_cfg = pd.DataFrame({
-            "STATUS": STATUS_ALLOWED,
-            "KATEGORIA": ["OK","PROBLEM","PROBLEM","PROBLEM","PROBLEM","PROBLEM"],
-            "PRIORYTET": [3,2,1,1,1,1],
-        })
-        df_cfg.to_excel(writer, sheet_name=cfg_name, index=False)
-        ws_cfg = writer.sheets[cfg_name]
-        _apply_sheet_formatting(wb, ws_cfg, df_cfg)
-        try:
-            ws_cfg.hide()
-        except Exception:
-            pass
+        _legenda(wb, ws0, len(pod))
+
+        cfg_name = _arkusz_cfg(wb, used)
 
         # Pozostałe arkusze
         for name, df in wyniki.items():
@@ -107,65 +173,170 @@ def zapisz_do_excela(wyniki: Dict[str, pd.DataFrame], plik: Path):
                 out[c] = out[c].astype(str)
 
             sname = safe_sheet_name(name, used)
-            out.to_excel(writer, sheet_name=sname, index=False)
+            with etap("zapis_arkusza", wiersze=len(out)):
+                out.to_excel(writer, sheet_name=sname, index=False)
             ws = writer.sheets[sname]
             _apply_sheet_formatting(wb, ws, out)
 
             # 99_* – data validation + formuły + CF wg Status_Final
-            if sname.startswith("99_") and not out.empty:
-                has_manual = "Status_Manual" in out.columns
-                has_final  = "Status_Final"  in out.columns
-                has_auto   = "Status_Auto"   in out.columns
-                has_kat    = "Kategoria"     in out.columns
-                has_prio   = "Priorytet"     in out.columns
-
-                if has_manual and has_final and has_auto:
-                    r1, rN = 2, len(out) + 1
-                    c_manual = out.columns.get_loc("Status_Manual")
-                    c_final  = out.columns.get_loc("Status_Final")
-                    c_auto   = out.columns.get_loc("Status_Auto")
-                    L_manual = _colnum_to_excel(c_manual)
-                    L_final  = _colnum_to_excel(c_final)
-                    L_auto   = _colnum_to_excel(c_auto)
-
-                    ws.data_validation(r1-1, c_manual, rN-1, c_manual, {
-                        "validate": "list",
-                        "source": f"={cfg_name}!$A$2:$A${1+len(STATUS_ALLOWED)}"
-                    })
-                    for rr in range(r1, rN+1):
-                        ws.write_formula(rr-1, c_final,
-                                         f'=IF(LEN(${L_manual}{rr})>0, ${L_manual}{rr}, ${L_auto}{rr})')
-                    if has_kat:
-                        c_kat = out.columns.get_loc("Kategoria")
-                        for rr in range(r1, rN+1):
-                            ws.write_formula(rr-1, c_kat,
-                                f'=IFERROR(VLOOKUP(${L_final}{rr}, {cfg_name}!$A$2:$C${1+len(STATUS_ALLOWED)}, 2, FALSE), "INNE")')
-                    if has_prio:
-                        c_pr = out.columns.get_loc("Priorytet")
-                        for rr in range(r1, rN+1):
-                            ws.write_formula(rr-1, c_pr,
-                                f'=IFERROR(VLOOKUP(${L_final}{rr}, {cfg_name}!$A$2:$C${1+len(STATUS_ALLOWED)}, 3, FALSE), 9)')
-
-                    fmt_green = wb.add_format({"bg_color": "#C6E0B4"})
-                    fmt_yel   = wb.add_format({"bg_color": "#FFF2CC"})
-                    fmt_red   = wb.add_format({"bg_color": "#F8CBAD"})
-                    first_row, last_row = 1, len(out)
-                    first_col, last_col = 0, len(out.columns)-1
-                    ws.conditional_format(first_row, first_col, last_row, last_col, {
-                        "type": "formula", "criteria": f'=${L_final}2="ZGODNE"', "format": fmt_green
-                    })
-                    ws.conditional_format(first_row, first_col, last_row, last_col, {
-                        "type": "formula", "criteria": f'=${L_final}2="INNE_NAZWISKA"', "format": fmt_yel
-                    })
-                    ws.conditional_format(first_row, first_col, last_row, last_col, {
-                        "type": "formula",
-                        "criteria": (
-                            f'=OR(${L_final}2="ROZNICA_KWOT",'
-                            f'${L_final}2="ROZNA_LICZBA_TRANSAKCJI",'
-                            f'${L_final}2="BRAK_W_OPERATIONS",'
-                            f'${L_final}2="BRAK_W_LOYALTY")'
-                        ),
-                        "format": fmt_red
-                    })
+            kolumny = list(out.columns)
+            if sname.startswith("99_") and not out.empty and _ma_formuly_99(kolumny):
+                with etap("formuly_99", wiersze=len(out)):
+                    for rr in range(2, len(out) + 2):
+                        _formuly_99(ws, rr, kolumny, cfg_name)
+                _walidacja_i_kolory_99(wb, ws, kolumny, len(out), cfg_name)
 
     print(f"✅ Raport zapisany: {plik.name}")
+
+
+@mierz("zapis")
+def zapisz_do_csv(wyniki: Dict[str, pd.DataFrame], folder: Path):
+    """Zapisuje każdą sekcję jako osobny plik CSV (UTF-8 z BOM — poprawnie otwiera się w Excelu)."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    used = set()
+    for name, df in wyniki.items():
+        sname = safe_sheet_name(name, used)
+        df.to_csv(folder / f"{sname}.csv", index=False, encoding="utf-8-sig")
+    print(f"✅ Raport CSV zapisany: {folder.name}{os.sep}")
+
+
+@mierz("zapis")
+def zapisz_do_json(wyniki: Dict[str, pd.DataFrame], plik: Path):
+    """Zapisuje wszystkie sekcje do jednego pliku JSON: {sekcja: [wiersze...]}."""
+    dane = {name: json.loads(df.to_json(orient="records", force_ascii=False, date_format="iso"))
+            for name, df in wyniki.items()}
+    with open(plik, "w", encoding="utf-8") as f:
+        json.dump(dane, f, ensure_ascii=False, indent=1)
+    print(f"✅ Raport JSON zapisany: {Path(plik).name}")
+
+
+# ---------- zapis partiami (porównanie poza pamięcią) ----------
+
+# arkusz: (kolumny, funkcja zwracająca kolejne partie wierszy jako DataFrame); brak kolumn = „(brak wpisów)”
+Partie = Tuple[List[str], Callable[[], Iterable[pd.DataFrame]]]
+
+
+@mierz("zapis")
+def zapisz_do_excela_partiami(arkusze: Dict[str, Partie], plik: Path):
+    """
+    Jak zapisz_do_excela, ale arkusze czytane partiami i zapisywane wiersz po wierszu w trybie
+    constant_memory xlsxwriter — w pamięci jest naraz jedna partia, a nie cały wynik.
+    """
+    import xlsxwriter
+
+    wb = xlsxwriter.Workbook(str(plik), {"constant_memory": True})
+    used = set()
+
+    # 00_PODSUMOWANIE — kilka wierszy
+    pod = pd.concat(list(arkusze["00_PODSUMOWANIE"][1]()), ignore_index=True)
+    ws0 = wb.add_worksheet(safe_sheet_name("00_PODSUMOWANIE", used))
+    _apply_sheet_formatting(wb, ws0, pod)
+    for i, wiersz in enumerate(pod.itertuples(index=False, name=None), start=1):
+        ws0.write_row(i, 0, wiersz)
+    _legenda(wb, ws0, len(pod))
+
+    cfg_name = _arkusz_cfg(wb, used)
+
+    for name, (kolumny, partie) in arkusze.items():
+        if name == "00_PODSUMOWANIE":
+            continue
+        if not kolumny:
+            kolumny, partie = ["Info"], lambda: [pd.DataFrame({"Info": ["(brak wpisów)"]})]
+        sname = safe_sheet_name(name, used)
+        ws = wb.add_worksheet(sname)
+        _naglowek(wb, ws, kolumny)
+        formuly = sname.startswith("99_") and _ma_formuly_99(kolumny)
+
+        n = 0
+        with etap("zapis_arkusza") as e:
+            for df in partie():
+                for wiersz in df[kolumny].astype(str).itertuples(index=False, name=None):
+                    n += 1
+                    ws.write_row(n, 0, wiersz)
+                    if formuly:
+                        _formuly_99(ws, n + 1, kolumny, cfg_name)
+            e.wynik(n)
+        if n:
+            ws.autofilter(0, 0, n, len(kolumny)-1)
+            if formuly:
+                _walidacja_i_kolory_99(wb, ws, kolumny, n, cfg_name)
+
+    wb.close()
+    print(f"✅ Raport zapisany: {Path(plik).name}")
+
+
+@mierz("zapis")
+def zapisz_do_csv_partiami(arkusze: Dict[str, Partie], folder: Path):
+    """Jak zapisz_do_csv; każda partia dopisywana do pliku sekcji."""
+    folder = Path(folder)
+    folder.mkdir(parents=True, exist_ok=True)
+    used = set()
+    for name, (kolumny, partie) in arkusze.items():
+        sname = safe_sheet_name(name, used)
+        with open(folder / f"{sname}.csv", "w", encoding="utf-8-sig", newline="") as f:
+            naglowek = True
+            for df in (partie() if kolumny else ()):
+                df[kolumny].to_csv(f, index=False, header=naglowek)
+                naglowek = False
+            if naglowek:
+                pd.DataFrame(columns=kolumny).to_csv(f, index=False)
+    print(f"✅ Raport CSV zapisany: {folder.name}{os.sep}")
+
+
+@mierz("zapis")
+def zapisz_do_json_partiami(arkusze: Dict[str, Partie], plik: Path):
+    """Jak zapisz_do_json (ten sam układ i wcięcia); rekordy każdej partii dopisywane od razu."""
+    with open(plik, "w", encoding="utf-8") as f:
+        f.write("{")
+        for i, (name, (kolumny, partie)) in enumerate(arkusze.items()):
+            f.write(("," if i else "") + "\n " + json.dumps(name, ensure_ascii=False) + ": [")
+            pusty = True
+            for df in (partie() if kolumny else ()):
+                for rek in json.loads(df[kolumny].to_json(orient="records", force_ascii=False, date_format="iso")):
+                    f.write(("\n  " if pusty else ",\n  ")
+                            + json.dumps(rek, ensure_ascii=False, indent=1).replace("\n", "\n  "))
+                    pusty = False
+            f.write("]" if pusty else "\n ]")
+        f.write("\n}" if arkusze else "}")
+    print(f"✅ Raport JSON zapisany: {Path(plik).name}")
+
+
+def zapisz_zbiorcze(zbiorcze: pd.DataFrame, plik: Path):
+    """Skoroszyt zbiorczy trybu wsadowego: jeden wiersz na hotel + wiersz SUMA."""
+    df = zbiorcze.copy()
+    sekcje = [c for c in df.columns if c[:2].isdigit()]
+    if not df.empty and sekcje:
+        suma = {c: int(df[c].sum()) for c in sekcje}
+        suma.update({"Hotel": "SUMA", "Status": f"{int((df['Status'] == 'OK').sum())}/{len(df)} OK"})
+        df = pd.concat([df, pd.DataFrame([suma])], ignore_index=True)
+
+    with pd.ExcelWriter(plik, engine="xlsxwriter") as writer:
+        wb = writer.book
+        sname = safe_sheet_name("00_ZBIORCZO", set())
+        df.to_excel(writer, sheet_name=sname, index=False)
+        ws = writer.sheets[sname]
+        _apply_sheet_formatting(wb, ws, df)
+        for j, col in enumerate(df.columns):
+            if col in sekcje or col == "Hotel":
+                ws.set_column(j, j, 14 if col == "Hotel" else max(12, min(len(col) + 2, 40)))
+        if "Status" in df.columns and len(df):
+            c = df.columns.get_loc("Status")
+            fmt_red = wb.add_format({"bg_color": "#F8CBAD"})
+            ws.conditional_format(1, c, len(df), c, {
+                "type": "text", "criteria": "not containing", "value": "OK", "format": fmt_red
+            })
+    print(f"✅ Podsumowanie zbiorcze zapisane: {Path(plik).name}")
+
+
+WRITERS = {
+    "xlsx": zapisz_do_excela,
+    "csv": zapisz_do_csv,
+    "json": zapisz_do_json,
+}
+
+WRITERS_PARTIAMI = {
+    "xlsx": zapisz_do_excela_partiami,
+    "csv": zapisz_do_csv_partiami,
+    "json": zapisz_do_json_partiami,
+}
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import importlib.util
+from typing import List, Optional
+
+import pandas as pd
+
+# kolumny potrzebne dalej (porównanie, okno, raporty); reszta to surowe kopie z Excela i półprodukty
+KOLUMNY = {
+    "loyalty": ["pmid", "karta_norm", "gosc_nazwisko", "loyal_grosze", "loyal_kwota",
+                "loyal_data", "loyal_data_str", "Źródło", "Wiersz", "Duplikat_z"],
+    "operations": ["pmid", "karta_norm", "nazwisko", "ops_grosze", "ops_kwota", "ops_punkty",
+                   "ops_data", "ops_data_str", "Źródło", "Wiersz", "Duplikat_z"],
+}
+# klucze i nazwy powtarzają się wielokrotnie → categorical (kody int + jeden słownik napisów)
+KATEGORIE = {"pmid", "gosc_nazwisko", "nazwisko", "Źródło", "Duplikat_z", "loyal_data_str", "ops_data_str"}
+
+# numer karty jest prawie unikalny — tu categorical nic nie daje; z pyarrow → napisy Arrow
+_ARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def pamiec(df: pd.DataFrame) -> int:
+    """Rzeczywisty rozmiar ramki w bajtach (z zawartością napisów)."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def kompaktuj(df: pd.DataFrame, rodzaj: str, nazwa: str = "", raport: Optional[List[dict]] = None) -> pd.DataFrame:
+    """
+    Zwęża znormalizowaną ramkę Loyalty/Operations: usuwa surowe kolumny źródłowe i pośrednie
+    (np. gosc_nazwa_raw, ops_punkty_raw), a PMID, nazwiska, źródło i daty tekstowe trzyma jako categorical.
+    Przy podanym `raport` dopisuje {Ramka, Wierszy, Przed_B, Po_B} (memory_usage(deep=True)).
+    """
+    przed = pamiec(df) if raport is not None else 0
+    out = df[[c for c in KOLUMNY[rodzaj] if c in df.columns]].copy()
+    for c in out.columns:
+        if c in KATEGORIE:
+            out[c] = out[c].astype("category")
+    if "karta_norm" in out.columns:
+        out["karta_norm"] = out["karta_norm"].astype("string[pyarrow]" if _ARROW else "category")
+    if raport is not None:
+        raport.append({"Ramka": nazwa or rodzaj, "Wierszy": len(out), "Przed_B": przed, "Po_B": pamiec(out)})
+    return out
+
+
+def fmt_raport_pamieci(raport: List[dict]) -> str:
+    if not raport:
+        return ""
+    df = pd.DataFrame(raport)
+    df["Przed_MB"] = (df["Przed_B"] / 2**20).round(2)
+    df["Po_MB"] = (df["Po_B"] / 2**20).round(2)
+    df["Oszczędność"] = (1 - df["Po_B"] / df["Przed_B"].where(df["Przed_B"] > 0)).map(
+        lambda x: f"{x:.0%}" if pd.notna(x) else "—")
+    return df[["Ramka", "Wierszy", "Przed_MB", "Po_MB", "Oszczędność"]].to_string(index=False)
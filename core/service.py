@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import io
+import json
+import math
+import queue
+import shutil
+import threading
+import time
+import traceback
+import uuid
+import zipfile
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+from urllib.parse import urlparse, parse_qs
+
+from .cache import MemoryCache, ParseCache
+from .ingest import wczytaj_z_pamieci, _scal
+from .utils import _INVALID_WIN_CHARS_RE
+
+FORMATS = ("xlsx", "csv", "json")
+MAX_UPLOAD = 512 * 1024 * 1024  # 512 MB na plik
+
+
+@dataclass
+class Job:
+    id: str
+    ops: List[str]
+    loyalty: List[str]
+    tolerancja: float = 0.10
+    fmt: str = "xlsx"
+    status: str = "queued"       # queued → running → done | error
+    created: float = field(default_factory=time.time)
+    started: Optional[float] = None
+    finished: Optional[float] = None
+    result: Optional[str] = None
+    error: Optional[str] = None
+    sekcje: Dict[str, int] = field(default_factory=dict)
+
+    def as_dict(self) -> dict:
+        d = {
+            "id": self.id, "status": self.status, "format": self.fmt, "tolerance": self.tolerancja,
+            "ops": [Path(p).name for p in self.ops], "loyalty": [Path(p).name for p in self.loyalty],
+            "created": self.created, "started": self.started, "finished": self.finished,
+            "sections": self.sekcje,
+        }
+        if self.started:
+            d["wait_s"] = round(self.started - self.created, 3)
+        if self.finished and self.started:
+            d["run_s"] = round(self.finished - self.started, 3)
+        if self.status == "done":
+            d["result_url"] = f"/jobs/{self.id}/result"
+        if self.error:
+            d["error"] = self.error
+        return d
+
+
+class _Latencje:
+    """Okno ostatnich pomiarów (s) do metryk p50/p95/max."""
+
+    def __init__(self, n: int = 500):
+        self._v: deque = deque(maxlen=n)
+
+    def add(self, v: float):
+        self._v.append(v)
+
+    def summary(self) -> dict:
+        if not self._v:
+            return {"count": 0}
+        s = sorted(self._v)
+        q = lambda f: round(s[min(len(s) - 1, int(f * len(s)))], 4)
+        return {"count": len(s), "p50": q(0.50), "p95": q(0.95), "max": round(s[-1], 4)}
+
+
+class JobService:
+    """
+    Kolejka zadań porównania z ograniczoną pulą wątków roboczych.
+    Interpreter, zaimportowane pandas/openpyxl i ciepła pamięć sparsowanych plików
+    żyją przez cały czas działania usługi — kolejne zlecenia płacą tylko za swoje dane.
+    """
+
+    def __init__(
+        self,
+        work_dir: str | Path,
+        workers: int = 2,
+        max_queue: int = 32,
+        allowed_roots: Optional[List[str | Path]] = None,
+        cache_dir: Optional[str | Path] = None,
+        max_w_pamieci: int = 64,
+        max_jobs: int = 500,
+        pool=None,
+    ):
+        self.work_dir = Path(work_dir).resolve()
+        self.upload_dir = self.work_dir / "uploads"
+        self.result_dir = self.work_dir / "results"
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        self.result_dir.mkdir(parents=True, exist_ok=True)
+        self.allowed_roots = [Path(r).resolve() for r in (allowed_roots or [])] + [self.upload_dir]
+        self.pamiec = MemoryCache(max_w_pamieci, ParseCache(cache_dir) if cache_dir else None)
+        self.max_jobs = max_jobs
+        # opcjonalna rozgrzana pula procesów (core.workers.WarmPool) — wtedy wątki tylko zlecają zadania
+        self.pool = pool
+
+        self.q: "queue.Queue[Job]" = queue.Queue(maxsize=max_queue)
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._running = 0
+        self._done = 0
+        self._failed = 0
+        self._rejected = 0
+        self.lat_wait = _Latencje()
+        self.lat_run = _Latencje()
+        self.started = time.time()
+
+        self._threads = [threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                         for i in range(max(1, workers))]
+        for t in self._threads:
+            t.start()
+
+    # --- wejście ---
+    def _sprawdz_sciezke(self, p: str) -> str:
+        path = Path(p).resolve()
+        if not any(path == r or r in path.parents for r in self.allowed_roots):
+            raise PermissionError(f"Ścieżka poza dozwolonymi folderami: {p}")
+        if not path.is_file():
+            raise FileNotFoundError(f"Brak pliku: {p}")
+        return str(path)
+
+    def zapisz_upload(self, name: str, data: io.BufferedIOBase, length: int) -> str:
+        if length > MAX_UPLOAD:
+            raise ValueError(f"Plik za duży ({length} B).")
+        safe = _INVALID_WIN_CHARS_RE.sub("_", Path(name).name) or "plik.xlsx"
+        if Path(safe).suffix.lower() not in (".xls", ".xlsx", ".csv"):
+            raise ValueError("Obsługiwane są tylko pliki .xls/.xlsx/.csv.")
+        dest = self.upload_dir / f"{uuid.uuid4().hex[:12]}_{safe}"
+        with open(dest, "wb") as f:
+            left = length
+            while left > 0:
+                chunk = data.read(min(left, 1 << 20))
+                if not chunk:
+                    break
+                f.write(chunk)
+                left -= len(chunk)
+        if left > 0:
+            # klient przysłał mniej niż Content-Length — urwany plik nie może trafić do porównania
+            dest.unlink(missing_ok=True)
+            raise ValueError(f"Niepełny plik: otrzymano {length - left} z {length} B.")
+        return str(dest)
+
+    def zglos(self, ops: List[str], loyalty: List[str], tolerancja: float = 0.10, fmt: str = "xlsx") -> Job:
+        if not ops or not loyalty:
+            raise ValueError("Wymagane są pliki 'ops' i 'loyalty'.")
+        if fmt not in FORMATS:
+            raise ValueError(f"Nieznany format: {fmt}")
+        job = Job(
+            id=uuid.uuid4().hex[:16],
+            ops=[self._sprawdz_sciezke(p) for p in ops],
+            loyalty=[self._sprawdz_sciezke(p) for p in loyalty],
+            tolerancja=float(tolerancja), fmt=fmt,
+        )
+        with self._lock:
+            try:
+                self.q.put_nowait(job)
+            except queue.Full:
+                self._rejected += 1
+                raise
+            self.jobs[job.id] = job
+            # wypadają najstarsze zakończone; oczekujące i trwające zostają (ich wynik powstanie później)
+            nadmiar = len(self.jobs) - self.max_jobs
+            if nadmiar > 0:
+                for jid in [j.id for j in self.jobs.values() if j.status in ("done", "error")][:nadmiar]:
+                    old = self.jobs.pop(jid)
+                    if old.result:
+                        shutil.rmtree(old.result, ignore_errors=True) if Path(old.result).is_dir() \
+                            else Path(old.result).unlink(missing_ok=True)
+                    self._usun_uploady(old)
+        return job
+
+    def _uploady(self, job: Job) -> List[Path]:
+        return [Path(p) for p in job.ops + job.loyalty if self.upload_dir in Path(p).parents]
+
+    def _usun_uploady(self, job: Job):
+        # pliki z /uploads usuwanego zadania — chyba że wskazuje je jeszcze inne zadanie (wywołanie pod self._lock)
+        w_uzyciu = {p for j in self.jobs.values() for p in self._uploady(j)}
+        for p in self._uploady(job):
+            if p not in w_uzyciu:
+                p.unlink(missing_ok=True)
+
+    # --- praca ---
+    def _worker(self):
+        while True:
+            job = self.q.get()
+            with self._lock:
+                self._running += 1
+            job.status, job.started = "running", time.time()
+            self.lat_wait.add(job.started - job.created)
+            try:
+                self._wykonaj(job)
+                job.status = "done"
+            except Exception as e:
+                job.status, job.error = "error", f"{type(e).__name__}: {e}"
+                traceback.print_exc()
+            finally:
+                job.finished = time.time()
+                self.lat_run.add(job.finished - job.started)
+                with self._lock:
+                    self._running -= 1
+                    if job.status == "done":
+                        self._done += 1
+                    else:
+                        self._failed += 1
+                self.q.task_done()
+
+    def _wykonaj(self, job: Job):
+        from .compare import porownaj
+        from .report import WRITERS
+
+        out = self.result_dir / (job.id if job.fmt == "csv" else f"{job.id}.{job.fmt}")
+        if self.pool is not None:
+            res = self.pool.uzgodnij(job.ops, job.loyalty, job.tolerancja, out, job.fmt).result()
+            job.sekcje = res["sekcje"]
+            job.result = str(out)
+            return
+
+        lojal_df = _scal([wczytaj_z_pamieci(self.pamiec, "loyalty", p) for p in job.loyalty], "loyalty")
+        ops_df   = _scal([wczytaj_z_pamieci(self.pamiec, "operations", p) for p in job.ops], "operations")
+        wyniki = porownaj(lojal_df, ops_df, tolerancja=job.tolerancja)
+        job.sekcje = {r["Sekcja"]: int(r["Wierszy"]) for _, r in wyniki["00_PODSUMOWANIE"].iterrows()}
+        WRITERS[job.fmt](wyniki, out)
+        job.result = str(out)
+
+    # --- metryki ---
+    def metrics(self) -> dict:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self.started, 1),
+                "workers": len(self._threads),
+                "queue_depth": self.q.qsize(),
+                "queue_capacity": self.q.maxsize,
+                "running": self._running,
+                "done": self._done,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "latency_wait_s": self.lat_wait.summary(),
+                "latency_run_s": self.lat_run.summary(),
+                "cache": {"items": len(self.pamiec), "hits": self.pamiec.hits, "misses": self.pamiec.misses},
+                "processes": self.pool.workers if self.pool is not None else 0,
+            }
+
+
+# ============ HTTP ============
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "loyaltymercure/1"
+    service: JobService  # ustawiane w make_server
+
+    def log_message(self, fmt, *args):
+        print(f"🌐 {self.address_string()} {fmt % args}")
+
+    def _json(self, code: int, obj, headers: Optional[dict] = None):
+        body = json.dumps(obj, ensure_ascii=False, indent=1).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _blad(self, code: int, msg: str, headers: Optional[dict] = None):
+        self._json(code, {"error": msg}, headers)
+
+    def _body_json(self) -> dict:
+        n = int(self.headers.get("Content-Length") or 0)
+        if n <= 0:
+            return {}
+        return json.loads(self.rfile.read(n).decode("utf-8"))
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        parts = [p for p in u.path.split("/") if p]
+        svc = self.service
+        if parts == ["health"]:
+            return self._json(200, {"ok": True})
+        if parts == ["metrics"]:
+            return self._json(200, svc.metrics())
+        if parts == ["jobs"]:
+            with svc._lock:
+                lista = [j.as_dict() for j in list(svc.jobs.values())[-100:]]
+            return self._json(200, lista)
+        if len(parts) >= 2 and parts[0] == "jobs":
+            job = svc.jobs.get(parts[1])
+            if job is None:
+                return self._blad(404, "Nie ma takiego zadania.")
+            if len(parts) == 2:
+                return self._json(200, job.as_dict())
+            if parts[2:] == ["result"]:
+                if job.status != "done" or not job.result:
+                    return self._blad(409, f"Zadanie nie jest gotowe (status: {job.status}).")
+                return self._wyslij_wynik(job)
+        return self._blad(404, "Nieznany adres.")
+
+    def _wyslij_wynik(self, job: Job):
+        res = Path(job.result)
+        if res.is_dir():
+            buf = io.BytesIO()
+            with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+                for f in sorted(res.iterdir()):
+                    z.write(f, f.name)
+            data, ctype, name = buf.getvalue(), "application/zip", f"{job.id}.zip"
+        else:
+            data = res.read_bytes()
+            ctype = {
+                ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                ".json": "application/json; charset=utf-8",
+            }.get(res.suffix, "application/octet-stream")
+            name = res.name
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Content-Disposition", f'attachment; filename="{name}"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        u = urlparse(self.path)
+        parts = [p for p in u.path.split("/") if p]
+        svc = self.service
+        try:
+            if parts == ["uploads"]:
+                # surowe bajty pliku w treści żądania: POST /uploads?name=H3417_LoyaltyExport.xls
+                name = (parse_qs(u.query).get("name") or [""])[0]
+                n = int(self.headers.get("Content-Length") or 0)
+                if not name or n <= 0:
+                    return self._blad(400, "Wymagane: ?name=<plik.xls[x]> i niepusta treść.")
+                path = svc.zapisz_upload(name, self.rfile, n)
+                return self._json(201, {"path": path})
+            if parts == ["jobs"]:
+                d = self._body_json()
+                tolerancja = float(str(d.get("tolerance", 0.10)).replace(",", "."))
+                if not math.isfinite(tolerancja) or tolerancja < 0:
+                    return self._blad(400, f"Tolerancja musi być skończoną liczbą ≥ 0, a jest: {tolerancja}")
+                job = svc.zglos(
+                    ops=list(d.get("ops") or []), loyalty=list(d.get("loyalty") or []),
+                    tolerancja=tolerancja,
+                    fmt=str(d.get("format", "xlsx")),
+                )
+                return self._json(202, job.as_dict(), {"Location": f"/jobs/{job.id}"})
+        except queue.Full:
+            return self._blad(503, "Kolejka pełna — spróbuj ponownie później.", {"Retry-After": "5"})
+        except PermissionError as e:
+            return self._blad(403, str(e))
+        except (ValueError, FileNotFoundError, json.JSONDecodeError) as e:
+            return self._blad(400, str(e))
+        return self._blad(404, "Nieznany adres.")
+
+
+def make_server(service: JobService, host: str = "127.0.0.1", port: int = 8765) -> ThreadingHTTPServer:
+    handler = type("Handler", (_Handler,), {"service": service})
+    srv = ThreadingHTTPServer((host, port), handler)
+    srv.daemon_threads = True
+    return srv
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Tryb szybkiego podsumowania: liczności sekcji z 00_PODSUMOWANIE oraz statusy 99 z sumami kwot i różnic,
+liczone wektorowo na całych ramkach — bez wierszy sekcji (list słowników, tekstów kwot i dat) i bez
+formatowanego skoroszytu. Wyniki te same co w compare.porownaj dla parowania "kwota" i "data".
+"""
+
+from __future__ import annotations
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from .compare import SEKCJE_PMID, PRZEGLAD, czestotliwosc
+from .matching import _klucz_daty
+from .money import kolumna_groszy, tolerancja_w_groszach, grosze_na_zl, fmt_grosze
+from .names import SlownikNazwisk
+from .profiling import etap, mierz
+
+# statusy 99 w kolejności arkusza (Kategoria, Priorytet)
+STATUSY = ("ROZNICA_KWOT", "ROZNA_LICZBA_TRANSAKCJI", "BRAK_W_OPERATIONS", "BRAK_W_LOYALTY",
+           "INNE_NAZWISKA", "ZGODNE")
+PAROWANIA_PODSUMOWANIA = ("kwota", "data")
+
+
+def _pozycje(df: pd.DataFrame, strona: str, parowanie: str) -> pd.DataFrame:
+    """{pmid, grosze, nr}: kwoty strony z numerem pozycji w PMID — kolejność jak w matching.mapa_pmid."""
+    grosze = kolumna_groszy(df, strona)
+    jest = grosze.notna().to_numpy()
+    kw = df.loc[jest, ["pmid"]].assign(grosze=grosze[jest].astype(np.int64))
+    if parowanie == "data":
+        kw = kw.assign(_dt=_klucz_daty(df.loc[kw.index], f"{strona}_data", f"{strona}_data_str"))
+        kw = kw.sort_values(["pmid", "_dt", "grosze"], kind="mergesort", na_position="last")
+    else:
+        kw = kw.sort_values(["pmid", "grosze"], kind="mergesort")
+    kw["nr"] = kw.groupby("pmid", sort=False).cumcount()
+    return kw[["pmid", "grosze", "nr"]]
+
+
+@mierz("podsumowanie")
+def podsumuj(
+    lojal_df: pd.DataFrame,
+    ops_df: pd.DataFrame,
+    tolerancja: float = 0.10,
+    parowanie: str = "kwota",
+) -> Dict[str, pd.DataFrame]:
+    """
+    {"00_PODSUMOWANIE": Sekcja/Wierszy jak w porownaj, "00_STATUSY": per Status_Auto liczba wierszy 99,
+    liczba PMID, suma Loyalty, suma Operations, Δ = Loyalty − Operations i Σ|Δ| (w zł)}.
+    Dla wierszy 99 z listą kwot (różna liczba pozycji, brak po jednej stronie) Δ liczone z sum list.
+    """
+    if parowanie not in PAROWANIA_PODSUMOWANIA:
+        raise ValueError(f"Podsumowanie obsługuje parowanie {', '.join(PAROWANIA_PODSUMOWANIA)}, a jest: {parowanie!r}")
+    tol = tolerancja_w_groszach(tolerancja)
+
+    with etap("grupowanie", wiersze=len(lojal_df) + len(ops_df)) as e:
+        L = _pozycje(lojal_df, "loyal", parowanie)
+        O = _pozycje(ops_df, "ops", parowanie)
+        pm = pd.Index(np.union1d(lojal_df["pmid"].dropna().unique().astype(object),
+                                 ops_df["pmid"].dropna().unique().astype(object)), dtype=object)
+        w_l = pm.isin(lojal_df["pmid"].dropna().unique())
+        w_o = pm.isin(ops_df["pmid"].dropna().unique())
+        agg_l = L.groupby("pmid", sort=False)["grosze"].agg(["size", "sum"]).reindex(pm, fill_value=0)
+        agg_o = O.groupby("pmid", sort=False)["grosze"].agg(["size", "sum"]).reindex(pm, fill_value=0)
+        n_l, s_l = agg_l["size"].to_numpy(np.int64), agg_l["sum"].to_numpy(np.int64)
+        n_o, s_o = agg_o["size"].to_numpy(np.int64), agg_o["sum"].to_numpy(np.int64)
+        naz = SlownikNazwisk(lojal_df["pmid"], lojal_df["gosc_nazwisko"], ops_df["pmid"], ops_df["nazwisko"])
+        naz_ok = pm.isin(list(naz.wspolne))
+        e.wynik(len(pm))
+
+    with etap("klasyfikacja", wiersze=len(pm)) as e:
+        tylko_l, tylko_o = w_l & ~w_o, w_o & ~w_l
+        rozna = w_l & w_o & (n_l != n_o)
+        rowna = w_l & w_o & (n_l == n_o)
+
+        # pary pozycji PMID o równej liczbie (i-ta z i-tą)
+        rowne_pm = set(pm[rowna])
+        pary = L[L["pmid"].isin(rowne_pm)].merge(O[O["pmid"].isin(rowne_pm)], on=["pmid", "nr"], suffixes=("_l", "_o"))
+        d = (pary["grosze_l"] - pary["grosze_o"]).to_numpy(np.int64)
+        ok = np.abs(d) <= tol
+        para_naz_ok = pd.Index(pary["pmid"]).isin(list(naz.wspolne))
+        status_pary = np.where(ok, np.where(para_naz_ok, "ZGODNE", "INNE_NAZWISKA"), "ROZNICA_KWOT")
+
+        # PMID bez pozycji poza tolerancją (także bez par: 0 == 0 pozycji) → 01/03, reszta → 02
+        zle_pm = pd.Index(pary["pmid"][~ok].unique(), dtype=object)
+        wszystkie_ok = rowna & ~pm.isin(zle_pm)
+
+        sekcje = dict(zip(SEKCJE_PMID, (
+            int((wszystkie_ok & naz_ok).sum()),
+            int((rowna & ~wszystkie_ok).sum()),
+            int((wszystkie_ok & ~naz_ok).sum()),
+            int(rozna.sum()),
+            int(tylko_l.sum()),
+            int(tylko_o.sum()),
+        )))
+
+        wiersze = pd.concat([
+            pd.DataFrame({"Status": status_pary, "pmid": pary["pmid"].to_numpy(dtype=object),
+                          "l": pary["grosze_l"].to_numpy(np.int64), "o": pary["grosze_o"].to_numpy(np.int64)}),
+            *(pd.DataFrame({"Status": status, "pmid": pm[maska].to_numpy(dtype=object),
+                            "l": np.where(w_l, s_l, 0)[maska], "o": np.where(w_o, s_o, 0)[maska]})
+              for status, maska in (("ROZNA_LICZBA_TRANSAKCJI", rozna), ("BRAK_W_OPERATIONS", tylko_l),
+                                    ("BRAK_W_LOYALTY", tylko_o))),
+        ], ignore_index=True)
+        e.wynik(len(wiersze))
+
+    wiersze["d"] = wiersze["l"] - wiersze["o"]
+    wiersze["abs_d"] = wiersze["d"].abs()
+    g = wiersze.groupby("Status", sort=False)
+    statusy = pd.DataFrame({
+        "Wierszy": g.size(),
+        "PMID": g["pmid"].nunique(),
+        "Loyalty": g["l"].sum(),
+        "Operations": g["o"].sum(),
+        "Δ": g["d"].sum(),
+        "Σ|Δ|": g["abs_d"].sum(),
+    }).reindex(STATUSY, fill_value=0).rename_axis("Status").reset_index()
+    for c in ("Loyalty", "Operations", "Δ", "Σ|Δ|"):
+        statusy[c] = grosze_na_zl(statusy[c].astype("Int64"))
+
+    pod = pd.DataFrame(
+        [{"Sekcja": k, "Wierszy": v} for k, v in sekcje.items()]
+        + [{"Sekcja": "07_FREQ", "Wierszy": len(czestotliwosc(ops_df))},
+           {"Sekcja": PRZEGLAD, "Wierszy": len(wiersze)}]
+    )
+    return {"00_PODSUMOWANIE": pod, "00_STATUSY": statusy}
+
+
+def fmt_podsumowanie(wyniki: Dict[str, pd.DataFrame]) -> str:
+    """Obie tabele podsumowania jako tekst do konsoli."""
+    linie: List[str] = [f"{'Sekcja':<38}{'Wierszy':>10}"]
+    for r in wyniki["00_PODSUMOWANIE"].itertuples(index=False):
+        linie.append(f"{r.Sekcja:<38}{r.Wierszy:>10}")
+    linie.append("")
+    linie.append(f"{'Status':<26}{'Wierszy':>9}{'PMID':>9}{'Loyalty':>15}{'Operations':>15}{'Δ':>13}{'Σ|Δ|':>13}")
+    for r in wyniki["00_STATUSY"].to_dict("records"):
+        kwoty = [fmt_grosze(round(r[c] * 100)) for c in ("Loyalty", "Operations", "Δ", "Σ|Δ|")]
+        linie.append(f"{r['Status']:<26}{r['Wierszy']:>9}{r['PMID']:>9}"
+                     f"{kwoty[0]:>15}{kwoty[1]:>15}{kwoty[2]:>13}{kwoty[3]:>13}")
+    return "\n".join(linie)
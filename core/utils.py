@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+from __future__ import annotations
+
 import sys
 import re, tempfile, shutil
 from pathlib import Path
@@ -17,6 +19,11 @@ _INVALID_WIN_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
 # niewidoczne znaki z DnD/clipboard (LRM/RLM i embeddingi)
 _INVIS_RE = re.compile(r'[\u202A-\u202E\u200E\u200F]')
 
+# wzorce używane w pętlach normalizacji — kompilowane raz przy imporcie modułu
+_DRIVE_RE   = re.compile(r"[A-Za-z]:\\")
+_WS_RE      = re.compile(r"\s+")
+_SERIAL_RE  = re.compile(r"\d+(\.\d+)?")
+
 def base_dir() -> Path:
     if getattr(sys, "frozen", False):
         return Path(sys.executable).parent
@@ -28,7 +35,7 @@ def _clean_token(s: str) -> str:
     if s.startswith("{") and s.endswith("}"):
         s = s[1:-1]
     # jeśli jest prefiks typu "User: C:\..." — przytnij od litery dysku
-    m = re.search(r"[A-Za-z]:\\", s)
+    m = _DRIVE_RE.search(s)
     if m:
         s = s[m.start():]
     return s
@@ -52,6 +59,41 @@ def read_excel_safe(path: str, **kwargs):
         return pd.read_excel(str(p), **kwargs)
 
 
+def _wykryj_csv(path: str, klucze: Tuple[str, ...], naglowek: int) -> Tuple[int, str, str]:
+    """
+    (indeks wiersza nagłówka, kodowanie, separator) pliku CSV. Nagłówek to pierwsza linia z którąś
+    z nazw kolumn `klucze`; gdy żadnej nie ma — linia `naglowek` (układ jak w eksporcie Excela).
+    """
+    klucze = tuple(k.lower() for k in klucze)
+    for enc in ("utf-8-sig", "cp1250"):
+        try:
+            with open(path, "r", encoding=enc) as f:
+                lines = [next(f, "") for _ in range(max(naglowek, 0) + 20)]
+        except UnicodeDecodeError:
+            continue
+        hdr = next((i for i, l in enumerate(lines) if any(k in l.lower() for k in klucze)), naglowek)
+        linia = lines[hdr] if hdr < len(lines) else ""
+        sep = max((";", "\t", ","), key=linia.count)
+        return hdr, enc, sep
+    return naglowek, "latin-1", ";"
+
+
+def read_table_safe(path: str, naglowek: int, klucze: Tuple[str, ...] = ()) -> Tuple[pd.DataFrame, int]:
+    """
+    Plik wejścia (.xlsx / .xls / .csv) jako tekst → (ramka, indeks wiersza nagłówka).
+    CSV: nagłówek szukany po nazwach kolumn `klucze` (domyślnie w wierszu `naglowek`, jak w Excelu),
+    separator ; / tab / , i kodowanie (UTF-8 albo cp1250) wykrywane z pliku.
+    """
+    s = str(path).lower()
+    if s.endswith(".csv"):
+        hdr, enc, sep = _wykryj_csv(_clean_token(str(path)), klucze, naglowek)
+        df = pd.read_csv(_clean_token(str(path)), sep=sep, dtype=str, encoding=enc, skiprows=hdr,
+                         header=0, skip_blank_lines=False, on_bad_lines="skip")
+        return df.dropna(how="all"), hdr
+    engine = "xlrd" if s.endswith(".xls") else "openpyxl"
+    return read_excel_safe(path, dtype=str, header=naglowek, engine=engine), naglowek
+
+
 def _find_latest(folder: Path, exts: Tuple[str, ...], keywords: Tuple[str, ...]) -> Path:
     items = []
     for ext in exts:
@@ -65,10 +107,10 @@ def _find_latest(folder: Path, exts: Tuple[str, ...], keywords: Tuple[str, ...])
     return items[0]
 
 def znajdz_plik_operations(folder: Path) -> Path:
-    return _find_latest(folder, (".xlsx", ".xls"), ("operation", "operations"))
+    return _find_latest(folder, _WEJSCIE_EXTS, ("operation", "operations"))
 
 def znajdz_plik_loyalty(folder: Path) -> Path:
-    return _find_latest(folder, (".xlsx", ".xls"), ("loyalty", "loyaltyexport"))
+    return _find_latest(folder, _WEJSCIE_EXTS, ("loyalty", "loyaltyexport"))
 
 
 # ============ Normalizacja / helpers ============
@@ -80,7 +122,7 @@ def wyodrebnij_nazwisko(pelne_imie: str) -> str:
 
 def normalizuj_numer_karty(x) -> str:
     s = "" if x is None else str(x)
-    s = re.sub(r"\s+", "", s).strip()
+    s = _WS_RE.sub("", s).strip()
     try:
         return str(int(float(s))).upper()
     except Exception:
@@ -88,7 +130,7 @@ def normalizuj_numer_karty(x) -> str:
 
 def normalizuj_pmid(x) -> str:
     s = "" if x is None else str(x)
-    return re.sub(r"\s+", "", s).strip().upper()
+    return _WS_RE.sub("", s).strip().upper()
 
 def wyciagnij_pmid_z_karty(z_karty: str) -> str:
     """
@@ -122,7 +164,7 @@ def parse_date_any(x):
     if x is None or (isinstance(x, float) and pd.isna(x)) or (isinstance(x, str) and not x.strip()):
         return pd.NaT
     try:
-        if isinstance(x, (int, float)) or (isinstance(x, str) and re.fullmatch(r"\d+(\.\d+)?", x.strip())):
+        if isinstance(x, (int, float)) or (isinstance(x, str) and _SERIAL_RE.fullmatch(x.strip())):
             val = float(x)
             return pd.to_datetime(val, origin="1899-12-30", unit="D", errors="coerce")
     except Exception:
@@ -141,3 +183,43 @@ def wybierz_sciezke_wyjsciowa(folder: Path, limit: int = 31, ext: str = ".xlsx")
         if not p.exists():
             return p
     return min(candidates, key=lambda x: x.stat().st_mtime)
+
+
+# ============ Rozpoznawanie plików (rodzaj / data / hotel) ============
+
+_OPS_KEYWORDS = ("operation", "operations")
+_LOY_KEYWORDS = ("loyalty", "loyaltyexport")
+_WEJSCIE_EXTS = (".xlsx", ".xls", ".csv")
+
+# kod hotelu w nazwie, np. H3417_LoyaltyExport_...xls
+_HOTEL_RE = re.compile(r"(?<![A-Za-z0-9])(H\d{4})(?!\d)", re.IGNORECASE)
+# daty w nazwie: 2025-03-01 / 2025_03_01 / 20250301 / 01.03.2025 / 01-03-2025
+_DATE_YMD_RE = re.compile(r"(?<!\d)(20\d{2})[-_.]?(\d{2})[-_.]?(\d{2})(?!\d)")
+_DATE_DMY_RE = re.compile(r"(?<!\d)(\d{2})[-_.](\d{2})[-_.](20\d{2})(?!\d)")
+
+def rodzaj_pliku(p: Path) -> str | None:
+    """'operations' / 'loyalty' wg słów kluczowych w nazwie (jak _find_latest), inaczej None."""
+    name = p.name.lower()
+    if p.suffix.lower() not in _WEJSCIE_EXTS or name.startswith("~$"):
+        return None
+    if any(k in name for k in _LOY_KEYWORDS):
+        return "loyalty"
+    if any(k in name for k in _OPS_KEYWORDS):
+        return "operations"
+    return None
+
+def data_z_nazwy(name: str):
+    """Pierwsza poprawna data zapisana w nazwie pliku (datetime.date) albo None."""
+    from datetime import date
+    for rx, order in ((_DATE_YMD_RE, (0, 1, 2)), (_DATE_DMY_RE, (2, 1, 0))):
+        for m in rx.finditer(name):
+            g = m.groups()
+            try:
+                return date(int(g[order[0]]), int(g[order[1]]), int(g[order[2]]))
+            except ValueError:
+                continue
+    return None
+
+def hotel_z_nazwy(name: str) -> str | None:
+    m = _HOTEL_RE.search(name)
+    return m.group(1).upper() if m else None
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import os
+import sys
+import time
+import struct
+import select
+import traceback
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .utils import rodzaj_pliku, data_z_nazwy, hotel_z_nazwy
+from .cache import MemoryCache, ParseCache
+from .ingest import wczytaj_z_pamieci, _scal
+
+
+# ============ Backend: inotify (Linux) / polling ============
+
+_IN_MODIFY      = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM  = 0x00000040
+_IN_MOVED_TO    = 0x00000080
+_IN_CREATE      = 0x00000100
+_IN_DELETE      = 0x00000200
+_IN_Q_OVERFLOW  = 0x00004000
+_IN_NONBLOCK    = 0o4000
+_IN_CLOEXEC     = 0o2000000
+_EVENT_HDR      = struct.Struct("iIII")
+
+
+class _InotifyBackend:
+    """Zdarzenia z jądra przez ctypes (bez zewnętrznych pakietów). Tylko Linux."""
+
+    MASK = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+
+    def __init__(self, folders: List[Path]):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.fd = fd
+        self.folders = folders
+        self.wd: Dict[int, Path] = {}
+        for f in folders:
+            wd = libc.inotify_add_watch(fd, os.fsencode(str(f)), self.MASK)
+            if wd < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch: {f}")
+            self.wd[wd] = f
+
+    def wait(self, timeout: float) -> Set[Path]:
+        r, _, _ = select.select([self.fd], [], [], timeout)
+        if not r:
+            return set()
+        out: Set[Path] = set()
+        try:
+            buf = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return out
+        i = 0
+        while i + _EVENT_HDR.size <= len(buf):
+            wd, mask, _cookie, ln = _EVENT_HDR.unpack_from(buf, i)
+            i += _EVENT_HDR.size
+            name = buf[i:i + ln].rstrip(b"\0")
+            i += ln
+            if mask & _IN_Q_OVERFLOW:
+                # kolejka jądra przepełniona (wd = -1, bez nazwy) — część zdarzeń przepadła; przeglądamy
+                # foldery w całości, a niezmienione pliki odsieje porównanie sygnatur w FolderWatcher
+                print("⚠️ Przepełniona kolejka inotify — pełne przeglądanie folderów.")
+                return out | set(_sygnatury(self.folders))
+            if name and wd in self.wd:
+                out.add(self.wd[wd] / os.fsdecode(name))
+        return out
+
+    def close(self):
+        try:
+            os.close(self.fd)
+        except OSError:
+            pass
+
+
+def _sygnatury(folders: List[Path]) -> Dict[Path, Tuple[int, int]]:
+    """{plik: (rozmiar, mtime)} dla plików w folderach — os.scandir, bez otwierania plików."""
+    out = {}
+    for f in folders:
+        try:
+            with os.scandir(f) as it:
+                for e in it:
+                    if e.is_file():
+                        st = e.stat()
+                        out[Path(e.path)] = (st.st_size, st.st_mtime_ns)
+        except FileNotFoundError:
+            continue
+    return out
+
+
+class _PollingBackend:
+    """Tani polling: os.scandir + porównanie (rozmiar, mtime) — bez globowania i bez otwierania plików."""
+
+    def __init__(self, folders: List[Path], interval: float = 2.0):
+        self.folders = folders
+        self.interval = interval
+        self._sig: Dict[Path, Tuple[int, int]] = self._scan()
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        return _sygnatury(self.folders)
+
+    def wait(self, timeout: float) -> Set[Path]:
+        time.sleep(min(timeout, self.interval))
+        new = self._scan()
+        changed = {p for p, s in new.items() if self._sig.get(p) != s}
+        changed |= set(self._sig) - set(new)
+        self._sig = new
+        return changed
+
+    def close(self):
+        pass
+
+
+def _backend(folders: List[Path], polling: bool, interval: float):
+    if not polling and sys.platform.startswith("linux"):
+        try:
+            return _InotifyBackend(folders)
+        except Exception as e:
+            print(f"ℹ️ inotify niedostępne ({e}) — przełączam na polling.")
+    return _PollingBackend(folders, interval)
+
+
+# ============ Obserwator ============
+
+def klucz_pary(p: Path) -> Tuple[Optional[str], Optional[str]]:
+    """(data ISO, kod hotelu) z nazwy pliku — po tym łączymy Operations z Loyalty."""
+    d = data_z_nazwy(p.name)
+    return (d.isoformat() if d else None, hotel_z_nazwy(p.name))
+
+
+def _pasuje(a: Tuple[Optional[str], Optional[str]], b: Tuple[Optional[str], Optional[str]]) -> bool:
+    # data musi być równa; hotel tylko wtedy, gdy obie nazwy go zawierają (Operations zwykle go nie ma)
+    if a[0] != b[0]:
+        return False
+    return a[1] is None or b[1] is None or a[1] == b[1]
+
+
+class FolderWatcher:
+    """
+    Tryb czuwania: obserwuje foldery, czeka aż nowe pliki Operations/Loyalty przestaną się zmieniać
+    (debounce), paruje je po dacie/hotelu z nazwy i uruchamia porównanie.
+    Sparsowane ramki zostają w pamięci (LRU), więc każdy nowy plik kosztuje tylko własne parsowanie.
+    """
+
+    def __init__(
+        self,
+        folders: Iterable[str | Path],
+        output_dir: str | Path,
+        tolerancja: float = 0.10,
+        fmt: str = "xlsx",
+        debounce: float = 5.0,
+        interval: float = 2.0,
+        polling: bool = False,
+        cache_dir: Optional[str | Path] = None,
+        max_w_pamieci: int = 64,
+        on_result: Optional[Callable[[Path], None]] = None,
+        okno_dni: int = 0,
+        okno_plik: str | Path = "okno_niesparowanych.pkl",
+        parowanie: str = "kwota",
+        paruj_rozne_liczby: bool = False,
+        kara_za_dzien: float = 1.0,
+        prog_nazwisk: Optional[float] = None,
+    ):
+        self.folders = [Path(f).resolve() for f in folders]
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.tolerancja = tolerancja
+        self.parowanie = parowanie
+        self.paruj_rozne_liczby = paruj_rozne_liczby
+        self.kara_za_dzien = kara_za_dzien
+        self.prog_nazwisk = prog_nazwisk
+        self.fmt = fmt
+        self.debounce = debounce
+        self.interval = interval
+        self.polling = polling
+        self.pamiec = MemoryCache(max_w_pamieci, ParseCache(cache_dir) if cache_dir else None)
+        self.on_result = on_result
+        # opcjonalne okno międzydniowe (core.window) — dni przetwarzane w kolejności napływu
+        self.okno = None
+        if okno_dni > 0:
+            from .window import OknoNiesparowanych
+            self.okno = OknoNiesparowanych(okno_plik, okno_dni=okno_dni, tolerancja=tolerancja,
+                                           paruj_rozne_liczby=paruj_rozne_liczby)
+
+        self._stop = False
+        # znane, gotowe pliki: ścieżka → (rodzaj, klucz, sygnatura)
+        self.known: Dict[Path, Tuple[str, Tuple[Optional[str], Optional[str]], Tuple[int, int]]] = {}
+        # kandydaci w trakcie zapisu: ścieżka → (sygnatura, od kiedy stabilna)
+        self._pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+
+    # --- stan plików ---
+    @staticmethod
+    def _sig(p: Path) -> Optional[Tuple[int, int]]:
+        try:
+            st = p.stat()
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns)
+
+    def _zarejestruj_istniejace(self, uruchom: bool) -> Set[Tuple[Optional[str], Optional[str]]]:
+        klucze = set()
+        for f in self.folders:
+            for p in f.iterdir():
+                r = rodzaj_pliku(p)
+                sig = self._sig(p)
+                if r and sig and sig[0] > 0:
+                    k = klucz_pary(p)
+                    self.known[p] = (r, k, sig)
+                    klucze.add(k)
+        return klucze if uruchom else set()
+
+    def _zglos(self, paths: Iterable[Path]):
+        for p in paths:
+            if rodzaj_pliku(p) is None:
+                continue
+            sig = self._sig(p)
+            if sig is None:
+                self.known.pop(p, None)
+                self.pamiec.discard(p)
+                self._pending.pop(p, None)
+                continue
+            if p in self.known and self.known[p][2] == sig:
+                continue
+            self._pending[p] = (sig, time.monotonic())
+
+    def _dojrzale(self) -> Set[Tuple[Optional[str], Optional[str]]]:
+        """Przenosi do `known` pliki, których rozmiar i mtime nie zmieniły się przez `debounce` sekund."""
+        teraz = time.monotonic()
+        klucze = set()
+        for p, (sig, od) in list(self._pending.items()):
+            cur = self._sig(p)
+            if cur is None:
+                del self._pending[p]
+                continue
+            if cur != sig:
+                self._pending[p] = (cur, teraz)
+                continue
+            if cur[0] == 0 or teraz - od < self.debounce:
+                continue
+            del self._pending[p]
+            k = klucz_pary(p)
+            self.known[p] = (rodzaj_pliku(p), k, cur)
+            print(f"📥 Nowy plik: {p.name}")
+            klucze.add(k)
+        return klucze
+
+    # --- porównanie ---
+    def _pliki_dla(self, klucz) -> Tuple[List[Path], List[Path]]:
+        ops = sorted(p for p, (r, k, _) in self.known.items() if r == "operations" and _pasuje(k, klucz))
+        loy = sorted(p for p, (r, k, _) in self.known.items() if r == "loyalty" and _pasuje(k, klucz))
+        return ops, loy
+
+    def _nazwa_wyjscia(self, klucz) -> Path:
+        data, hotel = klucz
+        stem = "_".join(x for x in (hotel, data) if x) or "raport"
+        ext = "" if self.fmt == "csv" else f".{self.fmt}"
+        return self.output_dir / f"{stem}{ext}"
+
+    def uzgodnij(self, klucz) -> Optional[Path]:
+        from .compare import porownaj
+        from .report import WRITERS
+
+        ops, loy = self._pliki_dla(klucz)
+        if not ops or not loy:
+            return None
+        print(f"🔎 Para {klucz[0] or '(bez daty)'}{' ' + klucz[1] if klucz[1] else ''}: "
+              + ", ".join(p.name for p in ops + loy))
+        lojal_df = _scal([wczytaj_z_pamieci(self.pamiec, "loyalty", p) for p in loy], "loyalty")
+        ops_df   = _scal([wczytaj_z_pamieci(self.pamiec, "operations", p) for p in ops], "operations")
+        wyniki = porownaj(lojal_df, ops_df, tolerancja=self.tolerancja, parowanie=self.parowanie,
+                          paruj_rozne_liczby=self.paruj_rozne_liczby, kara_za_dzien=self.kara_za_dzien,
+                          prog_nazwisk=self.prog_nazwisk)
+        if self.okno is not None and klucz[0]:
+            from datetime import date
+            from .window import dolacz_do_wynikow
+
+            wyniki = dolacz_do_wynikow(wyniki, self.okno.przetworz_dzien(lojal_df, ops_df, date.fromisoformat(klucz[0])))
+            self.okno.zapisz()
+        out = self._nazwa_wyjscia(klucz)
+        WRITERS[self.fmt](wyniki, out)
+        if self.on_result:
+            self.on_result(out)
+        return out
+
+    def _uzgodnij_bezpiecznie(self, klucze):
+        # klucz Loyalty z hotelem może dotyczyć kilku par — uzgadniamy każdą raz
+        for k in sorted(klucze, key=lambda x: (x[0] or "", x[1] or "")):
+            try:
+                self.uzgodnij(k)
+            except Exception:
+                print(f"❌ Błąd uzgadniania {k}:")
+                print(traceback.format_exc())
+
+    # --- pętla ---
+    def stop(self):
+        self._stop = True
+
+    def run(self, existing: bool = False):
+        klucze = self._zarejestruj_istniejace(uruchom=existing)
+        backend = _backend(self.folders, self.polling, self.interval)
+        tryb = "inotify" if isinstance(backend, _InotifyBackend) else f"polling co {self.interval:g}s"
+        print(f"👀 Czuwam ({tryb}): " + ", ".join(str(f) for f in self.folders))
+        try:
+            if klucze:
+                self._uzgodnij_bezpiecznie(self._rozszerz_klucze(klucze))
+            while not self._stop:
+                # gdy coś czeka na debounce — budź się częściej
+                timeout = min(self.interval, max(self.debounce / 4, 0.2)) if self._pending else self.interval
+                self._zglos(backend.wait(timeout))
+                klucze = self._dojrzale()
+                if klucze:
+                    self._uzgodnij_bezpiecznie(self._rozszerz_klucze(klucze))
+        except KeyboardInterrupt:
+            print("\n⏹️ Zatrzymano.")
+        finally:
+            backend.close()
+
+    def _rozszerz_klucze(self, klucze):
+        # plik Operations bez kodu hotelu pasuje do wszystkich hoteli z tą samą datą
+        out = set()
+        for k in klucze:
+            if k[1] is None:
+                hotele = {kk[1] for (_, kk, _) in self.known.values() if kk[0] == k[0] and kk[1]}
+                out |= {(k[0], h) for h in hotele} or {k}
+            else:
+                out.add(k)
+        return out
@@ -0,0 +1,270 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import os
+import pickle
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from .compare import dodaj_sekcje
+from .matching import paruj_w_tolerancji
+from .money import kolumna_groszy, zl_na_grosze, tolerancja_w_groszach, fmt_grosze
+from .utils import fmt_date
+
+# kolumny magazynu niesparowanych transakcji (kwoty w groszach, jak w compare);
+# dzien — dzień, który dołożył pozycję, sparowane — dzień, który ją zużył (NaT: wciąż bez pary)
+_KOLUMNY = ["strona", "pmid", "grosze", "data", "nazwisko", "dzien", "sparowane", "zrodlo"]
+_DATY = ("data", "dzien", "sparowane")
+_SEKCJA = "08_MIEDZY_DNIAMI"
+
+
+def _reszta_roznych(loj: pd.DataFrame, ops: pd.DataFrame, tolerancja: float):
+    """Wiersze bez pary z PMID o różnej liczbie pozycji — parowanie jak compare przy paruj_rozne_liczby."""
+    oba = np.intersect1d(loj["pmid"].dropna().unique().astype(object), ops["pmid"].dropna().unique().astype(object))
+    l, o = loj[loj["pmid"].isin(oba)], ops[ops["pmid"].isin(oba)]
+    gl, go = l.groupby("pmid", sort=False).indices, o.groupby("pmid", sort=False).indices
+    rozne = [p for p in oba.tolist() if len(gl[p]) != len(go[p])]
+    kw_l, kw_o = l["_grosze"].to_numpy(dtype=np.int64), o["_grosze"].to_numpy(dtype=np.int64)
+    pary = paruj_w_tolerancji({p: {"kw": kw_l[gl[p]].tolist()} for p in rozne},
+                              {p: {"kw": kw_o[go[p]].tolist()} for p in rozne},
+                              rozne, tolerancja_w_groszach(tolerancja))
+    return (l.iloc[[gl[p][i] for p in rozne for i in pary[p][1]]],
+            o.iloc[[go[p][j] for p in rozne for j in pary[p][2]]])
+
+
+def niesparowane(lojal_df: pd.DataFrame, ops_df: pd.DataFrame, dzien: date,
+                 tolerancja: Optional[float] = None) -> pd.DataFrame:
+    """
+    Transakcje bez pary w tym samym dniu: PMID tylko w Loyalty (strona 'L') i tylko w Operations ('O').
+    Z `tolerancja` (porównanie z paruj_rozne_liczby) dochodzą też pozycje bez pary z PMID o różnej
+    liczbie pozycji po obu stronach. Zwraca zwartą ramkę w układzie magazynu okna.
+    """
+    loj = lojal_df.assign(_grosze=kolumna_groszy(lojal_df, "loyal")).dropna(subset=["_grosze"])
+    ops = ops_df.assign(_grosze=kolumna_groszy(ops_df, "ops")).dropna(subset=["_grosze"])
+    l_only = loj[~loj["pmid"].isin(ops_df["pmid"])]
+    o_only = ops[~ops["pmid"].isin(lojal_df["pmid"])]
+    if tolerancja is not None:
+        reszta_l, reszta_o = _reszta_roznych(loj, ops, tolerancja)
+        l_only, o_only = pd.concat([l_only, reszta_l]), pd.concat([o_only, reszta_o])
+
+    def _ramka(df, strona, dt, naz):
+        return pd.DataFrame({
+            "strona": strona,
+            "pmid": df["pmid"].astype(str).to_numpy(),
+            "grosze": df["_grosze"].to_numpy(dtype=np.int64),
+            "data": pd.to_datetime(df[dt], errors="coerce").to_numpy() if dt in df.columns
+                    else np.full(len(df), np.datetime64("NaT"), "datetime64[ns]"),
+            "nazwisko": df[naz].astype(str).to_numpy() if naz in df.columns else "",
+            "dzien": pd.Timestamp(dzien),
+            "sparowane": pd.NaT,
+            "zrodlo": df["Źródło"].astype(str).to_numpy() if "Źródło" in df.columns else "",
+        })
+
+    czesci = [_ramka(l_only, "L", "loyal_data", "gosc_nazwisko"),
+              _ramka(o_only, "O", "ops_data", "nazwisko")]
+    niepuste = [df for df in czesci if not df.empty]
+    out = pd.concat(niepuste, ignore_index=True) if niepuste else czesci[0]
+    return out[_KOLUMNY]
+
+
+def _klucze(pmid_kody: np.ndarray, grosze: np.ndarray) -> np.ndarray:
+    # klucz złożony (pmid, kwota) w jednej liczbie int64: sortowanie po nim = sortowanie po (pmid, kwota)
+    return (pmid_kody.astype(np.int64) << 32) | (grosze.astype(np.int64) + (1 << 31))
+
+
+def dopasuj_przedzialami(
+    nowe: pd.DataFrame,
+    magazyn: pd.DataFrame,
+    tolerancja: float,
+    max_odstep_dni: Optional[int],
+) -> pd.DataFrame:
+    """
+    Paruje `nowe` z `magazyn` (przeciwna strona!) po PMID, |Δ| ≤ tolerancja i bliskości dat.
+    Indeks: magazyn posortowany po kluczu (pmid, grosze); dla każdej nowej pozycji przedział kandydatów
+    [kwota − tol, kwota + tol] znajduje searchsorted — bez zagnieżdżonych pętli.
+    Zwraca pary (idx_nowe, idx_magazyn, delta [gr], dni) — każda pozycja użyta co najwyżej raz.
+    """
+    pusty = pd.DataFrame({"i_new": pd.Series(dtype=int), "i_mag": pd.Series(dtype=int),
+                          "delta": pd.Series(dtype=np.int64), "dni": pd.Series(dtype=float)})
+    if nowe.empty or magazyn.empty:
+        return pusty
+
+    kody, _ = pd.factorize(pd.concat([nowe["pmid"], magazyn["pmid"]], ignore_index=True))
+    k_new, k_mag = kody[:len(nowe)], kody[len(nowe):]
+    g_new = nowe["grosze"].to_numpy(dtype=np.int64)
+    g_mag = magazyn["grosze"].to_numpy(dtype=np.int64)
+    tol_g = tolerancja_w_groszach(tolerancja)
+
+    key_mag = _klucze(k_mag, g_mag)
+    order = np.argsort(key_mag, kind="stable")
+    key_sorted = key_mag[order]
+    lo = np.searchsorted(key_sorted, _klucze(k_new, g_new - tol_g), side="left")
+    hi = np.searchsorted(key_sorted, _klucze(k_new, g_new + tol_g), side="right")
+
+    ile = hi - lo
+    if ile.sum() == 0:
+        return pusty
+    i_new = np.repeat(np.arange(len(nowe)), ile)
+    # pozycje w posortowanym magazynie: lo[i] .. hi[i]-1 dla każdej nowej pozycji
+    start = np.repeat(lo - np.concatenate([[0], np.cumsum(ile)[:-1]]), ile)
+    i_mag = order[start + np.arange(ile.sum())]
+
+    delta = np.abs(g_new[i_new] - g_mag[i_mag])
+    d_new = nowe["data"].to_numpy()[i_new]
+    d_mag = magazyn["data"].to_numpy()[i_mag]
+    dni = np.abs((d_new - d_mag) / np.timedelta64(1, "D"))
+    pary = pd.DataFrame({"i_new": i_new, "i_mag": i_mag, "delta": delta, "dni": dni})
+    if max_odstep_dni is not None:
+        # brak daty po którejś stronie nie wyklucza pary (kara w sortowaniu niżej)
+        pary = pary[~(pary["dni"] > max_odstep_dni)]
+
+    # zachłannie: najpierw najmniejsza Δ, potem najbliższa data; każda pozycja tylko raz.
+    # Rundy: najlepszy kandydat każdej nowej pozycji, z nich najlepszy dla każdej pozycji magazynu;
+    # przyjęte pary usuwamy z puli kandydatów i powtarzamy, aż nic nie zostanie.
+    pary = pary.assign(_dni=pary["dni"].fillna(1e9)).sort_values(["delta", "_dni", "i_new", "i_mag"], kind="mergesort")
+    przyjete = []
+    while not pary.empty:
+        runda = pary.drop_duplicates("i_new").drop_duplicates("i_mag")
+        przyjete.append(runda)
+        pary = pary[~pary["i_new"].isin(runda["i_new"]) & ~pary["i_mag"].isin(runda["i_mag"])]
+    out = pd.concat(przyjete, ignore_index=True).sort_values(["i_new"], kind="mergesort")
+    return out.drop(columns="_dni").reset_index(drop=True)
+
+
+def _numeruj(df: pd.DataFrame) -> pd.DataFrame:
+    # klucz pozycji + numer kolejnej kopii tego samego klucza (do różnicy multizbiorów)
+    klucz = ["strona", "pmid", "grosze", "data"]
+    return df[klucz].assign(_nr=df.groupby(klucz, dropna=False).cumcount())
+
+
+class OknoNiesparowanych:
+    """
+    Magazyn niesparowanych transakcji z ostatnich K dni (plik pickle), pozwalający dopasować pobyt
+    zaksięgowany w Operations dnia N z eksportem Loyalty z dnia N+1 (i odwrotnie).
+
+    Zmiany magazynu są przypisane do dnia: pozycje sparowane nie znikają, tylko dostają dzień, który je
+    zużył — ponowne przetworzenie dnia cofa jego wkład i liczy go od nowa z tym samym wynikiem.
+    paruj_rozne_liczby — jak w compare.porownaj: do magazynu trafiają też pozycje bez pary z PMID
+    o różnej liczbie pozycji.
+    """
+
+    def __init__(self, plik: str | Path, okno_dni: int = 3, tolerancja: float = 0.10,
+                 max_odstep_dni: Optional[int] = None, paruj_rozne_liczby: bool = False):
+        self.plik = Path(plik)
+        self.okno_dni = okno_dni
+        self.tolerancja = tolerancja
+        self.paruj_rozne_liczby = paruj_rozne_liczby
+        # domyślnie data wyjazdu może się różnić najwyżej o szerokość okna
+        self.max_odstep_dni = okno_dni if max_odstep_dni is None else max_odstep_dni
+        self.magazyn = self._wczytaj()
+
+    def _wczytaj(self) -> pd.DataFrame:
+        if self.plik.exists():
+            with open(self.plik, "rb") as f:
+                mag = pickle.load(f)
+            if "grosze" not in mag.columns:
+                # magazyn zapisany przed przejściem na grosze — kwoty w złotych (float)
+                mag = mag.assign(grosze=zl_na_grosze(mag["kwota"]).astype(np.int64))
+            if "sparowane" not in mag.columns:
+                # starszy format: sparowane pozycje były usuwane, więc wszystkie są otwarte
+                mag = mag.assign(sparowane=pd.NaT)
+            return mag[_KOLUMNY]
+        return pd.DataFrame({c: pd.Series(dtype="datetime64[ns]" if c in _DATY else
+                                          (np.int64 if c == "grosze" else object)) for c in _KOLUMNY})
+
+    @property
+    def otwarte(self) -> int:
+        """Liczba pozycji magazynu wciąż bez pary."""
+        return int(self.magazyn["sparowane"].isna().sum())
+
+    def zapisz(self):
+        self.plik.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.plik.with_suffix(".tmp")
+        mag = self.magazyn.copy()
+        for c in ("strona", "pmid", "nazwisko", "zrodlo"):
+            mag[c] = mag[c].astype("category")  # zwarty zapis: powtarzalne klucze i nazwiska
+        with open(tmp, "wb") as f:
+            pickle.dump(mag, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, self.plik)
+
+    def przetworz_dzien(self, lojal_df: pd.DataFrame, ops_df: pd.DataFrame, dzien: date) -> pd.DataFrame:
+        """
+        Dopasowuje niesparowane pozycje dnia do otwartych pozycji poprzednich dni okna, oznacza
+        sparowane, dokłada resztę i odrzuca pozycje starsze niż okno. Zwraca sekcję z parami
+        międzydniowymi. Dzień przetwarzany ponownie najpierw cofa swój poprzedni wkład.
+        """
+        D = pd.Timestamp(dzien)
+        mag = self.magazyn.astype({c: object for c in ("strona", "pmid", "nazwisko", "zrodlo")})
+        mag = mag.assign(sparowane=mag["sparowane"].mask(mag["sparowane"] == D))
+        # własne pozycje dnia: otwarte liczymy od nowa, zużyte przez inne dni zostają (i nie wracają do puli)
+        wlasne = mag["dzien"] == D
+        zuzyte = mag[wlasne & mag["sparowane"].notna()]
+        mag = pd.concat([mag[~wlasne], zuzyte], ignore_index=True)
+
+        nowe = niesparowane(lojal_df, ops_df, dzien, self.tolerancja if self.paruj_rozne_liczby else None)
+        if not zuzyte.empty:
+            # multizbiór: tyle kopii pozycji, ile zużyły inne dni, wypada z nowych
+            juz = _numeruj(nowe).merge(_numeruj(zuzyte), how="left", indicator=True)["_merge"] == "both"
+            nowe = nowe[~juz.to_numpy()].reset_index(drop=True)
+
+        dostepne = mag["sparowane"].isna() & (mag["dzien"] < D) \
+            & (mag["dzien"] >= D - pd.Timedelta(days=self.okno_dni))
+        wiersze, uzyte_mag, uzyte_new = [], [], []
+        for strona_new, strona_mag in (("L", "O"), ("O", "L")):
+            n = nowe[nowe["strona"] == strona_new]
+            m = mag[dostepne & (mag["strona"] == strona_mag)]
+            pary = dopasuj_przedzialami(n.reset_index(drop=True), m.reset_index(drop=True),
+                                        self.tolerancja, self.max_odstep_dni)
+            if pary.empty:
+                continue
+            rn = n.iloc[pary["i_new"].to_numpy()].reset_index()
+            rm = m.iloc[pary["i_mag"].to_numpy()].reset_index()
+            uzyte_new += rn["index"].tolist()
+            uzyte_mag += rm["index"].tolist()
+            L, O = (rn, rm) if strona_new == "L" else (rm, rn)
+            wiersze.append(pd.DataFrame({
+                "PMID": L["pmid"].to_numpy(),
+                "Kwota_Loyalty": [fmt_grosze(v) for v in L["grosze"]],
+                "Kwota_Operations": [fmt_grosze(v) for v in O["grosze"]],
+                "Δ": [fmt_grosze(v) for v in pary["delta"]],
+                "Data_Loyalty": [fmt_date(v) for v in L["data"]],
+                "Data_Operations": [fmt_date(v) for v in O["data"]],
+                "Dzień_Loyalty": [fmt_date(v) for v in L["dzien"]],
+                "Dzień_Operations": [fmt_date(v) for v in O["dzien"]],
+                "Nazwisko_Loyalty": L["nazwisko"].to_numpy(),
+                "Nazwisko_Operations": O["nazwisko"].to_numpy(),
+            }))
+
+        mag.loc[uzyte_mag, "sparowane"] = D
+        reszta_new = nowe.drop(index=uzyte_new)
+        granica = pd.Timestamp(dzien - timedelta(days=self.okno_dni))
+        czesci = [df for df in (mag, reszta_new) if not df.empty]
+        self.magazyn = pd.concat(czesci, ignore_index=True)[_KOLUMNY] if czesci else nowe.iloc[:0]
+        self.magazyn = self.magazyn[self.magazyn["dzien"] > granica].reset_index(drop=True)
+
+        if not wiersze:
+            return pd.DataFrame(columns=["PMID", "Kwota_Loyalty", "Kwota_Operations", "Δ",
+                                         "Data_Loyalty", "Data_Operations", "Dzień_Loyalty", "Dzień_Operations",
+                                         "Nazwisko_Loyalty", "Nazwisko_Operations"])
+        return pd.concat(wiersze, ignore_index=True).sort_values("PMID", kind="mergesort").reset_index(drop=True)
+
+
+def dolacz_do_wynikow(wyniki: Dict[str, pd.DataFrame], sekcja: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Dodaje sekcję 08_MIEDZY_DNIAMI (przed 99_*) i jej liczność w 00_PODSUMOWANIE; oznacza PMID w przeglądzie."""
+    out = dodaj_sekcje(wyniki, _SEKCJA, sekcja)
+
+    przeglad = out.get("99_PRZEGLAD_TRANSAKCJI")
+    if przeglad is not None and not przeglad.empty and not sekcja.empty:
+        przeglad = przeglad.copy()
+        # pozycje bez pary z PMID o różnej liczbie pozycji (--match-unequal) mają kwotę tylko po jednej stronie
+        reszta = (przeglad["Status_Auto"] == "ROZNA_LICZBA_TRANSAKCJI") & \
+            ((przeglad["Kwota_Loyalty"] == "—") | (przeglad["Kwota_Operations"] == "—"))
+        m = przeglad["PMID"].isin(set(sekcja["PMID"])) & \
+            (przeglad["Status_Auto"].isin(["BRAK_W_OPERATIONS", "BRAK_W_LOYALTY"]) | reszta)
+        przeglad.loc[m, "Uwaga"] = "Sparowane z innym dniem — patrz 08_MIEDZY_DNIAMI."
+        out["99_PRZEGLAD_TRANSAKCJI"] = przeglad
+    return out
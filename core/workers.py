@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import annotations
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+# stan procesu roboczego (ustawiany w _rozgrzej)
+_PAMIEC = None
+
+
+def _rozgrzej(cache_dir: Optional[str] = None, max_w_pamieci: int = 32):
+    """
+    Inicjalizator procesu roboczego: ciężkie importy, skompilowane wzorce z core.utils
+    i jeden mini-przebieg porównania, żeby leniwe ścieżki pandas były już załadowane.
+    """
+    global _PAMIEC
+    import numpy  # noqa: F401
+    import openpyxl  # noqa: F401
+    import xlsxwriter  # noqa: F401
+    try:
+        import xlrd  # noqa: F401
+    except ImportError:
+        pass
+    from . import utils  # noqa: F401  — kompiluje wzorce modułu przy imporcie
+    from .cache import MemoryCache, ParseCache
+    from .compare import porownaj
+
+    _PAMIEC = MemoryCache(max_w_pamieci, ParseCache(cache_dir) if cache_dir else None)
+
+    loj = pd.DataFrame({"pmid": ["X"], "gosc_nazwisko": ["A"], "loyal_kwota": [1.0], "loyal_data_str": ["—"]})
+    ops = pd.DataFrame({"pmid": ["X"], "nazwisko": ["A"], "ops_kwota": [1.0], "ops_data_str": ["—"],
+                        "ops_punkty": [1.0]})
+    porownaj(loj, ops)
+
+
+# ============ Zadania (wykonywane w procesie roboczym) ============
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _zadanie_wczytaj(rodzaj: str, path: str) -> pd.DataFrame:
+    from .ingest import wczytaj_z_pamieci
+    return wczytaj_z_pamieci(_PAMIEC, rodzaj, path)
+
+
+def _zadanie_porownaj(lojal_df: pd.DataFrame, ops_df: pd.DataFrame, tolerancja: float) -> Dict[str, pd.DataFrame]:
+    from .compare import porownaj
+    return porownaj(lojal_df, ops_df, tolerancja=tolerancja)
+
+
+def _zadanie_zapisz(wyniki: Dict[str, pd.DataFrame], out: str, fmt: str) -> str:
+    from .report import WRITERS
+    WRITERS[fmt](wyniki, Path(out))
+    return out
+
+
+def _zadanie_uzgodnij(ops: List[str], loyalty: List[str], tolerancja: float, out: str, fmt: str,
+                      z_indeksem: bool = False) -> dict:
+    """
+    Całe uzgodnienie w procesie roboczym — przez IPC wracają tylko liczności sekcji i czasy
+    (z_indeksem=True — także zwarty indeks źródeł PMID, core.provenance.IndeksZrodel).
+    """
+    from .ingest import wczytaj_z_pamieci, _scal
+    from .compare import porownaj
+    from .report import WRITERS
+
+    t0 = time.perf_counter()
+    lojal_df = _scal([wczytaj_z_pamieci(_PAMIEC, "loyalty", p) for p in loyalty], "loyalty")
+    ops_df   = _scal([wczytaj_z_pamieci(_PAMIEC, "operations", p) for p in ops], "operations")
+    t1 = time.perf_counter()
+    wyniki = porownaj(lojal_df, ops_df, tolerancja=tolerancja)
+    t2 = time.perf_counter()
+    WRITERS[fmt](wyniki, Path(out))
+    t3 = time.perf_counter()
+    res = {
+        "output": out,
+        "sekcje": {r["Sekcja"]: int(r["Wierszy"]) for _, r in wyniki["00_PODSUMOWANIE"].iterrows()},
+        "czasy": {"wczytanie": t1 - t0, "porownanie": t2 - t1, "zapis": t3 - t2},
+        "pid": os.getpid(),
+    }
+    if z_indeksem:
+        from .provenance import IndeksZrodel
+        res["indeks_zrodel"] = IndeksZrodel.z_ramek(lojal_df, ops_df)
+    return res
+
+
+# ============ Pula ============
+
+class WarmPool:
+    """
+    Rezydentna pula procesów roboczych z rozgrzanymi importami (pandas, NumPy, openpyxl, xlsxwriter)
+    i własną ciepłą pamięcią sparsowanych plików. Uruchamiana raz na sesję GUI / instancję usługi;
+    zadania trafiają do procesów przez lokalny kanał IPC (potoki multiprocessing).
+
+    Duże ramki przesyłane przez IPC są serializowane — gdy to możliwe, używaj `uzgodnij`,
+    który wykonuje wczytanie, porównanie i zapis w jednym procesie.
+    """
+
+    def __init__(self, workers: int = 1, cache_dir: Optional[str | Path] = None, max_w_pamieci: int = 32):
+        self.workers = max(1, workers)
+        self._ex = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_rozgrzej,
+            initargs=(str(cache_dir) if cache_dir else None, max_w_pamieci),
+        )
+        self._gotowa = False
+
+    def start(self, wait: bool = True) -> "WarmPool":
+        """Wymusza uruchomienie i rozgrzanie wszystkich procesów (w tle, jeśli wait=False)."""
+        futs = [self._ex.submit(_ping) for _ in range(self.workers)]
+        if wait:
+            for f in futs:
+                f.result()
+            self._gotowa = True
+        else:
+            def _done(_f, futs=futs):
+                if all(f.done() for f in futs):
+                    self._gotowa = True
+            for f in futs:
+                f.add_done_callback(_done)
+        return self
+
+    @property
+    def gotowa(self) -> bool:
+        return self._gotowa
+
+    def wczytaj(self, rodzaj: str, path: str | Path) -> Future:
+        return self._ex.submit(_zadanie_wczytaj, rodzaj, str(path))
+
+    def porownaj(self, lojal_df: pd.DataFrame, ops_df: pd.DataFrame, tolerancja: float = 0.10) -> Future:
+        return self._ex.submit(_zadanie_porownaj, lojal_df, ops_df, tolerancja)
+
+    def zapisz(self, wyniki: Dict[str, pd.DataFrame], out: str | Path, fmt: str = "xlsx") -> Future:
+        return self._ex.submit(_zadanie_zapisz, wyniki, str(out), fmt)
+
+    def uzgodnij(self, ops: List[str | Path], loyalty: List[str | Path], tolerancja: float,
+                 out: str | Path, fmt: str = "xlsx", z_indeksem: bool = False) -> Future:
+        return self._ex.submit(_zadanie_uzgodnij, [str(p) for p in ops], [str(p) for p in loyalty],
+                               tolerancja, str(out), fmt, z_indeksem)
+
+    def shutdown(self, wait: bool = True):
+        self._ex.shutdown(wait=wait, cancel_futures=True)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.shutdown()
@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 from __future__ import annotations
+import contextlib
 import os
 import sys
 import threading
@@ -30,9 +31,11 @@ from core.io_operations import wczytaj_operations, wczytaj_operations_many
 from core.io_loyalty import wczytaj_loyalty, wczytaj_loyalty_many
 from core.compare import porownaj
 from core.report import zapisz_do_excela
+from core.provenance import IndeksZrodel
+from core.profiling import ProfilerPamieci
 
 
-SUPPORTED_EXT = {".xls", ".xlsx"}
+SUPPORTED_EXT = {".xls", ".xlsx", ".csv"}
 
 
 def is_excel_path(p: Path) -> bool:
@@ -55,10 +58,20 @@ class App:
         self.tolerance  = tk.StringVar(value="0.10")
         self.open_after = tk.BooleanVar(value=True)
         self.timestamp  = tk.BooleanVar(value=False)
+        self.use_pool   = tk.BooleanVar(value=True)
+        self.trace_mem  = tk.BooleanVar(value=False)
+        self.szukany_pmid = tk.StringVar(value="")
+
+        # indeks źródeł ostatniego raportu (PMID → plik i wiersz arkusza)
+        self.indeks_zrodel = None
+
+        # rozgrzana pula procesów — startuje w tle raz na sesję, kolejne raporty płacą tylko za dane
+        self.pool = None
 
         # --- UI ---
         self._build_ui()
         self._bind_state()
+        self._start_pool()
 
     def _extract_paths_from_dnd(self, data: str) -> list[Path]:
         out = []
@@ -140,6 +153,13 @@ class App:
         tb.Checkbutton(
             frm_settings, text="Dodać znacznik czasu do nazwy", variable=self.timestamp
         ).grid(row=1, column=2, columnspan=2, sticky=W, pady=(8, 0))
+        tb.Checkbutton(
+            frm_settings, text="Rozgrzany proces roboczy (szybsze kolejne raporty)", variable=self.use_pool,
+            command=self._start_pool
+        ).grid(row=1, column=4, columnspan=2, sticky=W, pady=(8, 0))
+        tb.Checkbutton(
+            frm_settings, text="Śledzenie pamięci (dziennik obok raportu)", variable=self.trace_mem
+        ).grid(row=2, column=0, columnspan=2, sticky=W, pady=(4, 0))
 
         frm_settings.columnconfigure(3, weight=1)
         frm_settings.columnconfigure(4, weight=1)
@@ -150,6 +170,11 @@ class App:
         self.btn_run = tb.Button(frm_actions, text="📊 Generuj raport", bootstyle=SUCCESS, command=self._run_clicked)
         self.btn_run.pack(side=LEFT)
         tb.Button(frm_actions, text="Zamknij", command=self.root.destroy).pack(side=RIGHT)
+        self.btn_trace = tb.Button(frm_actions, text="🔍 Skąd PMID", command=self._trace_clicked, state=DISABLED)
+        self.btn_trace.pack(side=RIGHT, padx=(0, 10))
+        self.ent_trace = tb.Entry(frm_actions, textvariable=self.szukany_pmid, width=14)
+        self.ent_trace.pack(side=RIGHT, padx=(0, 4))
+        self.ent_trace.bind("<Return>", lambda _e: self._trace_clicked())
 
         # Progress + log
         frm_log = tb.Labelframe(self.root, text="Log", padding=10)
@@ -188,7 +213,7 @@ class App:
             paths = self._extract_paths_from_dnd(event.data)
             excel_paths = [p for p in paths if is_excel_path(p)]
             if not excel_paths:
-                messagebox.showwarning("Nieobsługiwany plik", "Upuść pliki .xls lub .xlsx")
+                messagebox.showwarning("Nieobsługiwany plik", "Upuść pliki .xls, .xlsx lub .csv")
                 return
 
             widget = event.widget
@@ -231,6 +256,22 @@ class App:
             else ("Przeciągnij i upuść: włącz tryb ręczny" if auto else "Przeciągnij i upuść: niedostępne")
         ), bootstyle=INFO if visible else WARNING)
 
+    # ---------- Pula robocza ----------
+    def _start_pool(self):
+        if not self.use_pool.get() or self.pool is not None:
+            return
+        try:
+            from core.workers import WarmPool
+            self.pool = WarmPool(workers=1).start(wait=False)
+        except Exception:
+            self.pool = None
+            self.log("ℹ️ Proces roboczy niedostępny — raporty będą liczone w oknie programu.")
+
+    def _stop_pool(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
     # ---------- Helpers ----------
     def log(self, msg: str):
         self.txt.insert(tk.END, msg + "\n")
@@ -242,7 +283,7 @@ class App:
             return
         paths = filedialog.askopenfilenames(
             title="Wybierz plik(i) Operations",
-            filetypes=[("Excel", "*.xlsx *.xls"), ("Wszystkie pliki", "*.*")]
+            filetypes=[("Excel / CSV", "*.xlsx *.xls *.csv"), ("Wszystkie pliki", "*.*")]
         )
         if paths:
             self.ops_path.set("; ".join(paths))
@@ -252,7 +293,7 @@ class App:
             return
         paths = filedialog.askopenfilenames(
             title="Wybierz plik(i) Loyalty",
-            filetypes=[("Excel", "*.xlsx *.xls"), ("Wszystkie pliki", "*.*")]
+            filetypes=[("Excel / CSV", "*.xlsx *.xls *.csv"), ("Wszystkie pliki", "*.*")]
         )
         if paths:
             self.loy_paths.set("; ".join(paths))
@@ -305,15 +346,9 @@ class App:
         if self.auto_mode.get():
             root = base_dir()
 
-            # Operations (auto – jeden plik)
-            p_ops = znajdz_plik_operations(root)
-            ops_df = wczytaj_operations(str(p_ops))
-            ops_names = [Path(p_ops).name]
-
-            # Loyalty (auto – jeden plik)
-            p_loy = znajdz_plik_loyalty(root)
-            loy_paths = [Path(p_loy)]
-            loy_names = [Path(p_loy).name]
+            # Operations i Loyalty (auto – po jednym, najnowszym pliku)
+            ops_list = [Path(znajdz_plik_operations(root))]
+            loy_paths = [Path(znajdz_plik_loyalty(root))]
         else:
             # Operations (ręcznie – jeden lub wiele)
             ops = self.ops_path.get().strip()
@@ -321,8 +356,6 @@ class App:
                 messagebox.showwarning("Brak plików", "Wybierz lub upuść plik(i) Operations.")
                 return
             ops_list = [Path(p) for p in ops.split(";") if p.strip()]
-            ops_names = [p.name for p in ops_list]
-            ops_df = wczytaj_operations_many(ops_list) if len(ops_list) > 1 else wczytaj_operations(str(ops_list[0]))
 
             # Loyalty (ręcznie – jeden lub wiele)
             loy = self.loy_paths.get().strip()
@@ -330,7 +363,8 @@ class App:
                 messagebox.showwarning("Brak plików", "Wybierz lub upuść co najmniej jeden plik Loyalty.")
                 return
             loy_paths = [Path(p) for p in loy.split(";") if p.strip()]
-            loy_names = [p.name for p in loy_paths]
+        ops_names = [p.name for p in ops_list]
+        loy_names = [p.name for p in loy_paths]
 
         # log: Operations
         if len(ops_names) == 1:
@@ -344,12 +378,6 @@ class App:
         else:
             self.log(f"🔎 Loyalty (x{len(loy_names)}): " + ", ".join(loy_names))
 
-        # wczytanie Loyalty
-        lojal_df = wczytaj_loyalty(str(loy_paths[0])) if len(loy_paths) == 1 else wczytaj_loyalty_many(loy_paths)
-
-        # porównanie
-        wyniki = porownaj(lojal_df, ops_df, tolerancja=tol)
-
         # wyjściowa ścieżka
         out = Path(self.out_path.get()) if self.out_path.get().strip() else wybierz_sciezke_wyjsciowa(base_dir())
         if self.timestamp.get():
@@ -360,9 +388,38 @@ class App:
         if out.exists():
             self.log(f"ℹ️ Uwaga: {out.name} zostanie nadpisany (najstarszy w cyklu 01..31).")
 
-        # zapis
-        zapisz_do_excela(wyniki, out)
+        # śledzenie pamięci: etapy w tym procesie (bez procesu roboczego), dziennik zapisywany na bieżąco,
+        # żeby po zabiciu programu z braku pamięci było widać, w którym etapie to się stało
+        prof = ProfilerPamieci(dziennik=out.with_suffix(".pamiec.log")) if self.trace_mem.get() else None
+        if prof is not None:
+            self.log(f"🧠 Śledzenie pamięci — dziennik: {prof.dziennik.name}")
+
+        if self.use_pool.get() and self.pool is not None and self.pool.gotowa and prof is None:
+            # wczytanie + porównanie + zapis w rozgrzanym procesie roboczym
+            res = self.pool.uzgodnij(ops_list, loy_paths, tol, out, z_indeksem=True).result()
+            self.indeks_zrodel = res.get("indeks_zrodel")
+            cz = res["czasy"]
+            self.log(f"⏱️ Wczytanie {cz['wczytanie']:.2f}s, porównanie {cz['porownanie']:.2f}s, zapis {cz['zapis']:.2f}s")
+        else:
+            with prof or contextlib.nullcontext():
+                # wczytanie
+                ops_df = wczytaj_operations_many(ops_list) if len(ops_list) > 1 else wczytaj_operations(str(ops_list[0]))
+                lojal_df = wczytaj_loyalty(str(loy_paths[0])) if len(loy_paths) == 1 else wczytaj_loyalty_many(loy_paths)
+                if "Źródło" not in ops_df.columns:
+                    ops_df["Źródło"] = ops_list[0].name
+                if "Źródło" not in lojal_df.columns:
+                    lojal_df["Źródło"] = loy_paths[0].name
+
+                # porównanie
+                wyniki = porownaj(lojal_df, ops_df, tolerancja=tol)
+
+                # zapis
+                zapisz_do_excela(wyniki, out)
+                self.indeks_zrodel = IndeksZrodel.z_ramek(lojal_df, ops_df)
+            if prof is not None:
+                self.log(prof.podsumowanie_pamieci())
         self.log(f"✅ Gotowe. Otwórz plik: {out.name}")
+        self.root.after(0, lambda: self.btn_trace.configure(state=NORMAL if self.indeks_zrodel is not None else DISABLED))
 
         if self.open_after.get():
             try:
@@ -375,8 +432,24 @@ class App:
             except Exception:
                 pass
 
+    def _trace_clicked(self):
+        from core.utils import normalizuj_pmid
+
+        pmid = normalizuj_pmid(self.szukany_pmid.get())
+        if not pmid or self.indeks_zrodel is None:
+            return
+        if pmid not in self.indeks_zrodel:
+            self.log(f"❔ {pmid}: brak w plikach ostatniego raportu")
+            return
+        self.log(f"📍 {pmid}:")
+        for _, r in self.indeks_zrodel.wiersze(pmid).iterrows():
+            self.log(f"   {r['Strona']:<10} {r['Plik']} — wiersz {r['Wiersz']}")
+
     def run(self):
-        self.root.mainloop()
+        try:
+            self.root.mainloop()
+        finally:
+            self._stop_pool()
 
 
 def run_gui():